@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:48:52 2026
+
+@author: madengr
+"""
+
+import heapq
+import collections
+
+
+class DemodAssigner(object):
+    """Assigns channels to demodulators
+
+    Keeps a map from baseband frequency to the demodulator tuned there,
+    and a free list of idle demodulators parked at 0 Hz
+    Demodulators are held on channels that are still in the channel list,
+    released when they are not, and new channels are given the idle
+    demodulator of lowest index, in the order of the channel list
+    Each assignment is O(C+D) for C channels and D demodulators
+    The changes of each assignment are applied as one batch, so a receiver
+    that has to reconnect demodulators only does so once
+
+    Args:
+        demodulators (list): Tuner/demodulator objects with a center_freq
+            attribute and a set_center_freq(center_freq, rf_center_freq) method
+        retune (callable): Applies a batch as retune(tunes, rf_center_freq),
+            with tunes a list of (index, center_freq), or None to call
+            set_center_freq() of each demodulator
+
+    Attributes:
+        demod_map (dict): Index of demodulator tuned to each baseband
+            frequency in Hz
+        free (list): Heap of the indices of idle demodulators
+    """
+
+    def __init__(self, demodulators, retune=None):
+        self.demodulators = demodulators
+        self.retune = retune
+        self.demod_map = {}
+        self.free = []
+        self.reset()
+
+    def reset(self):
+        """Rebuilds the map and free list from the demodulator frequencies
+        """
+        self.demod_map = {}
+        self.free = []
+        for idx, demodulator in enumerate(self.demodulators):
+            if demodulator.center_freq == 0 or \
+                    demodulator.center_freq in self.demod_map:
+                self.free.append(idx)
+            else:
+                self.demod_map[demodulator.center_freq] = idx
+        heapq.heapify(self.free)
+
+    def assign(self, channels, rf_center_freq):
+        """Tunes the demodulators to a list of channels
+
+        Args:
+            channels (list): Baseband channels in Hz, in order of preference
+            rf_center_freq (float): RF center in Hz (for file name)
+
+        Returns:
+            int: Number of demodulators retuned
+        """
+        wanted = set(channels)
+
+        # New frequency of each demodulator to retune
+        # A demodulator parked then given a new channel is only tuned once
+        tunes = collections.OrderedDict()
+
+        # Park demodulators whose channel is no longer wanted
+        for freq in [freq for freq in self.demod_map if freq not in wanted]:
+            idx = self.demod_map.pop(freq)
+            tunes[idx] = 0
+            heapq.heappush(self.free, idx)
+
+        # Tune idle demodulators to new channels
+        for channel in channels:
+            if not self.free:
+                break
+            # Zero is where idle demodulators are parked, so not a channel
+            if channel == 0 or channel in self.demod_map:
+                continue
+            idx = heapq.heappop(self.free)
+            tunes[idx] = channel
+            self.demod_map[channel] = idx
+
+        # Apply the changes
+        if self.retune is not None:
+            if tunes:
+                self.retune(tunes.items(), rf_center_freq)
+        else:
+            for idx, center_freq in tunes.items():
+                self.demodulators[idx].set_center_freq(center_freq,
+                                                       rf_center_freq)
+
+        return len(tunes)
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test DemodAssigner holds, parks, and takes from the free list in order
+    print "Testing DemodAssigner"
+
+    class FakeDemod(object):
+        """Demodulator that only keeps its frequency"""
+        def __init__(self):
+            self.center_freq = 0
+
+        def set_center_freq(self, center_freq, rf_center_freq):
+            """Sets the baseband frequency"""
+            # pylint: disable=unused-argument
+            self.center_freq = center_freq
+
+    demodulators = [FakeDemod() for _ in range(3)]
+    demod_assigner = DemodAssigner(demodulators)
+    first = demod_assigner.assign([10E3, 20E3, 30E3, 40E3], 0)
+    # 20 kHz is held, 10 and 30 kHz parked, and 10 kHz's demodulator
+    # retuned to 50 kHz, counted once
+    second = demod_assigner.assign([50E3, 20E3], 0)
+    freqs = [demodulator.center_freq for demodulator in demodulators]
+    print "Retuned %d then %d, at %s, free %s" % (first, second, freqs,
+                                                  demod_assigner.free)
+    if first == 3 and second == 2 and freqs == [50E3, 20E3, 0] and \
+            demod_assigner.free == [2]:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
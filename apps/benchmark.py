@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:40 2026
+
+@author: madengr
+"""
+
+import estimate
+import assigner
+import planner
+import timeit
+import os
+import numpy as np
+
+
+def channel_estimate_loop(spectrum, threshold):
+    """Channel estimate with the original per-bin Python loop
+
+    Kept as the reference for channel_estimate() in estimate.py
+
+    Args:
+        spectrum (numpy.ndarray): FFT power spectrum in linear, not dB
+        threshold (float): Threshold value in linear, not dB
+
+    Returns:
+        List[float]: List of fractional indices into spectrum of channel center
+    """
+
+    # Append a zero to handle last bin above threshold
+    spectrum = np.append(spectrum, np.zeros(1))
+
+    length = len(spectrum)
+    bins = []
+    channels = []
+    index = 0
+    while index < length:
+        if spectrum[index] > threshold:
+            # If spectrum > threshold then append to bins list
+            bins.append(spectrum[index])
+            index += 1
+        elif len(bins) != 0:
+            # Spectrum < threshold so find average freq and append to channels
+            channels.append(index - len(bins) + estimate.avg_freq(bins))
+            index += 1
+            bins = []
+        else:
+            # Spectrum < threshold so move on
+            index += 1
+    return channels
+
+
+def make_spectrum(fft_length, num_channels=20, seed=0):
+    """Make a test power spectrum
+
+    Exponentially distributed noise floor of unity mean, with channels of
+    3 to 5 bins wide at random locations 20 to 30 dB above the floor
+
+    Args:
+        fft_length (int): Number of FFT bins
+        num_channels (int): Number of channels to place in the spectrum
+        seed (int): Seed for the random number generator
+
+    Returns:
+        numpy.ndarray: FFT power spectrum in linear, not dB
+    """
+    rand = np.random.RandomState(seed)
+    spectrum = rand.exponential(1.0, fft_length)
+    for center in rand.randint(0, fft_length, num_channels):
+        width = rand.randint(3, 6)
+        level = 10**(rand.uniform(20, 30)/10.0)
+        spectrum[center:center+width] += level * rand.uniform(0.5, 1.0, width)
+    return spectrum
+
+
+def time_call(function, repeat=5, number=None):
+    """Time a function call
+
+    Args:
+        function (callable): Function taking no arguments
+        repeat (int): Number of timing runs, the fastest is kept
+        number (int): Calls per run, or None to aim for about 0.1 s per run
+
+    Returns:
+        float: Seconds per call
+    """
+    if number is None:
+        number = 1
+        while timeit.timeit(function, number=number) < 0.1:
+            number *= 10
+    return min(timeit.repeat(function, repeat=repeat, number=number))/number
+
+
+def bench_channel_estimate():
+    """Compare the loop and vectorized channel estimators
+
+    Checks both return the same channels, then prints the time per call
+    for FFT lengths from 256 to 65536
+    """
+    threshold = 10**(10/10.0)
+    print "Benchmark channel_estimate()"
+    print "%8s %12s %12s %8s" % ("FFT", "loop (us)", "numpy (us)", "speedup")
+    fft_length = 256
+    while fft_length <= 65536:
+        spectrum = make_spectrum(fft_length)
+        if channel_estimate_loop(spectrum, threshold) != \
+                estimate.channel_estimate(spectrum, threshold):
+            print "Results differ at FFT length %d" % fft_length
+        loop_time = time_call(
+            lambda: channel_estimate_loop(spectrum, threshold))
+        numpy_time = time_call(
+            lambda: estimate.channel_estimate(spectrum, threshold))
+        print "%8d %12.1f %12.1f %8.1f" % (fft_length, loop_time*1E6,
+                                           numpy_time*1E6,
+                                           loop_time/numpy_time)
+        fft_length *= 4
+    print ""
+
+
+class FakeDemodulator(object):
+    """Stand in for a tuner/demodulator that only keeps its frequency
+
+    Args:
+        center_freq (float): Baseband center frequency in Hz
+    """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, center_freq=0):
+        self.center_freq = center_freq
+
+    def set_center_freq(self, center_freq, rf_center_freq):
+        """Sets baseband center frequency
+
+        Args:
+            center_freq (float): Baseband center frequency in Hz
+            rf_center_freq (float): RF center in Hz (unused)
+        """
+        # pylint: disable=unused-argument
+        self.center_freq = center_freq
+
+
+def get_demod_freqs(demodulators):
+    """Gets baseband frequencies of all demodulators, as the Receiver does
+
+    Args:
+        demodulators (list): FakeDemodulator objects
+
+    Returns:
+        List[float]: List of baseband center frequencies in Hz
+    """
+    center_freqs = []
+    for demodulator in demodulators:
+        center_freqs.append(demodulator.center_freq)
+    return center_freqs
+
+
+def assign_channels_loop(demodulators, channels, rf_center_freq):
+    """Assigns channels with the original nested loops of scan_cycle()
+
+    Kept as the reference for DemodAssigner.assign() in assigner.py
+
+    Args:
+        demodulators (list): FakeDemodulator objects
+        channels (list): Baseband channels in Hz, in order of preference
+        rf_center_freq (float): RF center in Hz
+    """
+    # Set demodulators that are no longer in channel list to 0 Hz
+    for demodulator in demodulators:
+        if demodulator.center_freq not in channels:
+            demodulator.set_center_freq(0, rf_center_freq)
+
+    # Add new channels to demodulators
+    for channel in channels:
+        if channel not in get_demod_freqs(demodulators):
+            for demodulator in demodulators:
+                if (demodulator.center_freq == 0) and \
+                        (channel not in get_demod_freqs(demodulators)):
+                    demodulator.set_center_freq(channel, rf_center_freq)
+
+
+def make_channel_lists(num_channels, num_cycles=50, churn=0.2, seed=0):
+    """Make channel lists for a run of scan cycles
+
+    Args:
+        num_channels (int): Number of channels in each list
+        num_cycles (int): Number of scan cycles
+        churn (float): Fraction of channels replaced each cycle
+        seed (int): Seed for the random number generator
+
+    Returns:
+        List[list]: Baseband channels in Hz for each scan cycle
+    """
+    rand = np.random.RandomState(seed)
+    raster = (np.arange(1, 1601) * 5000.0).tolist()
+    channels = rand.choice(raster, num_channels, replace=False).tolist()
+    channel_lists = []
+    for _ in range(num_cycles):
+        for idx in rand.choice(num_channels, int(churn*num_channels),
+                               replace=False):
+            channels[idx] = raster[rand.randint(len(raster))]
+        channel_lists.append(list(channels))
+    return channel_lists
+
+
+def bench_assignment():
+    """Compare the nested loop and DemodAssigner channel assignment
+
+    Checks both tune the same channels, then prints the time per scan cycle
+    against the number of demodulators and detected channels
+    """
+    print "Benchmark demodulator assignment per scan cycle"
+    print "%6s %8s %12s %12s %8s" % ("demods", "channels", "loop (us)",
+                                     "map (us)", "speedup")
+    for num_demod in (4, 16, 64, 128):
+        for num_channels in (num_demod/2, num_demod, 2*num_demod):
+            channel_lists = make_channel_lists(num_channels)
+
+            def run_loop():
+                """Run the scan cycles with the nested loops"""
+                demodulators = [FakeDemodulator() for _ in range(num_demod)]
+                for channels in channel_lists:
+                    assign_channels_loop(demodulators, channels, 0)
+                return demodulators
+
+            def run_map():
+                """Run the scan cycles with the DemodAssigner"""
+                demodulators = [FakeDemodulator() for _ in range(num_demod)]
+                demod_assigner = assigner.DemodAssigner(demodulators)
+                for channels in channel_lists:
+                    demod_assigner.assign(channels, 0)
+                return demodulators
+
+            if set(get_demod_freqs(run_loop())) != \
+                    set(get_demod_freqs(run_map())):
+                print "Tuned channels differ at %d demods and %d channels" % \
+                    (num_demod, num_channels)
+            loop_time = time_call(run_loop, 3)/len(channel_lists)
+            map_time = time_call(run_map, 3)/len(channel_lists)
+            print "%6d %8d %12.1f %12.1f %8.1f" % (num_demod, num_channels,
+                                                   loop_time*1E6,
+                                                   map_time*1E6,
+                                                   loop_time/map_time)
+    print ""
+
+
+def legacy_decimation_macs(samp_rate, audio_rate=8000):
+    """Costs the original fixed decimation of the tuners
+
+    Stages of 5, 5, int(samp_rate/1E6) and 5, with the first two filters
+    designed at a normalized 0.090 cutoff and 0.010 transition, all with
+    complex taps, and the arbitrary resampler for the rest
+
+    Kept as the reference for planner.plan_decimation()
+
+    Args:
+        samp_rate (float): Input sample rate in sps
+        audio_rate (float): Output audio rate in sps
+
+    Returns:
+        float: Real MACs per input sample
+    """
+    decim = int(samp_rate/1E6)
+    macs = planner.num_taps(1, 0.010) * 4 / 5.0
+    macs += planner.num_taps(1, 0.010) * 4 / 25.0
+    macs += planner.num_taps(samp_rate/25, 1E3) * 4 / (25.0*decim)
+    macs += planner.num_taps(samp_rate/(25*decim), 500) / (125.0*decim)
+    resamp_rate = audio_rate/(samp_rate/(125.0*decim))
+    macs += planner.resampler_macs(resamp_rate) * audio_rate/samp_rate
+    return macs
+
+
+def bench_decimation():
+    """Compare the fixed and planned tuner decimation at common SDR rates
+
+    Prints the real MACs per input sample of each, and the plan
+    """
+    print "Benchmark tuner decimation (real MACs per input sample)"
+    print "%7s %8s %8s %8s  %s" % ("Msps", "fixed", "planned", "saving",
+                                   "plan (decim(taps))")
+    for samp_rate in (1E6, 1.024E6, 1.4E6, 1.8E6, 2.048E6, 2.4E6, 2.56E6,
+                      2.88E6, 3.2E6, 4E6, 5E6, 6E6, 8E6, 10E6, 12.5E6, 16E6,
+                      20E6):
+        start = timeit.default_timer()
+        plan = planner.plan_decimation(samp_rate)
+        plan_time = timeit.default_timer() - start
+        legacy_macs = legacy_decimation_macs(samp_rate)
+        print "%7.3f %8.1f %8.1f %7.1fx  %s (%.0f ms)" % (
+            samp_rate/1E6, legacy_macs, plan.macs, legacy_macs/plan.macs,
+            planner.describe_plan(plan), plan_time*1E3)
+    print ""
+
+
+def run_front_end(samp_rate, num_demod, channelizer, num_samples):
+    """Run demodulators on a null source and measure the CPU time
+
+    Needs GNU Radio, but not any SDR hardware
+
+    Args:
+        samp_rate (float): Sample rate in sps
+        num_demod (int): Number of NBFM demodulators
+        channelizer (bool): Feed the demodulators from a channelizer if True,
+            otherwise each from the full rate source
+        num_samples (int): Number of samples to process
+
+    Returns:
+        float: CPU seconds (user + system) to process the samples
+    """
+    # pylint: disable=too-many-locals
+    from gnuradio import gr
+    from gnuradio import blocks
+    from gnuradio.filter import pfb
+    import receiver
+
+    top_block = gr.top_block()
+    src = blocks.head(gr.sizeof_gr_complex, num_samples)
+    top_block.connect(blocks.null_source(gr.sizeof_gr_complex), src)
+
+    if channelizer:
+        num_slices, slice_spacing = receiver.channelizer_slices(samp_rate)
+        chan = pfb.channelizer_ccf(num_slices,
+                                   receiver.channelizer_taps(num_slices), 2)
+        top_block.connect(src, chan)
+        for idx in range(num_slices):
+            top_block.connect((chan, idx),
+                              blocks.null_sink(gr.sizeof_gr_complex))
+        demod_rate = 2 * slice_spacing
+    else:
+        demod_rate = samp_rate
+
+    # Spread the demodulators over the band, as if all were active
+    for idx in range(num_demod):
+        demodulator = receiver.TunerDemodNBFM(demod_rate, 8000, False)
+        center_freq = (idx + 0.5)/num_demod * samp_rate - samp_rate/2
+        if channelizer:
+            slice_idx = int(round(center_freq/slice_spacing))
+            top_block.connect((chan, slice_idx % num_slices), demodulator)
+            demodulator.set_center_freq(
+                center_freq, 0, center_freq - slice_idx*slice_spacing)
+        else:
+            top_block.connect(src, demodulator)
+            demodulator.set_center_freq(center_freq, 0)
+        top_block.connect(demodulator, blocks.null_sink(gr.sizeof_float))
+
+    start = os.times()
+    top_block.run()
+    stop = os.times()
+    return (stop[0] - start[0]) + (stop[1] - start[1])
+
+
+def bench_front_end():
+    """Compare the CPU of the per-demod xlating and channelizer front ends
+
+    Prints the CPU time per second of samples against sample rate and
+    number of demodulators, so 1.0 is a whole core in real time
+    """
+    try:
+        import gnuradio # pylint: disable=unused-variable
+    except ImportError:
+        print "Benchmark front end skipped, needs GNU Radio"
+        print ""
+        return
+    print "Benchmark front end CPU (cores in real time)"
+    print "%6s %6s %10s %12s %8s" % ("Msps", "demods", "xlating",
+                                     "channelizer", "speedup")
+    for samp_rate in (4E6, 8E6, 16E6):
+        num_samples = int(2 * samp_rate)
+        for num_demod in (4, 16, 32):
+            xlating_time = run_front_end(samp_rate, num_demod, False,
+                                         num_samples)
+            channelizer_time = run_front_end(samp_rate, num_demod, True,
+                                             num_samples)
+            seconds = num_samples/samp_rate
+            print "%6.1f %6d %10.2f %12.2f %8.1f" % (
+                samp_rate/1E6, num_demod, xlating_time/seconds,
+                channelizer_time/seconds, xlating_time/channelizer_time)
+    print ""
+
+
+def main():
+    """Run the benchmarks"""
+    bench_channel_estimate()
+    bench_assignment()
+    bench_decimation()
+    bench_front_end()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -41,11 +41,13 @@ class SpectrumWindow(object):
         # Right end of window resreved for string of N charachters
         self.chars = 7
 
-    def draw_spectrum(self, data):
+    def draw_spectrum(self, data, threshold=None):
         """Scales input spectral data to window dimensions and draws bar graph
 
         Args:
             data (numpy.ndarray): FFT power spectrum data in linear, not dB
+            threshold (numpy.ndarray): Threshold of each FFT bin in linear,
+                drawn as a curve instead of the threshold_db line if not None
 
         Test cases for data with min_db=-100 and max_db=0 on 80x24 terminal:
             1.0E-10 draws nothing since it is not above -100 dB
@@ -106,14 +108,34 @@ class SpectrumWindow(object):
         self.win.addnstr(max_y, 1 + self.dims[1] - self.chars, string,
                          self.chars, curses.color_pair(3))
 
-        # Generate threshold line, clip to window, and convert to int
-        pos_yt = (self.threshold_db - self.max_db) * scale
-        pos_yt = np.clip(pos_yt, min_y, max_y-1)
-        pos_yt = pos_yt.astype(int)
+        if threshold is None:
+            # Generate threshold line, clip to window, and convert to int
+            pos_yt = (self.threshold_db - self.max_db) * scale
+            pos_yt = np.clip(pos_yt, min_y, max_y-1)
+            pos_yt = pos_yt.astype(int)
 
-        # Draw the theshold line
-        # x=1 start to account for left border
-        self.win.hline(pos_yt, 1, "-", len(pos_y))
+            # Draw the theshold line
+            # x=1 start to account for left border
+            self.win.hline(pos_yt, 1, "-", len(pos_y))
+        else:
+            # Use the minimum threshold in each window bin so a bar drawn
+            # above the curve means at least one bin could be detected
+            win_bins = np.array_split(threshold, self.dims[1]-self.chars)
+            win_bin_min_db = 10*np.log10([np.min(win_bin)
+                                          for win_bin in win_bins])
+
+            # Generate threshold curve, clip to window, and convert to int
+            pos_yts = (win_bin_min_db - self.max_db) * scale
+            pos_yts = np.clip(pos_yts, min_y, max_y-1)
+            pos_yts = pos_yts.astype(int)
+
+            # Draw the threshold curve
+            # x=1 start to account for left border
+            for pos_x in range(len(pos_yts)):
+                self.win.addch(pos_yts[pos_x], pos_x+1, "-")
+
+            # Put the threshold (margin) string at the right end of the curve
+            pos_yt = pos_yts[-1]
 
         # Draw the theshold string
         string = ">" + "%+03d" % self.threshold_db
@@ -161,6 +183,88 @@ class SpectrumWindow(object):
         return False
 
 
+class StatsWindow(object):
+    """Curses block performance window, shown over the spectrum window
+
+    Args:
+        screen (object): a curses screen object
+
+    Attributes:
+        visible (bool): Show instead of the spectrum if True
+    """
+    def __init__(self, screen):
+        self.screen = screen
+        self.visible = False
+
+        # Create a window object in top half of the screen, within the border
+        screen_dims = screen.getmaxyx()
+        height = int(screen_dims[0]/2.0)
+        width = screen_dims[1]-2
+        self.win = curses.newwin(height, width, 1, 1)
+        self.dims = self.win.getmaxyx()
+
+    def draw_stats(self, stats, startup_times=None, spectrum_text=""):
+        """Draws the busiest blocks first, as many as fit
+
+        Without block stats the time of each step of start up is drawn
+
+        Args:
+            stats (tuple): BlockStat of each block and group, or None if the
+                performance counters are not sampled
+            startup_times (OrderedDict): Time in seconds of each step of
+                start up, or None
+            spectrum_text (string): Plan and estimated cost of the spectrum
+        """
+        # Clear previous contents, draw border, and title
+        self.win.clear()
+        self.win.border(0)
+        self.win.addnstr(0, self.dims[1]/2-5, "BLOCK STATS", 11,
+                         curses.color_pair(4))
+
+        self.win.addnstr(1, 1, spectrum_text, self.dims[1]-2)
+        if stats is None:
+            text = "Run with --perf for block statistics"
+            self.win.addnstr(2, 1, text, self.dims[1]-2)
+            if startup_times:
+                text = "%-20s %7s" % ("Start up", "ms")
+                self.win.addnstr(4, 1, text, self.dims[1]-2,
+                                 curses.color_pair(3))
+                for idx, (name, seconds) in \
+                        enumerate(startup_times.items()[:self.dims[0]-7]):
+                    text = "%-20s %7.1f" % (name[:20], 1E3*seconds)
+                    self.win.addnstr(idx+5, 1, text, self.dims[1]-2)
+        else:
+            text = "%-20s %7s %10s %5s %5s" % ("Block", "Work %", "kItems/s",
+                                               "In %", "Out %")
+            self.win.addnstr(2, 1, text, self.dims[1]-2, curses.color_pair(3))
+            stats = sorted(stats, key=lambda stat: stat.work, reverse=True)
+            for idx, stat in enumerate(stats[:self.dims[0]-4]):
+                text = "%-20s %7.1f %10.1f %5.0f %5.0f" % (
+                    stat.name[:20], 100*stat.work, stat.rate/1E3,
+                    100*stat.in_full, 100*stat.out_full)
+                self.win.addnstr(idx+3, 1, text, self.dims[1]-2)
+
+        # Hide cursor
+        self.win.leaveok(1)
+
+        # Update virtual window
+        self.win.noutrefresh()
+
+    def proc_keyb(self, keyb):
+        """Process keystrokes to show or hide with 'i'
+
+        Args:
+            keyb (int): keystroke in ASCII
+
+        Returns:
+            bool: True if the window was shown or hidden, False if not
+        """
+        if keyb == ord('i'):
+            self.visible = not self.visible
+            return True
+        return False
+
+
 class ChannelWindow(object):
     """Curses channel display window
 
@@ -314,6 +418,7 @@ class RxWindow(object):
         bb_gain_db (int): Hardware BB gain in dB
         squelch_db (int): Squelch in dB
         volume_dB (int): Volume in dB
+        num_demod (int): Number of demodulators
         record (bool): Record audio to file if True
         lockout_file_name (string): Name of file with channels to lockout
         priority_file_name (string): Name of file with channels for priority
@@ -333,6 +438,7 @@ class RxWindow(object):
         self.squelch_db = -60
         self.volume_db = 0
         self.type_demod = 0
+        self.num_demod = 4
         self.record = True
         self.lockout_file_name = ""
         self.priority_file_name = ""
@@ -374,7 +480,7 @@ class RxWindow(object):
         self.win.addnstr(7, 1, text, 15)
         text = "Record        : "
         self.win.addnstr(8, 1, text, 15)
-        text = "Demod Type    : "
+        text = "Demod Type/N  : "
         self.win.addnstr(9, 1, text, 15)
         text = "Files         : "
         self.win.addnstr(10, 1, text, 15)
@@ -399,8 +505,8 @@ class RxWindow(object):
         self.win.addnstr(7, 17, text, 8, curses.color_pair(5))
         text = str(self.record)
         self.win.addnstr(8, 17, text, 8)
-        text = str(self.type_demod)
-        self.win.addnstr(9, 17, text, 8)
+        text = str(self.type_demod) + "/" + str(self.num_demod)
+        self.win.addnstr(9, 17, text, 8, curses.color_pair(5))
         text = str(self.lockout_file_name) + " " + str(self.priority_file_name)
         self.win.addnstr(10, 17, text, 20)
 
@@ -487,6 +593,7 @@ class RxWindow(object):
         Tune gain_db in 10 dB steps with 'g' and 'f'
         Tune squelch_db in 1 dB steps with 's' and 'a'
         Tune volume_db in 1 dB steps with '.' and ','
+        Add or remove a demodulator with '+' and '-'
 
         Args:
             keyb (int): keystroke in ASCII
@@ -559,6 +666,13 @@ class RxWindow(object):
         elif keyb == ord(','):
             self.volume_db -= 1
             return True
+        # Add or remove a demodulator with '+' and '-'
+        elif keyb == ord('+'):
+            self.num_demod += 1
+            return True
+        elif keyb == ord('-'):
+            self.num_demod = max(1, self.num_demod - 1)
+            return True
         else:# pylint: disable=too-many-return-statements
             return False
 
@@ -32,36 +32,129 @@ def channel_estimate(spectrum, threshold):
     """Channel estimate
 
     Takes spectrum bins and returns channels above threshold
+    Runs of contiguous bins above threshold are found from the edges of a
+    boolean mask, then each run is reduced to its power weighted average
+    Equivalent to calling avg_freq() on each run, without the Python loop
 
     Args:
         spectrum (numpy.ndarray): FFT power spectrum in linear, not dB
-        threshold (float): Threshold value in linear, not dB
+        threshold (float or numpy.ndarray): Threshold value in linear, not dB
+            Either a single value or one value per bin (e.g. from cfar())
 
     Returns:
         List[float]: List of fractional indices into spectrum of channel center
     """
 
-    # Append a zero to handle last bin above threshold
-    spectrum = np.append(spectrum, np.zeros(1))
+    spectrum = np.asarray(spectrum, dtype=np.float64)
 
+    # Pad the mask with a zero at each end so every run has a rising
+    # and a falling edge, even at the first and last bin
+    mask = np.zeros(len(spectrum) + 2, dtype=np.int8)
+    mask[1:-1] = spectrum > threshold
+    edges = np.diff(mask)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return []
+
+    # Keep only the bins above threshold and label each with its run
+    lengths = stops - starts
+    runs = np.repeat(np.arange(len(starts)), lengths)
+    bins = spectrum[mask[1:-1].astype(bool)]
+
+    # Offset of each bin from the start of its run
+    offsets = np.arange(len(bins)) - np.repeat(np.cumsum(lengths) - lengths,
+                                               lengths)
+
+    # Grouped sums of weighted power and power for each run
+    # bincount() adds in bin order, so the sums round exactly as avg_freq()
+    weighted_power = np.bincount(runs, offsets*bins, len(starts))
+    sum_power = np.bincount(runs, bins, len(starts))
+
+    channels = starts + weighted_power / sum_power
+    return channels.tolist()
+
+
+def cfar_noise_floor(spectrum, num_ref=16, num_guard=2, method=0):
+    """CFAR noise floor
+
+    Estimates the local noise floor under each bin from the reference cells
+    either side of it, skipping the guard cells next to the bin under test
+    so a channel's own power does not raise its noise estimate
+    Cell averaging (CA) takes the mean of the reference cells
+    Ordered statistic (OS) takes their median, which ignores strong
+    neighbouring channels inside the reference window
+    Computed for every bin at once, without a Python loop
+
+    Args:
+        spectrum (numpy.ndarray): FFT power spectrum in linear, not dB
+        num_ref (int): Number of reference cells each side of the bin
+        num_guard (int): Number of guard cells each side of the bin
+        method (int): Noise estimate (0=cell averaging, 1=ordered statistic)
+
+    Returns:
+        numpy.ndarray: Noise floor of each bin in linear, not dB
+
+    Raises:
+        ValueError: If the method is not 0 or 1
+    """
+
+    if method not in (0, 1):
+        raise ValueError, "Unknown CFAR method %s" % method
+    spectrum = np.asarray(spectrum, dtype=np.float64)
     length = len(spectrum)
-    bins = []
-    channels = []
-    index = 0
-    while index < length:
-        if spectrum[index] > threshold:
-            # If spectrum > threshold then append to bins list
-            bins.append(spectrum[index])
-            index += 1
-        elif len(bins) != 0:
-            # Spectrum < threshold so find average freq and append to channels
-            channels.append(index - len(bins) + avg_freq(bins))
-            index += 1
-            bins = []
-        else:
-            # Spectrum < threshold so move on
-            index += 1
-    return channels
+
+    if method == 1:
+        # Reflect the spectrum at the band edges so every bin has a full
+        # set of reference cells, then take the median of each window
+        pad = num_guard + num_ref
+        padded = np.pad(spectrum, pad, 'reflect')
+        stride = padded.strides[0]
+        left = np.lib.stride_tricks.as_strided(
+            padded, (length, num_ref), (stride, stride))
+        right = np.lib.stride_tricks.as_strided(
+            padded[pad + num_guard + 1:], (length, num_ref), (stride, stride))
+        return np.median(np.hstack((left, right)), axis=1)
+
+    # Reference cells are [index-num_guard-num_ref, index-num_guard) on the
+    # left and (index+num_guard, index+num_guard+num_ref] on the right
+    index = np.arange(length)
+    left_lo = np.clip(index - num_guard - num_ref, 0, length)
+    left_hi = np.clip(index - num_guard, 0, length)
+    right_lo = np.clip(index + num_guard + 1, 0, length)
+    right_hi = np.clip(index + num_guard + num_ref + 1, 0, length)
+
+    # Window sums from a cumulative sum, so each bin costs the same however
+    # wide the window, and edge bins average only the cells that exist
+    cumsum = np.zeros(length + 1)
+    np.cumsum(spectrum, out=cumsum[1:])
+    total = (cumsum[left_hi] - cumsum[left_lo]) + \
+        (cumsum[right_hi] - cumsum[right_lo])
+    count = (left_hi - left_lo) + (right_hi - right_lo)
+    return total / np.maximum(count, 1)
+
+
+def cfar(spectrum, margin, num_ref=16, num_guard=2, method=0):
+    """CFAR threshold
+
+    Constant false alarm rate threshold set a margin above the local noise
+    floor, rather than at an absolute level, so the band edge filter
+    roll-off and a drifting noise floor do not produce phantom channels
+
+    Args:
+        spectrum (numpy.ndarray): FFT power spectrum in linear, not dB
+        margin (float): Threshold above the noise floor in linear, not dB
+        num_ref (int): Number of reference cells each side of the bin
+        num_guard (int): Number of guard cells each side of the bin
+        method (int): Noise estimate (0=cell averaging, 1=ordered statistic)
+
+    Returns:
+        numpy.ndarray: Threshold of each bin in linear, not dB
+
+    Raises:
+        ValueError: If the method is not 0 or 1
+    """
+    return margin * cfar_noise_floor(spectrum, num_ref, num_guard, method)
 
 
 def main():
@@ -93,6 +186,30 @@ def main():
         print "Test Fail"
     print ""
 
+    # Test cfar()
+    print "Testing cfar()"
+    data = np.ones(64)
+    data[0:4] = 0.1
+    data[30:33] = 100
+    margin = 10
+    print "Input spectrum is unity with a roll-off at 0-3 and channel at 30-32"
+    print "Margin is " + str(margin)
+    for method in (0, 1):
+        result = channel_estimate(data, cfar(data, margin, 8, 2, method))
+        print "Method %d channels at %s" % (method, str(result))
+        if result == [31.0]:
+            print "Test Pass"
+        else:
+            print "Test Fail"
+    try:
+        cfar(data, margin, 8, 2, 2)
+        print "Method 2 accepted"
+        print "Test Fail"
+    except ValueError:
+        print "Method 2 rejected"
+        print "Test Pass"
+    print ""
+
 
 if __name__ == '__main__':
     try:
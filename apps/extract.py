@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 15:02:11 2026
+
+@author: madengr
+"""
+
+from optparse import OptionParser
+import os
+import time
+import spool
+
+
+def find_segments(entries, freq=0, tolerance=2.5E3, after=0, before=0):
+    """Finds the segments of a frequency and time span in the index
+
+    Args:
+        entries (List[IndexEntry]): Index of the spool
+        freq (float): RF frequency in Hz, or 0 for all
+        tolerance (float): Frequency tolerance in Hz
+        after (float): Earliest start time since the epoch, or 0 for any
+        before (float): Latest start time since the epoch, or 0 for any
+
+    Returns:
+        List[IndexEntry]: Segments found, in the order they were appended
+    """
+    return [entry for entry in entries
+            if (freq == 0 or abs(entry.rf_freq - freq) <= tolerance) and
+            entry.start >= after and (before == 0 or entry.start <= before)]
+
+
+def describe_segments(segments):
+    """Describes a recording on one line
+
+    Args:
+        segments (List[IndexEntry]): Index records of its segments
+
+    Returns:
+        string: Frequency, start time, duration, and place in the spool
+    """
+    entry = segments[0]
+    text = "%.3f MHz  %s  %6.1f s  spool %d at %d" % (
+        entry.rf_freq/1E6,
+        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.start)),
+        sum(segment.duration for segment in segments), entry.spool_num,
+        entry.offset)
+    if len(segments) > 1:
+        text += ", %d segments" % len(segments)
+    return text
+
+
+def main():
+    """Lists or extracts transmissions from a spool as wav files"""
+    usage = "usage: %prog [options]"
+    parser = OptionParser(usage=usage)
+
+    parser.add_option("-d", "--directory", type="string", dest="directory",
+                      default="spool",
+                      help="Directory of the spool and index files")
+
+    parser.add_option("-f", "--freq", type="float", dest="freq", default=0,
+                      help="RF frequency in MHz to extract (0 for all)")
+
+    parser.add_option("-t", "--tolerance", type="float", dest="tolerance",
+                      default=2.5,
+                      help="Frequency tolerance in kHz")
+
+    parser.add_option("-a", "--after", type="float", dest="after", default=0,
+                      help="Earliest start time, in s since the epoch")
+
+    parser.add_option("-b", "--before", type="float", dest="before",
+                      default=0,
+                      help="Latest start time, in s since the epoch "
+                      "(0 for any)")
+
+    parser.add_option("-o", "--output", type="string", dest="output",
+                      default="wav",
+                      help="Directory to write the wav files to")
+
+    parser.add_option("-l", "--list", action="store_true", dest="list_only",
+                      default=False,
+                      help="List the transmissions rather than extract them")
+
+    parser.add_option("-j", "--join", action="store_true", dest="join",
+                      default=False,
+                      help="Join the segments of each long recording into "
+                      "one file")
+
+    options = parser.parse_args()[0]
+
+    try:
+        entries = spool.read_index(options.directory)
+    except IOError:
+        parser.error("no spool index in %s" % options.directory)
+
+    # The segments of a recording are joined before finding, so all of
+    # those of a recording that starts in the time span are kept
+    if options.join:
+        recordings = spool.join_segments(entries)
+    else:
+        recordings = [[entry] for entry in entries]
+    recordings = [segments for segments in recordings if find_segments(
+        segments[:1], options.freq*1E6, options.tolerance*1E3,
+        options.after, options.before)]
+
+    if not options.list_only and recordings and \
+            not os.path.isdir(options.output):
+        os.makedirs(options.output)
+    for segments in recordings:
+        print describe_segments(segments)
+        if not options.list_only:
+            # Named by the first segment, so unique
+            file_name = os.path.join(options.output,
+                                     spool.segment_name(segments[0]))
+            data = "".join(spool.read_segment(options.directory, segment)
+                           for segment in segments)
+            spool.write_wav(file_name, segments[0], data)
+    print "%d transmissions" % len(recordings)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
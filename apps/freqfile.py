@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:20:07 2026
+
+@author: madengr
+"""
+
+import os
+import time
+import numpy as np
+
+
+def parse_freq(text):
+    """Parses a frequency in Hz, or in MHz if below 1 MHz
+
+    Args:
+        text (string): Frequency such as "146520000" or "146.52"
+
+    Returns:
+        float: Frequency in Hz
+    """
+    freq = float(text)
+    if abs(freq) < 1E6:
+        freq *= 1E6
+    return freq
+
+
+def parse_entry(entry):
+    """Parses a frequency file entry to an interval
+
+    Entries are a single frequency such as "146.52" or "146520000",
+    a range such as "152.0075-152.2475", or trailing wildcard digits
+    such as "462.5**" for 462.500 to 462.599... MHz
+    Frequencies are in Hz, or in MHz if below 1 MHz
+
+    Args:
+        entry (string): Frequency file entry
+
+    Returns:
+        (float, float): Lowest and highest frequency in Hz of the entry
+
+    Raises:
+        ValueError: Entry is not a frequency, range or wildcard
+    """
+    entry = entry.strip()
+    if '*' in entry:
+        # Wildcards may only replace trailing digits
+        stars = entry.index('*')
+        if entry[stars:].strip('*.') != '':
+            raise ValueError("Wildcards must be trailing digits: " + entry)
+        low = entry.replace('*', '0')
+        high = entry.replace('*', '9')
+        # Top of the wildcard is one unit of the last digit above high
+        if '.' in high:
+            unit = 10**-len(high.split('.')[1])
+        else:
+            unit = 1
+        low = float(low)
+        high = float(high) + unit
+        if high <= 1E6:
+            low *= 1E6
+            high *= 1E6
+        # Upper edge is excluded, so stop just below it
+        return low, np.nextafter(high, low)
+    elif '-' in entry[1:]:
+        split = entry.index('-', 1)
+        low = parse_freq(entry[:split])
+        high = parse_freq(entry[split+1:])
+        return min(low, high), max(low, high)
+    else:
+        freq = parse_freq(entry)
+        return freq, freq
+
+
+class FrequencyFile(object):
+    """File of EOL delimited frequencies, ranges, and wildcards
+
+    The file is only parsed again when its modification time or size change
+    Single frequencies are kept as a sorted array
+    Ranges and wildcards are merged into a sorted interval index, which is
+    searched for a whole array of frequencies at once
+    Text after a '#' is a comment
+
+    Args:
+        file_name (string): Name of the file, or "" for an empty list
+
+    Attributes:
+        singles (numpy.ndarray): Single frequencies in Hz, in file order
+        starts (numpy.ndarray): Sorted start of each range in Hz
+        stops (numpy.ndarray): Stop of each range in Hz
+        stamp (tuple): Modification time and size when last parsed
+    """
+
+    def __init__(self, file_name=""):
+        self.file_name = file_name
+        self.singles = np.zeros(0)
+        self.starts = np.zeros(0)
+        self.stops = np.zeros(0)
+        self.stamp = None
+
+    def reload(self):
+        """Parses the file again if it has changed since last parsed
+
+        Returns:
+            bool: True if the file was parsed, False if unchanged
+        """
+        if self.file_name == "":
+            return False
+        stat = os.stat(self.file_name)
+        stamp = (stat.st_mtime, stat.st_size)
+        if stamp == self.stamp:
+            return False
+
+        singles = []
+        ranges = []
+        with open(self.file_name) as freq_file:
+            for line in freq_file:
+                entry = line.split('#')[0].strip()
+                if entry == "":
+                    continue
+                low, high = parse_entry(entry)
+                if low == high:
+                    singles.append(low)
+                else:
+                    ranges.append((low, high))
+        self.singles = np.array(singles, dtype=np.float64)
+        self.starts, self.stops = merge_ranges(ranges)
+        self.stamp = stamp
+        return True
+
+    def contains(self, freqs):
+        """Tests frequencies against the ranges and wildcards
+
+        Args:
+            freqs (numpy.ndarray): Frequencies in Hz
+
+        Returns:
+            numpy.ndarray: True for each frequency within a range
+        """
+        freqs = np.asarray(freqs, dtype=np.float64)
+        if len(self.starts) == 0:
+            return np.zeros(freqs.shape, dtype=bool)
+        idx = np.searchsorted(self.starts, freqs, 'right') - 1
+        return (idx >= 0) & (freqs <= self.stops[np.maximum(idx, 0)])
+
+
+class LockoutStore(object):
+    """Interactive lockouts kept by absolute RF frequency
+
+    Lockouts are kept as RF rather than baseband frequencies, so they
+    survive changes of the RF center frequency
+    If a file name is given, the lockouts are loaded from it and saved back
+    Saves are batched, at most once per flush_interval, and atomic, by
+    writing a temporary file and renaming it over the old one
+
+    Args:
+        file_name (string): Name of the file, or "" to keep in memory only
+        flush_interval (float): Minimum time in seconds between saves
+
+    Attributes:
+        freqs (set): Locked out RF frequencies in Hz, rounded to integer Hz
+        dirty (bool): True if lockouts have changed since last saved
+    """
+
+    def __init__(self, file_name="", flush_interval=5.0):
+        self.file_name = file_name
+        self.flush_interval = flush_interval
+        self.freqs = set()
+        self.dirty = False
+        self.last_flush = 0
+        if self.file_name != "" and os.path.exists(self.file_name):
+            with open(self.file_name) as store_file:
+                for line in store_file:
+                    entry = line.split('#')[0].strip()
+                    if entry != "":
+                        self.freqs.add(int(round(parse_freq(entry))))
+
+    def add(self, freq):
+        """Adds a lockout
+
+        Args:
+            freq (float): RF frequency in Hz
+        """
+        freq = int(round(freq))
+        if freq not in self.freqs:
+            self.freqs.add(freq)
+            self.dirty = True
+
+    def clear(self):
+        """Clears all lockouts
+        """
+        if self.freqs:
+            self.freqs = set()
+            self.dirty = True
+
+    def array(self):
+        """Gets the lockouts as an array
+
+        Returns:
+            numpy.ndarray: Locked out RF frequencies in Hz
+        """
+        return np.array(sorted(self.freqs), dtype=np.float64)
+
+    def flush(self, force=False):
+        """Saves the lockouts if changed and flush_interval has passed
+
+        Args:
+            force (bool): Save if changed, even within flush_interval
+        """
+        now = time.time()
+        if self.file_name == "" or not self.dirty or \
+                (not force and now - self.last_flush < self.flush_interval):
+            return
+        temp_name = self.file_name + ".tmp"
+        with open(temp_name, 'w') as store_file:
+            for freq in sorted(self.freqs):
+                store_file.write(str(freq) + "\n")
+            store_file.flush()
+            os.fsync(store_file.fileno())
+        os.rename(temp_name, self.file_name)
+        self.dirty = False
+        self.last_flush = now
+
+
+def merge_ranges(ranges):
+    """Sorts and merges overlapping ranges
+
+    Args:
+        ranges (list): List of (low, high) frequencies in Hz
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): Sorted starts and stops of the
+            merged, non-overlapping ranges
+    """
+    starts = []
+    stops = []
+    for low, high in sorted(ranges):
+        if starts and low <= stops[-1]:
+            stops[-1] = max(stops[-1], high)
+        else:
+            starts.append(low)
+            stops.append(high)
+    return np.array(starts, dtype=np.float64), np.array(stops,
+                                                         dtype=np.float64)
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test parse_entry()
+    print "Testing parse_entry()"
+    entries = ["146520000", "146.52", "152.0075-152.2475", "462.5**"]
+    result = [parse_entry(entry) for entry in entries]
+    print "Entries " + str(entries)
+    print "Intervals " + str(result)
+    if result[0] == result[1] == (146.52E6, 146.52E6) and \
+            result[2] == (152.0075E6, 152.2475E6) and \
+            result[3][0] == 462.5E6 and 462.599E6 < result[3][1] < 462.6E6:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+    # Test FrequencyFile.contains()
+    print "Testing FrequencyFile.contains()"
+    freq_file = FrequencyFile()
+    freq_file.starts, freq_file.stops = merge_ranges(
+        [(152E6, 153E6), (152.5E6, 154E6), (160E6, 161E6)])
+    freqs = [151.9E6, 152E6, 153.5E6, 155E6, 160.5E6, 162E6]
+    result = freq_file.contains(freqs).tolist()
+    print "Ranges 152-153, 152.5-154, 160-161 MHz"
+    print "Frequencies " + str(freqs)
+    print "Contained " + str(result)
+    if result == [False, True, True, False, True, False]:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
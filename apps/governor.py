@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:41:26 2026
+
+@author: madengr
+"""
+
+import os
+import time
+import multiprocessing
+
+
+class LoadGovernor(object):
+    """Caps the number of active demodulators when the host is overloaded
+
+    Every window seconds the load is measured from the process CPU time,
+    the rate spectra arrive at compared to the expected rate (which drops
+    when the hardware overflows), and optionally the busiest block's share
+    of time in work()
+    If any is over its limit the cap is lowered to one below the number of
+    active demodulators, so one channel is shed per window
+    The cap is raised by one again once all are well within their limits
+    for hold_time seconds
+    The scanner keeps the first channels of its list, so priority channels
+    are shed last
+
+    Args:
+        num_demod (int): Number of demodulators
+        max_load (float): Maximum fraction of all CPU cores to use
+        spectrum_rate (float): Expected spectra per second
+        window (float): Time in seconds to measure the load over
+        hold_time (float): Time in seconds the load must stay low before
+            capacity is handed back
+        min_demod (int): Demodulators that are never shed
+
+    Attributes:
+        limit (int): Maximum number of demodulators the scanner may assign
+        load (float): Last measured fraction of all CPU cores in use
+        rate_ratio (float): Last measured spectrum rate over expected rate
+        busy (float): Last busiest block share of time in work(), or None
+    """
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
+
+    def __init__(self, num_demod, max_load=0.8, spectrum_rate=10.0,
+                 window=2.0, hold_time=5.0, min_demod=1):
+        self.num_demod = num_demod
+        self.max_load = max_load
+        self.spectrum_rate = spectrum_rate
+        self.window = window
+        self.hold_time = hold_time
+        self.min_demod = min_demod
+        self.num_cpus = multiprocessing.cpu_count()
+        self.limit = num_demod
+        self.load = 0.0
+        self.rate_ratio = 1.0
+        self.busy = None
+        self.last_change = 0
+        self.start = None
+
+    def set_num_demod(self, num_demod):
+        """Changes the number of demodulators, keeping any cap below it
+
+        Args:
+            num_demod (int): Number of demodulators
+        """
+        if self.limit >= self.num_demod:
+            self.limit = num_demod
+        else:
+            self.limit = min(self.limit, num_demod)
+        self.num_demod = num_demod
+
+    def update(self, spectrum_seq, num_active, work_times=None, now=None,
+               cpu_time=None):
+        """Measures the load and adjusts the cap once per window
+
+        Args:
+            spectrum_seq (int): Sequence number of the latest spectrum
+            num_active (int): Number of demodulators on a channel
+            work_times (dict): Total time in seconds each block has spent
+                in work(), or None if not known
+            now (float): Time in seconds, or None for time.time()
+            cpu_time (float): Process CPU time in seconds, or None to read it
+
+        Returns:
+            int: Maximum number of demodulators the scanner may assign
+        """
+        if now is None:
+            now = time.time()
+        if cpu_time is None:
+            times = os.times()
+            cpu_time = times[0] + times[1]
+        if self.start is None:
+            self.start = (now, cpu_time, spectrum_seq, work_times)
+            return self.limit
+        elapsed = float(now - self.start[0])
+        if elapsed < self.window:
+            return self.limit
+
+        self.load = (cpu_time - self.start[1])/(elapsed * self.num_cpus)
+        self.rate_ratio = (spectrum_seq - self.start[2])/ \
+            (elapsed * self.spectrum_rate)
+        busy = None
+        if work_times and self.start[3]:
+            # Blocks that have come and gone since the last window are
+            # skipped
+            busy = max([0.0] + [(work_time - self.start[3][name])/elapsed
+                                for name, work_time in work_times.items()
+                                if name in self.start[3]])
+        self.busy = busy
+        self.start = (now, cpu_time, spectrum_seq, work_times)
+
+        overload = self.load > self.max_load or self.rate_ratio < 0.9 or \
+            (busy is not None and busy > self.max_load)
+        # Hand back only with a margin, so the cap does not oscillate
+        headroom = self.load < 0.9*self.max_load and \
+            self.rate_ratio > 0.95 and \
+            (busy is None or busy < 0.9*self.max_load)
+
+        if overload:
+            limit = max(self.min_demod, min(self.limit, num_active) - 1)
+            if limit != self.limit:
+                self.limit = limit
+                self.last_change = now
+        elif headroom and self.limit < self.num_demod and \
+                now - self.last_change >= self.hold_time:
+            self.limit += 1
+            self.last_change = now
+        return self.limit
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test LoadGovernor with a simulated load
+    print "Testing LoadGovernor"
+    governor = LoadGovernor(8, 0.8, 10.0, 1.0, 3.0)
+    governor.num_cpus = 1
+    cpu_time = 0.0
+    limits = []
+    for second in range(20):
+        # Overloaded for the first 5 seconds, then lightly loaded
+        cpu_time += 0.95 if second < 5 else 0.3
+        work_times = {"fft": 0.1*second}
+        limits.append(governor.update(second*10, governor.limit, work_times,
+                                      second, cpu_time))
+    print "Limits " + str(limits)
+    if limits[5] == 4 and limits[-1] == 8 and min(limits) == 4:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -11,6 +11,65 @@ import curses
 import cursesgui
 import parser
 import time
+import metrics as mtrc
+import profiler as prfl
+import planner
+
+def proc_keyb(keyb, scanner, specwin, rxwin, lockoutwin, statswin):
+    """Process a keystroke and update the scanner
+
+    Call with the scanner lock held
+
+    Args:
+        keyb (int): keystroke in ASCII
+        scanner (Scanner): scanner to update
+        specwin (SpectrumWindow): spectrum window
+        rxwin (RxWindow): receiver window
+        lockoutwin (LockoutWindow): lockout window
+        statswin (StatsWindow): block stats window
+    """
+    # Send keystroke to spectrum window and update scanner if True
+    if specwin.proc_keyb(keyb):
+        scanner.set_threshold(specwin.threshold_db)
+
+    # Send keystroke to RX window and update scanner if True
+    if rxwin.proc_keyb_hard(keyb):
+        # Set and update frequency
+        scanner.set_center_freq(rxwin.center_freq)
+        rxwin.center_freq = scanner.center_freq
+
+    if rxwin.proc_keyb_soft(keyb):
+        # Set and update RF gain
+        scanner.set_gain(rxwin.gain_db)
+        rxwin.gain_db = scanner.gain_db
+        # Set and update IF gain
+        scanner.set_if_gain(rxwin.if_gain_db)
+        rxwin.if_gain_db = scanner.if_gain_db
+        # Set and update BB gain
+        scanner.set_bb_gain(rxwin.bb_gain_db)
+        rxwin.bb_gain_db = scanner.bb_gain_db
+        # Set and update squelch
+        scanner.set_squelch(rxwin.squelch_db)
+        rxwin.squelch_db = scanner.squelch_db
+        # Set and update volume
+        scanner.set_volume(rxwin.volume_db)
+        rxwin.volume_db = scanner.volume_db
+        # Set and update number of demodulators
+        if rxwin.num_demod != scanner.num_demod:
+            scanner.set_num_demod(rxwin.num_demod)
+            rxwin.num_demod = scanner.num_demod
+
+    # Send keystroke to lockout window and update lockout channels if True
+    if lockoutwin.proc_keyb_set_lockout(keyb) and rxwin.freq_entry == 'None':
+        # Subtract 48 from ascii keyb value to obtain 0 - 9
+        idx = keyb - 48
+        scanner.add_lockout(idx)
+    if lockoutwin.proc_keyb_clear_lockout(keyb):
+        scanner.clear_lockout()
+
+    # Show or hide the block stats window
+    statswin.proc_keyb(keyb)
+
 
 def main(screen):
     """Start scanner with GUI interface
@@ -18,8 +77,8 @@ def main(screen):
     Initialize and set up screen
     Create windows
     Create scanner object
-    Executes scan cycles
-    Update windows
+    Start scan thread
+    Update windows with latest scan snapshot at frame rate
     Process keyboard strokes
     """
     # pylint: disable=too-many-statements
@@ -42,6 +101,7 @@ def main(screen):
     chanwin = cursesgui.ChannelWindow(screen)
     lockoutwin = cursesgui.LockoutWindow(screen)
     rxwin = cursesgui.RxWindow(screen)
+    statswin = cursesgui.StatsWindow(screen)
 
     # Create scanner object
     ask_samp_rate = PARSER.ask_samp_rate
@@ -54,9 +114,42 @@ def main(screen):
     priority_file_name = PARSER.priority_file_name
     freq_correction = PARSER.freq_correction
     audio_bps = PARSER.audio_bps
+    type_detect = PARSER.type_detect
+    on_hits = PARSER.on_hits
+    on_cycles = PARSER.on_cycles
+    hang_time = PARSER.hang_time
+    lockout_store_name = PARSER.lockout_store_name
+    ring_frames = PARSER.ring_frames
+    channelizer = PARSER.channelizer
+    gate_idle = PARSER.gate_idle
+    max_load = PARSER.max_load
+    perf = PARSER.perf
+    perf_file_name = PARSER.perf_file_name
+    metrics_file_name = PARSER.metrics_file_name
+    metrics_port = PARSER.metrics_port
+    tap_cache_name = PARSER.tap_cache_name
+    bin_width = PARSER.bin_width
+    spectrum_rate = PARSER.spectrum_rate
+    averages = PARSER.averages
+    welch = PARSER.welch
+    fast_time = PARSER.fast_time
+    preroll_time = PARSER.preroll_time
+    codec = PARSER.codec
+    num_writers = PARSER.num_writers
+    spool = PARSER.spool
+    spool_size = PARSER.spool_size
+    gate_hold = PARSER.gate_hold
     scanner = scnr.Scanner(ask_samp_rate, num_demod, type_demod, hw_args,
                            freq_correction, record, lockout_file_name,
-                           priority_file_name, play, audio_bps)
+                           priority_file_name, play, audio_bps, type_detect,
+                           on_hits, on_cycles, hang_time, lockout_store_name,
+                           ring_frames, channelizer, gate_idle, max_load,
+                           perf, perf_file_name, metrics_file_name,
+                           metrics_port, tap_cache_name, bin_width,
+                           spectrum_rate, averages, welch, fast_time,
+                           preroll_time, codec, num_writers, spool,
+                           spool_size, gate_hold)
+    spectrum_text = planner.describe_spectrum(scanner.receiver.spectrum_plan)
 
     # Set the paramaters
     scanner.set_center_freq(PARSER.center_freq)
@@ -77,64 +170,74 @@ def main(screen):
     rxwin.volume_db = scanner.volume_db
     rxwin.record = scanner.record
     rxwin.type_demod = type_demod
+    rxwin.num_demod = scanner.num_demod
     rxwin.lockout_file_name = scanner.lockout_file_name
     rxwin.priority_file_name = scanner.priority_file_name
 
     specwin.threshold_db = scanner.threshold_db
 
-    while 1:
-        # No need to go faster than 10 Hz rate of GNU Radio probe
-        time.sleep(0.1)
-
-        # Initiate a scan cycle
-        scanner.scan_cycle()
-
-        # Update the spectrum, channel, and rx displays
-        specwin.draw_spectrum(scanner.spectrum)
-        chanwin.draw_channels(scanner.gui_tuned_channels)
-        lockoutwin.draw_channels(scanner.gui_lockout_channels)
-        rxwin.draw_rx()
-
-        # Update physical screen
-        curses.doupdate()
-
-        # Get keystroke
-        keyb = screen.getch()
-
-        # Send keystroke to spectrum window and update scanner if True
-        if specwin.proc_keyb(keyb):
-            scanner.set_threshold(specwin.threshold_db)
-
-        # Send keystroke to RX window and update scanner if True
-        if rxwin.proc_keyb_hard(keyb):
-            # Set and update frequency
-            scanner.set_center_freq(rxwin.center_freq)
-            rxwin.center_freq = scanner.center_freq
-
-        if rxwin.proc_keyb_soft(keyb):
-            # Set and update RF gain
-            scanner.set_gain(rxwin.gain_db)
-            rxwin.gain_db = scanner.gain_db
-            # Set and update IF gain
-            scanner.set_if_gain(rxwin.if_gain_db)
-            rxwin.if_gain_db = scanner.if_gain_db
-            # Set and update BB gain
-            scanner.set_bb_gain(rxwin.bb_gain_db)
-            rxwin.bb_gain_db = scanner.bb_gain_db
-            # Set and update squelch
-            scanner.set_squelch(rxwin.squelch_db)
-            rxwin.squelch_db = scanner.squelch_db
-            # Set and update volume
-            scanner.set_volume(rxwin.volume_db)
-            rxwin.volume_db = scanner.volume_db
-
-        # Send keystroke to lockout window and update lockout channels if True
-        if lockoutwin.proc_keyb_set_lockout(keyb) and rxwin.freq_entry == 'None':
-            # Subtract 48 from ascii keyb value to obtain 0 - 9
-            idx = keyb - 48
-            scanner.add_lockout(idx)
-        if lockoutwin.proc_keyb_clear_lockout(keyb):
-            scanner.clear_lockout()
+    # Run the scan cycles in their own thread
+    scan_thread = scnr.ScanThread(scanner, PARSER.scan_rate)
+    scan_thread.start()
+
+    # Render at the frame rate, independent of the scan rate
+    frame_period = 1.0/PARSER.frame_rate
+    next_frame = time.time()
+    drawn_seq = None
+
+    try:
+        while 1:
+            # Stop if the scan thread has failed
+            if scan_thread.error is not None:
+                raise scan_thread.error[0], scan_thread.error[1], \
+                    scan_thread.error[2]
+
+            # Process all keystrokes since the last frame
+            start = mtrc.now()
+            keyb = screen.getch()
+            redraw = keyb != -1
+            while keyb != -1:
+                with scanner.lock:
+                    proc_keyb(keyb, scanner, specwin, rxwin, lockoutwin,
+                              statswin)
+                keyb = screen.getch()
+            start = scanner.metrics.lap("gui_stage_seconds", "keyboard",
+                                        start)
+
+            # Take the latest snapshot once, and only draw it if it is new
+            # or the settings have changed
+            snapshot = scanner.snapshot
+            if snapshot is not None and (redraw or snapshot.seq != drawn_seq):
+                drawn_seq = snapshot.seq
+
+                # Update the spectrum (or stats), channel, and rx displays
+                if statswin.visible:
+                    statswin.draw_stats(snapshot.perf_stats,
+                                        scanner.startup_times,
+                                        spectrum_text)
+                else:
+                    specwin.draw_spectrum(snapshot.spectrum,
+                                          snapshot.threshold_spectrum)
+                chanwin.draw_channels(snapshot.gui_tuned_channels)
+                lockoutwin.draw_channels(snapshot.gui_lockout_channels)
+                rxwin.draw_rx()
+
+                # Update physical screen
+                curses.doupdate()
+                scanner.metrics.lap("gui_stage_seconds", "draw", start)
+
+            # Wait for the next frame, or skip frames if running late
+            next_frame += frame_period
+            delay = next_frame - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.time()
+    finally:
+        # Stop scanning and the receiver and save the lockouts, even on CTRL-C
+        scan_thread.stop()
+        scanner.stop()
+
 
 if __name__ == '__main__':
     try:
@@ -144,7 +247,17 @@ if __name__ == '__main__':
             PARSER.print_help() #pylint: disable=maybe-no-member
             raise SystemExit, 1
         else:
-            curses.wrapper(main)
+            # Profile from the start, so set up time is included
+            PROFILER = None
+            if PARSER.profile_time > 0:
+                PROFILER = prfl.SamplingProfiler(PARSER.profile_file_name,
+                                                 PARSER.profile_time)
+                PROFILER.start()
+            try:
+                curses.wrapper(main)
+            finally:
+                if PROFILER is not None:
+                    PROFILER.stop()
     except KeyboardInterrupt:
         pass
     except RuntimeError:
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:32:48 2026
+
+@author: madengr
+"""
+
+import os
+import bisect
+import threading
+import timeit
+import collections
+import BaseHTTPServer
+
+# Fastest wall clock timer of the platform
+now = timeit.default_timer
+
+# Upper bounds in seconds of the latency histogram buckets, 10 us to 10 s
+LATENCY_BUCKETS = [mantissa * 10**exponent for exponent in range(-5, 1)
+                   for mantissa in (1, 2.5, 5)] + [10]
+
+
+class Histogram(object):
+    """Histogram of fixed buckets, so memory use is constant
+
+    Args:
+        bounds (list): Sorted upper bounds of the buckets
+
+    Attributes:
+        counts [int]: Number of values in each bucket, and above the last
+        total (float): Sum of all values
+        count (int): Number of values
+    """
+
+    def __init__(self, bounds=None):
+        self.bounds = LATENCY_BUCKETS if bounds is None else bounds
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Adds a value
+
+        Args:
+            value (float): Value to add
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics(object):
+    """Histograms and counters of the scanner, exported as Prometheus text
+
+    Metrics are named by a name and an optional label value, such as the
+    stage of a scan cycle, and are made when first used
+    Each metric should only be added to by one thread, but metrics may be
+    made and exported from any thread
+
+    Args:
+        prefix (string): Prefix of the exported metric names
+
+    Attributes:
+        histograms (OrderedDict): Histogram of each (name, label)
+        counters (OrderedDict): Count of each (name, label)
+    """
+
+    def __init__(self, prefix="ham2mon"):
+        self.prefix = prefix
+        self.histograms = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+        self.help = {}
+        self.lock = threading.Lock()
+
+    def describe(self, name, text, label_name=None):
+        """Sets the help text and label name of a metric
+
+        Args:
+            name (string): Name of the metric
+            text (string): Help text
+            label_name (string): Name of the label, or None if not labeled
+        """
+        self.help[name] = (text, label_name)
+
+    def observe(self, name, value, label=None):
+        """Adds a value to a histogram
+
+        Args:
+            name (string): Name of the histogram
+            value (float): Value to add
+            label (string): Label value, or None if not labeled
+        """
+        key = (name, label)
+        if key not in self.histograms:
+            with self.lock:
+                self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    def lap(self, name, label, start):
+        """Adds the time since start to a histogram
+
+        Used to time stages one after the other, e.g.
+            start = metrics.now()
+            ...
+            start = metrics.lap("stage_seconds", "first", start)
+            ...
+            start = metrics.lap("stage_seconds", "second", start)
+
+        Args:
+            name (string): Name of the histogram
+            label (string): Label value, or None if not labeled
+            start (float): Start time from now()
+
+        Returns:
+            float: Time now, the start of the next stage
+        """
+        stop = now()
+        self.observe(name, stop - start, label)
+        return stop
+
+    def count(self, name, amount=1, label=None):
+        """Adds to a counter
+
+        Args:
+            name (string): Name of the counter
+            amount (int): Amount to add
+            label (string): Label value, or None if not labeled
+        """
+        key = (name, label)
+        if key not in self.counters:
+            with self.lock:
+                self.counters[key] = 0
+        self.counters[key] += amount
+
+    def _labels(self, name, label, extra=""):
+        """Formats the labels of a metric
+
+        Args:
+            name (string): Name of the metric
+            label (string): Label value, or None if not labeled
+            extra (string): Further labels, such as le="0.1"
+
+        Returns:
+            string: Labels in braces, or "" if none
+        """
+        labels = []
+        if label is not None:
+            label_name = self.help.get(name, ("", "label"))[1] or "label"
+            labels.append('%s="%s"' % (label_name, label))
+        if extra:
+            labels.append(extra)
+        if not labels:
+            return ""
+        return "{" + ",".join(labels) + "}"
+
+    def _header(self, name, metric_type):
+        """Formats the HELP and TYPE lines of a metric
+
+        Args:
+            name (string): Name of the metric
+            metric_type (string): "counter" or "histogram"
+
+        Returns:
+            List[string]: Lines of text
+        """
+        full_name = self.prefix + "_" + name
+        lines = []
+        if name in self.help:
+            lines.append("# HELP %s %s" % (full_name, self.help[name][0]))
+        lines.append("# TYPE %s %s" % (full_name, metric_type))
+        return lines
+
+    def render(self):
+        """Formats all metrics in the Prometheus text format
+
+        Returns:
+            string: Metrics as text
+        """
+        with self.lock:
+            counters = self.counters.items()
+            histograms = self.histograms.items()
+        lines = []
+        done = set()
+        for (name, _), _ in counters:
+            if name in done:
+                continue
+            done.add(name)
+            lines += self._header(name, "counter")
+            for (other, label), value in counters:
+                if other == name:
+                    lines.append("%s_%s%s %d" % (self.prefix, name,
+                                                 self._labels(name, label),
+                                                 value))
+        for (name, _), _ in histograms:
+            if name in done:
+                continue
+            done.add(name)
+            lines += self._header(name, "histogram")
+            for (other, label), hist in histograms:
+                if other != name:
+                    continue
+                full_name = self.prefix + "_" + name
+                # Copy the counts, as the scan thread may be adding to them
+                counts = list(hist.counts)
+                cumulative = 0
+                for bound, bucket in zip(hist.bounds + ["+Inf"], counts):
+                    cumulative += bucket
+                    lines.append("%s_bucket%s %d" % (
+                        full_name, self._labels(name, label,
+                                                'le="%s"' % bound),
+                        cumulative))
+                lines.append("%s_sum%s %.9f" % (full_name,
+                                                self._labels(name, label),
+                                                hist.total))
+                lines.append("%s_count%s %d" % (full_name,
+                                                self._labels(name, label),
+                                                cumulative))
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_name):
+        """Writes the metrics to a file atomically, e.g. for the node
+        exporter textfile collector
+
+        Args:
+            file_name (string): Name of the file
+        """
+        temp_name = file_name + ".tmp"
+        with open(temp_name, 'w') as metrics_file:
+            metrics_file.write(self.render())
+        os.rename(temp_name, file_name)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serves the metrics over HTTP in a daemon thread
+
+        Args:
+            port (int): TCP port
+            host (string): Address to listen on, localhost by default
+
+        Returns:
+            HTTPServer: The server, call shutdown() to stop it
+        """
+        metrics = self
+
+        class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+            """Answers every GET with the metrics"""
+            # pylint: disable=invalid-name
+
+            def do_GET(self):
+                """Sends the metrics"""
+                text = metrics.render()
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(text)))
+                self.end_headers()
+                self.wfile.write(text)
+
+            def log_message(self, *args):
+                """Keeps requests off the terminal"""
+                pass
+
+        server = BaseHTTPServer.HTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever,
+                                  name="MetricsServer")
+        thread.daemon = True
+        thread.start()
+        return server
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test Metrics.render()
+    print "Testing Metrics.render()"
+    metrics = Metrics()
+    metrics.describe("stage_seconds", "Time of each stage", "stage")
+    metrics.observe("stage_seconds", 0.0003, "estimate")
+    metrics.observe("stage_seconds", 0.02, "estimate")
+    metrics.count("retunes", 3)
+    text = metrics.render()
+    print text
+    if 'ham2mon_stage_seconds_bucket{stage="estimate",le="0.0005"} 1' \
+            in text and \
+            'ham2mon_stage_seconds_bucket{stage="estimate",le="+Inf"} 2' \
+            in text and "ham2mon_retunes 3" in text:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -6,8 +6,61 @@ Created on Sat Jul 18 15:21:33 2015
 @author: madengr
 """
 
-from optparse import OptionParser
-from gnuradio.eng_option import eng_option
+import copy
+from optparse import Option, OptionParser, OptionValueError
+from distutils.spawn import find_executable
+import spool as spl
+
+# Engineering notation suffixes, as gnuradio.eng_notation takes them
+SCALE_FACTORS = {'E': 1E18, 'P': 1E15, 'T': 1E12, 'G': 1E9, 'M': 1E6,
+                 'k': 1E3, 'm': 1E-3, 'u': 1E-6, 'n': 1E-9, 'p': 1E-12,
+                 'f': 1E-15}
+
+
+def eng_float(text):
+    """Converts a number in engineering notation, such as "2.4M"
+
+    Args:
+        text (string): Number with an optional scale factor suffix
+
+    Returns:
+        float: The number
+    """
+    text = text.strip()
+    if text and text[-1] in SCALE_FACTORS:
+        return float(text[:-1]) * SCALE_FACTORS[text[-1]]
+    return float(text)
+
+
+def check_eng_float(option, opt, value):
+    """Checks an eng_float option value for the option parser
+
+    Args:
+        option (Option): The option (unused)
+        opt (string): Option name as typed
+        value (string): Option value as typed
+
+    Returns:
+        float: The value
+    """
+    # pylint: disable=unused-argument
+    try:
+        return eng_float(value)
+    except ValueError:
+        raise OptionValueError, \
+            "option %s: invalid engineering notation value: %r" % (opt, value)
+
+
+class eng_option(Option):
+    """Option with an eng_float type, like gnuradio.eng_option but without
+    importing GNU Radio, so the arguments are parsed quickly
+    """
+    # pylint: disable=invalid-name
+    # pylint: disable=too-few-public-methods
+    TYPES = Option.TYPES + ("eng_float",)
+    TYPE_CHECKER = copy.copy(Option.TYPE_CHECKER)
+    TYPE_CHECKER["eng_float"] = check_eng_float
+
 
 class CLParser(object):
     """Command line parser
@@ -27,6 +80,38 @@ class CLParser(object):
         priority_file_name (string): Name of file with channels to for priority
         freq_correction (int): Frequency correction in ppm
         audio_bps (int): Audio bit depth in bps
+        type_detect (int): Type of detector (0=absolute, 1=CA-CFAR, 2=OS-CFAR)
+        on_hits (int): Number of detections needed to open a channel
+        on_cycles (int): Number of scan cycles on_hits are counted over
+        hang_time (float): Time in seconds to hold a channel after detection
+        lockout_store_name (string): Name of file to save lockouts in
+        scan_rate (float): Maximum scan cycles per second, 0 for no limit
+        frame_rate (float): GUI frames per second, more than 0
+        ring_frames (int): Number of integrated spectra to keep
+        channelizer (bool): Feed demodulators from a polyphase channelizer
+        gate_idle (bool): Disconnect parked demodulators from the flow graph
+        gate_hold (float): Time in seconds a demodulator must be parked
+            before it is disconnected
+        max_load (float): Fraction of CPU above which demodulators are shed
+        perf (bool): Sample the GNU Radio performance counters
+        perf_file_name (string): Name of JSON-lines file for the samples
+        metrics_file_name (string): Name of Prometheus text metrics file
+        metrics_port (int): Localhost TCP port to serve metrics on, or 0
+        profile_time (float): Time in seconds to profile for, or 0
+        profile_file_name (string): Name of collapsed stack profile file
+        tap_cache_name (string): Name of JSON file to keep filter taps in
+        bin_width (float): Widest FFT bin in Hz, or 0 for about 4 kHz
+        spectrum_rate (float): Integrated spectra per second, more than 0
+        averages (int): FFT vectors to integrate into each spectrum
+        welch (bool): Average 50 % overlapped FFTs of every sample
+        fast_time (float): Time in seconds of the short integration for
+            carrier onset, or 0 for none
+        preroll_time (float): Time in seconds of audio to record from before
+            the squelch opens
+        codec (string): Recording format, "wav", "ulaw", or "flac"
+        num_writers (int): Number of threads writing the recordings
+        spool (bool): Append the recordings to spool files with an index
+        spool_size (int): Size in bytes to start a new spool file at
     """
     # pylint: disable=too-few-public-methods
     # pylint: disable=too-many-instance-attributes
@@ -84,7 +169,8 @@ class CLParser(object):
         parser.add_option("-l", "--lockout", type="string",
                           dest="lockout_file_name",
                           default="",
-                          help="File of EOL delimited lockout channels in Hz")
+                          help="File of EOL delimited lockout channels, "
+                          "ranges, or wildcards in Hz or MHz")
 
         parser.add_option("-p", "--priority", type="string",
                           dest="priority_file_name",
@@ -101,7 +187,145 @@ class CLParser(object):
 
         parser.add_option("-b", "--bps", type="int", dest="audio_bps",
                           default=8,
-                          help="Audio bit depth (bps)")
+                          help="Audio bit depth (bps) of wav recordings")
+
+        parser.add_option("--detector", type="choice", dest="type_detect",
+                          choices=["0", "1", "2"], default="0",
+                          help="Type of detector (0=absolute, 1=CA-CFAR, "
+                          "2=OS-CFAR)")
+
+        parser.add_option("--on_hits", type="int", dest="on_hits",
+                          default=1,
+                          help="Detections needed to open a channel")
+
+        parser.add_option("--on_cycles", type="int", dest="on_cycles",
+                          default=1,
+                          help="Scan cycles the on_hits are counted over")
+
+        parser.add_option("--hang_time", type="eng_float", dest="hang_time",
+                          default=0,
+                          help="Time in s to hold a channel after detection")
+
+        parser.add_option("--lockout_store", type="string",
+                          dest="lockout_store_name", default="",
+                          help="File to save lockout channels (0-9 keys) in")
+
+        parser.add_option("--scan_rate", type="eng_float", dest="scan_rate",
+                          default=0,
+                          help="Maximum scan cycles per second, "
+                          "0 for one per spectrum")
+
+        parser.add_option("--frame_rate", type="eng_float", dest="frame_rate",
+                          default=10,
+                          help="GUI frames per second")
+
+        parser.add_option("--ring_frames", type="int", dest="ring_frames",
+                          default=100,
+                          help="Number of integrated spectra to keep")
+
+        parser.add_option("--channelizer", dest="channelizer", default=False,
+                          action="store_true",
+                          help="Feed demodulators from a polyphase "
+                          "channelizer (less CPU per demodulator)")
+
+        parser.add_option("--gate", dest="gate_idle", default=False,
+                          action="store_true",
+                          help="Disconnect idle demodulators from the flow "
+                          "graph (briefly stops it to reconnect)")
+
+        parser.add_option("--gate_hold", type="eng_float", dest="gate_hold",
+                          default=10.0,
+                          help="Time in s a demodulator must be idle before "
+                          "it is disconnected")
+
+        parser.add_option("--max_load", type="eng_float", dest="max_load",
+                          default=0,
+                          help="Fraction of CPU above which demodulators "
+                          "are shed (0 to never shed)")
+
+        parser.add_option("--perf", dest="perf", default=False,
+                          action="store_true",
+                          help="Sample GNU Radio block performance counters "
+                          "('i' key shows them)")
+
+        parser.add_option("--perf_file", type="string",
+                          dest="perf_file_name", default="",
+                          help="JSON-lines file to append performance "
+                          "samples to (implies --perf)")
+
+        parser.add_option("--metrics_file", type="string",
+                          dest="metrics_file_name", default="",
+                          help="File to write Prometheus text metrics to "
+                          "every 10 s")
+
+        parser.add_option("--metrics_port", type="int", dest="metrics_port",
+                          default=0,
+                          help="Localhost port to serve Prometheus metrics "
+                          "on (0 for none)")
+
+        parser.add_option("--profile", type="eng_float", dest="profile_time",
+                          default=0,
+                          help="Time in s to sample the Python stacks for "
+                          "(0 for none)")
+
+        parser.add_option("--profile_file", type="string",
+                          dest="profile_file_name", default="ham2mon.folded",
+                          help="File to write the collapsed stacks to, "
+                          "for flamegraph.pl")
+
+        parser.add_option("--tap_cache", type="string", dest="tap_cache_name",
+                          default="",
+                          help="File to keep filter taps in between runs, "
+                          "for faster start up")
+
+        parser.add_option("--bin_width", type="eng_float", dest="bin_width",
+                          default=0,
+                          help="Widest FFT bin in Hz, rounded to a power of "
+                          "two FFT (0 for about 4 kHz)")
+
+        parser.add_option("--spectrum_rate", type="eng_float",
+                          dest="spectrum_rate", default=10,
+                          help="Integrated spectra (scan cycles) per second")
+
+        parser.add_option("--averages", type="int", dest="averages",
+                          default=100,
+                          help="FFTs to average into each spectrum")
+
+        parser.add_option("--welch", dest="welch", default=False,
+                          action="store_true",
+                          help="Average 50%% overlapped FFTs of every sample "
+                          "(sets --averages)")
+
+        parser.add_option("--fast_time", type="eng_float", dest="fast_time",
+                          default=0,
+                          help="Short integration in s that assigns "
+                          "demodulators on carrier onset, e.g. 10m "
+                          "(0 for none)")
+
+        parser.add_option("--preroll", type="eng_float", dest="preroll_time",
+                          default=0.25,
+                          help="Audio in s to record from before the "
+                          "squelch opens")
+
+        parser.add_option("--codec", type="choice", dest="codec",
+                          choices=["wav", "ulaw", "flac"], default="wav",
+                          help="Recording format, wav (PCM of --bps), ulaw "
+                          "(8-bit .au), or flac (lossless, needs flac)")
+
+        parser.add_option("--writers", type="int", dest="num_writers",
+                          default=2,
+                          help="Threads writing the recordings")
+
+        parser.add_option("--spool", action="store_true", dest="spool",
+                          default=False,
+                          help="Append the recordings to spool files in "
+                          "'spool', with an index, rather than a file each "
+                          "(wav or ulaw)")
+
+        parser.add_option("--spool_size", type="eng_float", dest="spool_size",
+                          default=spl.MAX_SIZE,
+                          help="Size in bytes to start a new spool file at, "
+                          "e.g. 1G")
 
         options = parser.parse_args()[0]
         self.parser_args = parser.parse_args()[1]
@@ -123,6 +347,43 @@ class CLParser(object):
         self.priority_file_name = str(options.priority_file_name)
         self.freq_correction = int(options.freq_correction)
         self.audio_bps = int(options.audio_bps)
+        self.type_detect = int(options.type_detect)
+        self.on_hits = int(options.on_hits)
+        self.on_cycles = int(options.on_cycles)
+        self.hang_time = float(options.hang_time)
+        self.lockout_store_name = str(options.lockout_store_name)
+        self.scan_rate = float(options.scan_rate)
+        self.frame_rate = float(options.frame_rate)
+        self.ring_frames = max(int(options.ring_frames), 2)
+        self.channelizer = bool(options.channelizer)
+        self.gate_idle = bool(options.gate_idle)
+        self.gate_hold = max(float(options.gate_hold), 0)
+        self.max_load = float(options.max_load)
+        self.perf_file_name = str(options.perf_file_name)
+        self.perf = bool(options.perf) or self.perf_file_name != ""
+        self.metrics_file_name = str(options.metrics_file_name)
+        self.metrics_port = int(options.metrics_port)
+        self.profile_time = float(options.profile_time)
+        self.profile_file_name = str(options.profile_file_name)
+        self.tap_cache_name = str(options.tap_cache_name)
+        self.bin_width = float(options.bin_width)
+        self.spectrum_rate = float(options.spectrum_rate)
+        self.averages = max(int(options.averages), 1)
+        self.welch = bool(options.welch)
+        self.fast_time = max(float(options.fast_time), 0)
+        self.preroll_time = max(float(options.preroll_time), 0)
+        self.codec = str(options.codec)
+        self.num_writers = max(int(options.num_writers), 1)
+        self.spool = bool(options.spool)
+        self.spool_size = max(int(options.spool_size), 1)
+        if self.frame_rate <= 0:
+            parser.error("--frame_rate must be more than 0")
+        if self.spectrum_rate <= 0:
+            parser.error("--spectrum_rate must be more than 0")
+        if self.codec == "flac" and not find_executable("flac"):
+            parser.error("--codec=flac needs the flac encoder installed")
+        if self.spool and self.codec == "flac":
+            parser.error("--spool holds wav or ulaw, not flac")
 
 
 def main():
@@ -150,6 +411,35 @@ def main():
     print "priority_file_name:  " + str(parser.priority_file_name)
     print "freq_correction:     " + str(parser.freq_correction)
     print "audio_bps:           " + str(parser.audio_bps)
+    print "type_detect:         " + str(parser.type_detect)
+    print "on_hits:             " + str(parser.on_hits)
+    print "on_cycles:           " + str(parser.on_cycles)
+    print "hang_time:           " + str(parser.hang_time)
+    print "lockout_store_name:  " + str(parser.lockout_store_name)
+    print "scan_rate:           " + str(parser.scan_rate)
+    print "frame_rate:          " + str(parser.frame_rate)
+    print "ring_frames:         " + str(parser.ring_frames)
+    print "channelizer:         " + str(parser.channelizer)
+    print "gate_idle:           " + str(parser.gate_idle)
+    print "gate_hold:           " + str(parser.gate_hold)
+    print "max_load:            " + str(parser.max_load)
+    print "perf:                " + str(parser.perf)
+    print "perf_file_name:      " + str(parser.perf_file_name)
+    print "metrics_file_name:   " + str(parser.metrics_file_name)
+    print "metrics_port:        " + str(parser.metrics_port)
+    print "profile_time:        " + str(parser.profile_time)
+    print "profile_file_name:   " + str(parser.profile_file_name)
+    print "tap_cache_name:      " + str(parser.tap_cache_name)
+    print "bin_width:           " + str(parser.bin_width)
+    print "spectrum_rate:       " + str(parser.spectrum_rate)
+    print "averages:            " + str(parser.averages)
+    print "welch:               " + str(parser.welch)
+    print "fast_time:           " + str(parser.fast_time)
+    print "preroll_time:        " + str(parser.preroll_time)
+    print "codec:               " + str(parser.codec)
+    print "num_writers:         " + str(parser.num_writers)
+    print "spool:               " + str(parser.spool)
+    print "spool_size:          " + str(parser.spool_size)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:07:13 2026
+
+@author: madengr
+"""
+
+import time
+import json
+import collections
+
+# Performance of one block, or the sum over the blocks of a group, such as
+# a demodulator or the spectrum path
+#   work: Share of time spent in work(), 1.0 is a whole core
+#   rate: Items produced (or consumed by sinks) per second
+#   in_full: Average fullness of the fullest input buffer, 0 to 1
+#   out_full: Average fullness of the fullest output buffer, 0 to 1
+BlockStat = collections.namedtuple('BlockStat', ['name', 'work', 'rate',
+                                                 'in_full', 'out_full'])
+
+
+def count_items(block):
+    """Counts the items a block has produced, or consumed if a sink
+
+    Args:
+        block (gr.basic_block): Block in the flow graph
+
+    Returns:
+        int: Number of items, or 0 if the block has not run yet
+    """
+    try:
+        return block.nitems_written(0)
+    except (RuntimeError, IndexError):
+        pass
+    try:
+        return block.nitems_read(0)
+    except (RuntimeError, IndexError):
+        return 0
+
+
+def max_full(fullness):
+    """Gets the fullest buffer
+
+    Args:
+        fullness (list): Average fullness of each port
+
+    Returns:
+        float: Fullness of the fullest buffer, 0 if there are no ports
+    """
+    return max(list(fullness) + [0.0])
+
+
+def group_name(name):
+    """Gets the group a block belongs to
+
+    Args:
+        name (string): Block name such as "demod3.xlating" or "spectrum.fft"
+
+    Returns:
+        string: Group name such as "demod3", or None if not in one
+    """
+    if "." in name:
+        return name.split(".")[0]
+    return None
+
+
+class PerfSampler(object):
+    """Samples the GNU Radio performance counters of the receiver
+
+    Every interval seconds the work time, throughput and buffer fullness of
+    each block from Receiver.get_perf_blocks() are taken, and the blocks of
+    each group, such as a demodulator or the spectrum path, are also summed
+    Each sample may be appended to a JSON-lines file for later analysis
+    The performance counters must be on, see Receiver
+
+    Args:
+        receiver (Receiver): Receiver to sample
+        file_name (string): Name of JSON-lines file, or "" for none
+        interval (float): Time in seconds between samples
+
+    Attributes:
+        stats (tuple): BlockStat of the ungrouped blocks and of each group,
+            from the last sample
+        block_stats (tuple): BlockStat of every block, from the last sample
+    """
+
+    def __init__(self, receiver, file_name="", interval=1.0):
+        self.receiver = receiver
+        self.file_name = file_name
+        self.interval = interval
+        self.stats = ()
+        self.block_stats = ()
+        self.last = None
+        self.perf_file = None
+        if self.file_name != "":
+            self.perf_file = open(self.file_name, 'a')
+
+    def sample(self, now=None):
+        """Takes a sample if the interval has passed
+
+        Args:
+            now (float): Time in seconds, or None for time.time()
+
+        Returns:
+            bool: True if a sample was taken
+        """
+        if now is None:
+            now = time.time()
+        if self.last is not None and now - self.last[0] < self.interval:
+            return False
+
+        # Read the counters
+        ticks_per_sec = float(self.receiver.get_ticks_per_sec())
+        counts = collections.OrderedDict()
+        for name, block in self.receiver.get_perf_blocks().items():
+            counts[name] = (block.pc_work_time_total()/ticks_per_sec,
+                            count_items(block),
+                            max_full(block.pc_input_buffers_full_avg()),
+                            max_full(block.pc_output_buffers_full_avg()))
+
+        # Need two readings for the rates
+        if self.last is None:
+            self.last = (now, counts)
+            return False
+        elapsed = float(now - self.last[0])
+        last_counts = self.last[1]
+        self.last = (now, counts)
+
+        block_stats = []
+        group_stats = collections.OrderedDict()
+        for name, (work_time, items, in_full, out_full) in counts.items():
+            if name not in last_counts or \
+                    work_time < last_counts[name][0] or \
+                    items < last_counts[name][1]:
+                # Block added since the last sample, or its counters reset
+                # as it was gated out and reconnected
+                continue
+            stat = BlockStat(name,
+                             (work_time - last_counts[name][0])/elapsed,
+                             (items - last_counts[name][1])/elapsed,
+                             in_full, out_full)
+            block_stats.append(stat)
+
+            # Sum the blocks of each group, the rate is its output
+            group = group_name(name)
+            if group is not None:
+                if group in group_stats:
+                    total = group_stats[group]
+                    stat = BlockStat(group, total.work + stat.work, stat.rate,
+                                     max(total.in_full, stat.in_full),
+                                     max(total.out_full, stat.out_full))
+                else:
+                    stat = stat._replace(name=group)
+                group_stats[group] = stat
+
+        self.block_stats = tuple(block_stats)
+        self.stats = tuple([stat for stat in block_stats
+                            if group_name(stat.name) is None] +
+                           group_stats.values())
+
+        if self.perf_file is not None:
+            record = collections.OrderedDict()
+            record["time"] = now
+            record["blocks"] = collections.OrderedDict(
+                (stat.name, stat._asdict()) for stat in block_stats)
+            for stat in record["blocks"].values():
+                del stat["name"]
+            self.perf_file.write(json.dumps(record) + "\n")
+            self.perf_file.flush()
+        return True
+
+    def close(self):
+        """Closes the JSON-lines file
+        """
+        if self.perf_file is not None:
+            self.perf_file.close()
+            self.perf_file = None
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test PerfSampler with blocks that count up at fixed rates
+    print "Testing PerfSampler"
+
+    class FakeBlock(object):
+        """Block with performance counters that count at fixed rates"""
+        def __init__(self, work, rate):
+            self.work = work
+            self.rate = rate
+            self.now = 0
+
+        def pc_work_time_total(self):
+            """Work time in ticks of 1 us"""
+            return int(self.work * self.now * 1E6)
+
+        def nitems_written(self, _):
+            """Items produced"""
+            return int(self.rate * self.now)
+
+        def pc_input_buffers_full_avg(self):
+            """Input buffer fullness"""
+            return [0.5]
+
+        def pc_output_buffers_full_avg(self):
+            """Output buffer fullness"""
+            return [0.25]
+
+    class FakeReceiver(object):
+        """Receiver with a few blocks"""
+        def __init__(self):
+            self.blocks = collections.OrderedDict([
+                ("fft", FakeBlock(0.2, 1000)),
+                ("demod0.xlating", FakeBlock(0.3, 8E5)),
+                ("demod0.resampler", FakeBlock(0.1, 8000))])
+
+        def get_perf_blocks(self):
+            """Blocks to sample"""
+            return self.blocks
+
+        @staticmethod
+        def get_ticks_per_sec():
+            """Ticks of 1 us"""
+            return 1E6
+
+    receiver = FakeReceiver()
+    sampler = PerfSampler(receiver)
+    for now in (1, 2):
+        for block in receiver.blocks.values():
+            block.now = now
+        sampler.sample(now)
+    result = [(stat.name, round(stat.work, 3), stat.rate)
+              for stat in sampler.stats]
+    print "Stats " + str(result)
+
+    # Counters of a reconnected demodulator reset, so it is skipped once
+    receiver.blocks["fft"].now = 3
+    for name in ("demod0.xlating", "demod0.resampler"):
+        receiver.blocks[name].now = 0.5
+    sampler.sample(3)
+    reset = [stat.name for stat in sampler.stats]
+    print "After reset " + str(reset)
+    if result == [("fft", 0.2, 1000), ("demod0", 0.4, 8000)] and \
+            reset == ["fft"]:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,436 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:05:37 2026
+
+@author: madengr
+"""
+
+import math
+import collections
+
+# One decimating low pass FIR filter stage
+#   decim: Decimation factor
+#   in_rate: Input sample rate in sps
+#   cutoff: Cutoff frequency in Hz, the middle of the transition band
+#   transition: Transition band width in Hz
+#   num_taps: Number of taps of the Hamming windowed design
+#   macs: Real multiply-accumulates per input sample of the whole chain
+Stage = collections.namedtuple('Stage', ['decim', 'in_rate', 'cutoff',
+                                         'transition', 'num_taps', 'macs'])
+
+# Decimation plan of a tuner/demodulator chain
+#   channel_stages: Complex stages, the first is the frequency translating one
+#   audio_stages: Real stages after the demodulator
+#   channel_rate: Sample rate into the demodulator in sps
+#   resamp_rate: Ratio of the arbitrary resampler, 1.0 if none is needed
+#   resamp_macs: Real multiply-accumulates of the resampler per input sample
+#   macs: Total real multiply-accumulates per input sample
+DecimPlan = collections.namedtuple('DecimPlan', ['channel_stages',
+                                                 'audio_stages',
+                                                 'channel_rate',
+                                                 'resamp_rate',
+                                                 'resamp_macs', 'macs'])
+
+# Spectrum path of the receiver
+#   fft_length: Number of FFT bins
+#   bin_width: Width of each bin in Hz
+#   keep: One in keep FFT vectors is used, the rest are dropped
+#   averages: FFT vectors integrated into each spectrum, per set of vectors
+#   welch: Two sets of vectors half a vector apart are used if True
+#   spectrum_rate: Integrated spectra per second
+#   used: Fraction of the samples that reach an FFT
+#   scale: Factor that brings the integrated power to REFERENCE_AVERAGES
+#   fast_averages: FFT vectors in each short integration, 0 for none
+#   fast_rate: Short integrations per second, 0 for none
+#   fast_scale: Factor that brings the short integration power to
+#       REFERENCE_AVERAGES
+#   mflops: Estimated millions of floating point operations per second
+SpectrumPlan = collections.namedtuple('SpectrumPlan', [
+    'fft_length', 'bin_width', 'keep', 'averages', 'welch', 'spectrum_rate',
+    'used', 'scale', 'fast_averages', 'fast_rate', 'fast_scale', 'mflops'])
+
+# Spectra are scaled to the power of this many integrated vectors, so the
+# detection threshold in dB does not move with the averaging
+REFERENCE_AVERAGES = 100
+
+# Stop band attenuation in dB of the Hamming window, as firdes uses it
+HAMMING_ATTEN = 53
+
+# Real MACs per tap of the translating filter (complex taps and samples),
+# the complex filters with real taps, and the real filters
+XLATING_MACS = 4
+CHANNEL_MACS = 2
+AUDIO_MACS = 1
+
+# Filter bank size and attenuation in dB of the arbitrary resampler
+RESAMP_FILTERS = 32
+RESAMP_ATTEN = 100
+
+# Plans already made, as every demodulator of a receiver uses the same one
+_PLANS = {}
+
+# Splits of each decimation already listed
+_FACTORIZATIONS = {}
+
+
+def num_taps(samp_rate, transition, atten=HAMMING_ATTEN):
+    """Gets the number of taps of a windowed low pass design, as firdes does
+
+    Args:
+        samp_rate (float): Sample rate in sps
+        transition (float): Transition band width in Hz
+        atten (float): Stop band attenuation of the window in dB
+
+    Returns:
+        int: Odd number of taps
+    """
+    taps = int(atten * samp_rate / (22.0 * transition))
+    return taps | 1
+
+
+def resampler_macs(resamp_rate):
+    """Gets the cost of the arbitrary resampler with its default taps
+
+    For rates below one the default prototype filter passes 0.4 of the
+    output rate with a transition of 0.2 of the output rate
+    Each output sample runs one filter arm and its derivative
+
+    Args:
+        resamp_rate (float): Output rate over input rate, 1.0 or less
+
+    Returns:
+        float: Real MACs per output sample, 0 if no resampler is needed
+    """
+    if abs(resamp_rate - 1.0) < 1E-9:
+        return 0.0
+    taps = num_taps(RESAMP_FILTERS, 0.2 * resamp_rate, RESAMP_ATTEN)
+    return 2.0 * math.ceil(taps / float(RESAMP_FILTERS))
+
+
+def factorizations(decim, max_stages):
+    """Lists the ways to split a decimation into ordered stages
+
+    Args:
+        decim (int): Total decimation
+        max_stages (int): Most stages to split into
+
+    Returns:
+        List[tuple]: Stage decimations, each 2 or more, in every order,
+            or [(1,)] if decim is 1
+    """
+    if decim == 1:
+        return [(1,)]
+    if (decim, max_stages) in _FACTORIZATIONS:
+        return _FACTORIZATIONS[(decim, max_stages)]
+    splits = [(decim,)]
+    if max_stages > 1:
+        for first in range(2, decim/2 + 1):
+            if decim % first == 0:
+                for rest in factorizations(decim/first, max_stages - 1):
+                    splits.append((first,) + rest)
+    _FACTORIZATIONS[(decim, max_stages)] = splits
+    return splits
+
+
+def plan_stages(decims, in_rate, cutoff, transition, macs_per_tap,
+                scale=1.0):
+    """Designs the stages of one chain of decimating filters
+
+    All but the last stage only stop what would alias into the band the
+    last stage passes, so have wide transition bands and few taps
+    The last stage's output rate must hold its whole transition band, so
+    nothing it passes aliases
+
+    Args:
+        decims (tuple): Decimation of each stage
+        in_rate (float): Input sample rate in sps
+        cutoff (float): Cutoff frequency of the last stage in Hz
+        transition (float): Transition band width of the last stage in Hz
+        macs_per_tap (list): Real MACs per tap of each stage
+        scale (float): Input rate of the whole chain over in_rate
+
+    Returns:
+        List[Stage]: The stages, or None if a stage cannot be designed
+    """
+    # pylint: disable=too-many-arguments
+    stages = []
+    edge = cutoff + transition/2.0
+    rate = in_rate
+    total = 1
+    for idx, decim in enumerate(decims):
+        out_rate = rate / decim
+        if idx == len(decims) - 1:
+            stage_cutoff, stage_transition = cutoff, transition
+            if out_rate < 2*edge:
+                return None
+        else:
+            # Pass up to the last stage's stop band edge, and stop from
+            # where it would alias back onto it
+            stage_cutoff = out_rate/2.0
+            stage_transition = out_rate - 2*edge
+            if stage_transition < transition:
+                return None
+        taps = num_taps(rate, stage_transition)
+        stages.append(Stage(decim, rate, stage_cutoff, stage_transition,
+                            taps, taps*macs_per_tap[idx]/(scale*total*decim)))
+        total *= decim
+        rate = out_rate
+    return stages
+
+
+def plan_decimation(samp_rate, channel_bw=12.5E3, audio_rate=8000,
+                    audio_bw=3.5E3, channel_transition=1E3,
+                    audio_transition=500, max_stages=3):
+    """Plans the decimation of a tuner/demodulator chain with the least cost
+
+    Every split of the channel decimation into up to max_stages stages, and
+    of the audio decimation after the demodulator, is costed in real
+    multiply-accumulates per input sample, including the arbitrary
+    resampler that takes the audio to audio_rate
+    The resampler is left out when the audio decimation reaches audio_rate
+    exactly
+    Plans are kept, so the same plan is only made once
+
+    Args:
+        samp_rate (float): Input sample rate in sps
+        channel_bw (float): Cutoff of the channel filter in Hz
+        audio_rate (float): Output audio rate in sps
+        audio_bw (float): Cutoff of the audio filter in Hz
+        channel_transition (float): Transition band of the channel filter
+        audio_transition (float): Transition band of the audio filter
+        max_stages (int): Most stages of the channel and of the audio chain
+
+    Returns:
+        DecimPlan: Plan with the fewest MACs per input sample
+    """
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-locals
+    key = (samp_rate, channel_bw, audio_rate, audio_bw, channel_transition,
+           audio_transition, max_stages)
+    if key in _PLANS:
+        return _PLANS[key]
+
+    best = None
+    min_channel_rate = max(2*channel_bw + channel_transition, audio_rate)
+    # The last channel stage costs more the higher the channel rate, so
+    # only look up to twice the lowest rate
+    max_decim = int(samp_rate/min_channel_rate)
+    for channel_decim in range(max(1, max_decim/2), max_decim + 1):
+        channel_rate = samp_rate/channel_decim
+
+        # Best split of the channel decimation
+        channel_stages = None
+        for decims in factorizations(channel_decim, max_stages):
+            macs_per_tap = [XLATING_MACS] + [CHANNEL_MACS]*(len(decims) - 1)
+            stages = plan_stages(decims, samp_rate, channel_bw,
+                                 channel_transition, macs_per_tap)
+            if stages is not None and (
+                    channel_stages is None or
+                    sum(stage.macs for stage in stages) <
+                    sum(stage.macs for stage in channel_stages)):
+                channel_stages = stages
+        if channel_stages is None:
+            continue
+        channel_macs = sum(stage.macs for stage in channel_stages)
+        if best is not None and channel_macs >= best.macs:
+            continue
+
+        # Best split of the audio decimation, with the resampler after it
+        for audio_decim in range(1, int(channel_rate/audio_rate) + 1):
+            resamp_rate = audio_rate/(channel_rate/audio_decim)
+            resamp_macs = resampler_macs(resamp_rate)*audio_rate/samp_rate
+            for decims in factorizations(audio_decim, max_stages):
+                stages = plan_stages(decims, channel_rate, audio_bw,
+                                     audio_transition,
+                                     [AUDIO_MACS]*len(decims),
+                                     channel_decim)
+                if stages is None:
+                    continue
+                macs = channel_macs + resamp_macs + \
+                    sum(stage.macs for stage in stages)
+                if best is None or macs < best.macs:
+                    if abs(resamp_rate - 1.0) < 1E-9:
+                        resamp_rate = 1.0
+                    best = DecimPlan(tuple(channel_stages), tuple(stages),
+                                     channel_rate, resamp_rate, resamp_macs,
+                                     macs)
+
+    if best is None:
+        raise ValueError, "Sample rate %.0f sps too low for the channel" % \
+            samp_rate
+    _PLANS[key] = best
+    return best
+
+
+def plan_spectrum(samp_rate, bin_width=0, spectrum_rate=10.0, averages=100,
+                  welch=False, fast_time=0):
+    """Plans the FFT spectrum path of the receiver
+
+    The FFT length is the power of two that gives bin_width or finer
+    Without welch one in keep FFT vectors is kept, so averages vectors make
+    each spectrum at spectrum_rate, and the rest of the samples are dropped
+    If there are too few vectors for averages, all are kept and fewer are
+    averaged
+    With welch every sample is used, in two sets of vectors half a vector
+    apart, and averages is however many vectors arrive per spectrum
+    With fast_time the same vectors are also integrated over about
+    fast_time seconds, for detecting the onset of a channel quickly
+
+    Args:
+        samp_rate (float): Sample rate in sps
+        bin_width (float): Widest bin in Hz, or 0 for 256 bins per Msps
+            rounded up to a power of two
+        spectrum_rate (float): Integrated spectra per second wanted
+        averages (int): FFT vectors to integrate into each spectrum
+        welch (bool): Use every sample, with 50 % overlapped vectors
+        fast_time (float): Time in seconds of the short integration, 0 for
+            none
+
+    Returns:
+        SpectrumPlan: FFT length, decimation, averaging and estimated cost
+    """
+    if bin_width > 0:
+        fft_length = int(2**math.ceil(math.log(samp_rate/bin_width, 2)))
+    else:
+        fft_length = 256 * int(2**math.ceil(math.log(samp_rate/1E6, 2)))
+    vector_rate = samp_rate/fft_length
+    if welch:
+        keep = 1
+        averages = max(1, int(round(vector_rate/spectrum_rate)))
+        ffts = 2*vector_rate
+    else:
+        keep = int(round(vector_rate/(spectrum_rate*averages)))
+        if keep < 1:
+            keep = 1
+            averages = max(1, int(vector_rate/spectrum_rate))
+        ffts = vector_rate/keep
+
+    # Short integration of the same vectors, no longer than the long one
+    if fast_time > 0:
+        fast_averages = min(averages, max(1, int(round(
+            fast_time*vector_rate/keep))))
+        fast_rate = vector_rate/keep/fast_averages
+        fast_scale = REFERENCE_AVERAGES / \
+            float(fast_averages*(2 if welch else 1))
+    else:
+        fast_averages, fast_rate, fast_scale = 0, 0.0, 0.0
+
+    # Radix-2 FFT, window, magnitude squared, and integration
+    flops = 5*fft_length*math.log(fft_length, 2) + 6*fft_length
+    if fast_averages:
+        flops += fft_length
+    mflops = ffts*flops/1E6
+    integrated = averages*(2 if welch else 1)
+    return SpectrumPlan(fft_length, samp_rate/fft_length, keep, averages,
+                        welch, vector_rate/keep/averages, 1.0/keep,
+                        REFERENCE_AVERAGES/float(integrated), fast_averages,
+                        fast_rate, fast_scale, mflops)
+
+
+def describe_spectrum(plan):
+    """Formats a spectrum plan as one line of text
+
+    Args:
+        plan (SpectrumPlan): Plan to describe
+
+    Returns:
+        string: Bins, averaging, rate, samples used, and cost
+    """
+    if plan.welch:
+        averaging = "%d x 2 Welch averages" % plan.averages
+    else:
+        averaging = "1 in %d kept, %d averages" % (plan.keep, plan.averages)
+    if plan.fast_averages:
+        averaging += " (%d at %.0f/s)" % (plan.fast_averages, plan.fast_rate)
+    return "%d bins of %.0f Hz, %s, %.1f/s, %.0f %% used, %.0f MFLOPS" % (
+        plan.fft_length, plan.bin_width, averaging, plan.spectrum_rate,
+        100*plan.used, plan.mflops)
+
+
+def describe_plan(plan):
+    """Formats a plan as one line of text
+
+    Args:
+        plan (DecimPlan): Plan to describe
+
+    Returns:
+        string: Stage decimations and taps, resampler rate, and MACs
+    """
+    channel = "x".join("%d(%d)" % (stage.decim, stage.num_taps)
+                       for stage in plan.channel_stages)
+    audio = "x".join("%d(%d)" % (stage.decim, stage.num_taps)
+                     for stage in plan.audio_stages)
+    return "%s | %s | resamp %.4f | %.1f MACs/sample" % (
+        channel, audio, plan.resamp_rate, plan.macs)
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test plan_decimation() at a rate that is not a whole number of MHz
+    print "Testing plan_decimation()"
+    plan = plan_decimation(2.4E6)
+    print "2.4 Msps: " + describe_plan(plan)
+    total = 1
+    for stage in plan.channel_stages + plan.audio_stages:
+        total *= stage.decim
+    if abs(2.4E6/total*plan.resamp_rate - 8000) < 1E-6 and \
+            plan.resamp_rate < 1.0 and plan.macs < 20:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+    # Test plan_spectrum() matches the original fixed spectrum path
+    print "Testing plan_spectrum()"
+    plan = plan_spectrum(4E6)
+    welch_plan = plan_spectrum(4E6, 2E3, 10, welch=True, fast_time=0.01)
+    print "4 Msps: %d bins, keep 1 in %d, %d averages, %.1f MFLOPS" % (
+        plan.fft_length, plan.keep, plan.averages, plan.mflops)
+    print "4 Msps Welch: " + describe_spectrum(welch_plan)
+    if plan.fft_length == 1024 and plan.keep == 4 and plan.scale == 1.0 \
+            and welch_plan.fft_length == 2048 and welch_plan.used == 1.0 \
+            and welch_plan.fast_averages == 20:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+    # Test plan_decimation() at a rate that needs the resampler
+    print "Testing plan_decimation() with resampler"
+    plan = plan_decimation(10E6)
+    print "10 Msps: " + describe_plan(plan)
+    if plan.channel_rate >= 25E3 and plan.resamp_rate <= 1.0 and \
+            plan_decimation(10E6) is plan:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+    # Test no plan has a stage whose output rate is below twice its stop
+    # band edge, which would alias what it passes
+    print "Testing plan_decimation() does not alias"
+    aliased = []
+    for samp_rate in (1E6, 1.024E6, 2E6, 2.048E6, 2.4E6, 3.2E6, 4E6, 8E6,
+                      10E6, 20E6):
+        plan = plan_decimation(samp_rate)
+        for stages in (plan.channel_stages, plan.audio_stages):
+            last = stages[-1]
+            if last.in_rate/last.decim < 2*last.cutoff + last.transition:
+                aliased.append(samp_rate)
+    plan = plan_decimation(2.4E6)
+    print "Aliased at %s, 2.4 Msps channel rate %.1f ksps" % (
+        aliased, plan.channel_rate/1E3)
+    if not aliased and plan.channel_rate >= 26E3:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
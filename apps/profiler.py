@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:14:05 2026
+
+@author: madengr
+"""
+
+import os
+import sys
+import time
+import threading
+import collections
+
+
+def frame_name(frame):
+    """Formats a stack frame for the collapsed stack output
+
+    Args:
+        frame (frame): Python stack frame
+
+    Returns:
+        string: Function and file name such as "scan_cycle (scanner.py)"
+    """
+    code = frame.f_code
+    name = "%s (%s)" % (code.co_name, os.path.basename(code.co_filename))
+    # Semicolons separate the frames
+    return name.replace(";", ":")
+
+
+class SamplingProfiler(threading.Thread):
+    """Statistical profiler of all Python threads
+
+    A daemon thread takes the stack of every other thread interval seconds
+    apart for duration seconds, then writes how often each stack was seen
+    as collapsed stacks, one "thread;outer;...;inner count" per line, which
+    flamegraph.pl and speedscope read
+    Stacks are sampled by wall clock, so time blocked in GNU Radio calls
+    (such as set_center_freq() or a lock/unlock) and waiting on locks shows
+    up under the Python function that made the call
+    Only the sampler thread does work, so the overhead is one stack walk per
+    thread per interval
+
+    Args:
+        file_name (string): Name of the collapsed stack file
+        duration (float): Time in seconds to profile for
+        interval (float): Time in seconds between samples
+
+    Attributes:
+        stacks (Counter): Number of samples of each collapsed stack
+        num_samples (int): Number of times the threads were sampled
+    """
+
+    def __init__(self, file_name, duration, interval=0.01):
+        threading.Thread.__init__(self, name="Profiler")
+        self.daemon = True
+        self.file_name = file_name
+        self.duration = duration
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.num_samples = 0
+        self.stop_event = threading.Event()
+        self.written = False
+        self.write_lock = threading.Lock()
+
+    def sample(self):
+        """Adds the stack of every other thread once
+        """
+        names = dict((thread.ident, thread.name)
+                     for thread in threading.enumerate())
+        # pylint: disable=protected-access
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, "thread-%d" % ident))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.num_samples += 1
+
+    def run(self):
+        """Samples until the duration has passed or stop() is called
+        """
+        stop_time = time.time() + self.duration
+        while time.time() < stop_time and not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+        self.write()
+
+    def write(self):
+        """Writes the collapsed stacks, only the first call writes
+        """
+        with self.write_lock:
+            if self.written:
+                return
+            self.written = True
+            with open(self.file_name, 'w') as stack_file:
+                for stack, count in sorted(self.stacks.items()):
+                    stack_file.write("%s %d\n" % (stack, count))
+
+    def stop(self):
+        """Stops sampling early and writes the collapsed stacks
+        """
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.write()
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test SamplingProfiler on a busy thread
+    print "Testing SamplingProfiler"
+
+    def busy_loop():
+        """Spins for a while"""
+        stop_time = time.time() + 0.3
+        while time.time() < stop_time:
+            pass
+
+    file_name = "/tmp/profiler_test.folded"
+    profiler = SamplingProfiler(file_name, 10.0, 0.005)
+    profiler.start()
+    busy = threading.Thread(target=busy_loop, name="Busy")
+    busy.start()
+    busy.join()
+    profiler.stop()
+    with open(file_name) as stack_file:
+        lines = stack_file.read().splitlines()
+    os.remove(file_name)
+    busy_lines = [line for line in lines if line.startswith("Busy;")]
+    print "%d samples, %d stacks" % (profiler.num_samples, len(lines))
+    if busy_lines:
+        print busy_lines[0]
+    if busy_lines and all("busy_loop (profiler.py)" in line
+                          for line in busy_lines):
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -14,10 +14,145 @@ from gnuradio import fft
 from gnuradio.fft import window
 from gnuradio import analog
 from gnuradio import audio
-import os
 import time
+import collections
+import threading
 import numpy as np
 from gnuradio.filter import pfb
+import ring
+import planner
+import tapcache
+import recorder
+import writer
+import spool as spl
+
+# Integrated spectrum with its sequence number and time of arrival, and
+# whether it is a short integration
+SpectrumFrame = collections.namedtuple('SpectrumFrame',
+                                       ['seq', 'timestamp', 'spectrum',
+                                        'fast'])
+
+
+class SpectrumSink(gr.sync_block):
+    """Sink that pushes each integrated spectrum to the scanner
+
+    Replaces polling a probe after a blind sleep
+    Each vector is stamped with a sequence number and the time it arrived,
+    and threads waiting in wait_spectrum() are woken straight away
+    Sequence numbers count every vector, so a reader can tell if it missed
+    any, and the last ring_frames vectors are kept in a preallocated ring
+    The spectrum of each frame is a zero-copy view into the ring
+    Sinks may share a condition, so one thread can wait on either
+
+    Args:
+        fft_length (int): Length of the spectrum vectors
+        ring_frames (int): Number of spectra to keep in the ring
+        scale (float): Factor to multiply each spectrum by
+        fast (bool): Mark the frames as short integrations
+        condition (Condition): Condition to notify, or None for a new one
+
+    Attributes:
+        frame (SpectrumFrame): Latest spectrum, or None before the first
+        ring (SpectrumRing): Last ring_frames spectra
+    """
+
+    def __init__(self, fft_length, ring_frames=100, scale=1.0, fast=False,
+                 condition=None):
+        # pylint: disable=too-many-arguments
+        gr.sync_block.__init__(self, name="SpectrumSink",
+                               in_sig=[(np.float32, fft_length)],
+                               out_sig=None)
+        self.scale = scale
+        self.fast = fast
+        self.frame = None
+        self.ring = ring.SpectrumRing(ring_frames, fft_length)
+        if condition is None:
+            condition = threading.Condition()
+        self.condition = condition
+
+    def work(self, input_items, output_items):
+        """Copies the spectra into the ring and wakes waiting threads"""
+        # pylint: disable=unused-argument
+        vectors = input_items[0]
+        if self.scale != 1.0:
+            vectors = vectors * self.scale
+        timestamp = time.time()
+        with self.condition:
+            for vector in vectors:
+                spectrum = self.ring.write(vector, self.ring.count + 1,
+                                           timestamp)
+            self.frame = SpectrumFrame(self.ring.count, timestamp, spectrum,
+                                       self.fast)
+            self.condition.notify_all()
+        return len(vectors)
+
+    def wait_spectrum(self, seq=0, timeout=None):
+        """Waits for a spectrum newer than seq
+
+        Args:
+            seq (int): Sequence number of the last spectrum seen
+            timeout (float): Maximum time to wait in seconds, None forever
+
+        Returns:
+            SpectrumFrame: Latest spectrum, or None if timed out
+        """
+        with self.condition:
+            if self.frame is None or self.frame.seq <= seq:
+                self.condition.wait(timeout)
+            if self.frame is None or self.frame.seq <= seq:
+                return None
+            return self.frame
+
+
+def channelizer_slices(samp_rate):
+    """Gets the number of channelizer slices and their spacing
+
+    Slices are at least 500 kHz apart, and an even number so each may be
+    oversampled by two, which gives the tuners 1 to 2 Msps per slice
+
+    Args:
+        samp_rate (float): Hardware sample rate in sps (1E6 min)
+
+    Returns:
+        (int, float): Number of slices and their spacing in Hz
+    """
+    num_slices = 2 * max(1, int(samp_rate/1E6))
+    return num_slices, samp_rate/num_slices
+
+
+def channelizer_taps(num_slices, tap_cache=None):
+    """Designs the prototype filter taps for the channelizer
+
+    Passes just over half the slice spacing, so a channel at the edge of
+    the nearest slice is passed whole, and stops before the oversampled
+    slice would alias into the pass band
+
+    Args:
+        num_slices (int): Number of channelizer slices
+        tap_cache (TapCache): Cache to get the taps from, or None for a new
+            one
+
+    Returns:
+        List[float]: Low pass filter taps at num_slices times the slice rate
+    """
+    if tap_cache is None:
+        tap_cache = tapcache.TapCache()
+    return list(tap_cache.low_pass_2(1, num_slices, 0.75, 0.44, 60))
+
+
+def stage_taps(stage, tap_cache):
+    """Designs the low pass filter taps of a planned decimation stage
+
+    Args:
+        stage (planner.Stage): Stage from planner.plan_decimation()
+        tap_cache (TapCache): Cache to get the taps from
+
+    Returns:
+        List[float]: Hamming windowed filter taps
+    """
+    return list(tap_cache.low_pass(1, stage.in_rate, stage.cutoff,
+                                   stage.transition))
+
 
 class BaseTuner(gr.hier_block2):
     """Some base methods that are the same between the known tuner types.
@@ -25,58 +160,164 @@ class BaseTuner(gr.hier_block2):
     See TunerDemodNBFM and TunerDemodAM for better documentation.
     """
 
-    def set_center_freq(self, center_freq, rf_center_freq):
+    def _make_decimators(self, samp_rate, audio_rate, tap_cache):
+        """Makes the decimating filters planned for the sample rate
+
+        Sets the plan and the frequency translating FIR filter, which is the
+        first channel stage
+
+        Args:
+            samp_rate (float): Input baseband sample rate in sps
+            audio_rate (float): Output audio sample rate in sps
+            tap_cache (TapCache): Cache to get the filter taps from, or None
+                for a new one
+
+        Returns:
+            tuple: Channel filters after the translating one, audio filters,
+                and the arbitrary resampler or None if not needed
+        """
+        if tap_cache is None:
+            tap_cache = tapcache.TapCache()
+        self.plan = planner.plan_decimation(samp_rate, audio_rate=audio_rate)
+        stages = self.plan.channel_stages
+        self.freq_xlating_fir_filter_ccc = \
+            grfilter.freq_xlating_fir_filter_ccc(stages[0].decim,
+                                                 stage_taps(stages[0],
+                                                            tap_cache),
+                                                 self.center_freq, samp_rate)
+
+        # Taps are real, so the complex filters with real taps are cheaper
+        channel_filters = [grfilter.fir_filter_ccf(stage.decim,
+                                                   stage_taps(stage,
+                                                              tap_cache))
+                           for stage in stages[1:]]
+        audio_filters, resampler = self._make_audio_filters(tap_cache)
+        return channel_filters, audio_filters, resampler
+
+    def _make_audio_filters(self, tap_cache):
+        """Makes the audio filters of the plan
+
+        Args:
+            tap_cache (TapCache): Cache to get the filter taps from
+
+        Returns:
+            tuple: Audio filters, and the arbitrary resampler or None if not
+                needed
+        """
+        audio_filters = [grfilter.fir_filter_fff(stage.decim,
+                                                 stage_taps(stage, tap_cache))
+                         for stage in self.plan.audio_stages]
+
+        # Polyphase resampler takes the rest of the way to audio_rate
+        if self.plan.resamp_rate == 1.0:
+            resampler = None
+        else:
+            resampler = pfb.arb_resampler_fff(
+                self.plan.resamp_rate,
+                taps=list(tap_cache.resampler(self.plan.resamp_rate, 32)),
+                flt_size=32)
+        return audio_filters, resampler
+
+    def _make_recorder(self, channel_out, demods, squelched_out, audio_rate,
+                       audio_bps, preroll_time, tap_cache, writer_pool):
+        """Makes the recorder, fed by a second demodulator before the squelch
+
+        The channel squelch zeros the audio before it is demodulated, so a
+        pre-roll of what was received before it opened needs its own
+        demodulator and audio filters, at the channel rate
+
+        Args:
+            channel_out (gr.basic_block): Last channel filter
+            demods (list): Demodulator blocks of the unsquelched branch
+            squelched_out (gr.basic_block): Last block of squelched audio
+            audio_rate (float): Output audio sample rate in sps
+            audio_bps (int): Audio bit depth in bps (bits/samples)
+            preroll_time (float): Time in seconds of audio to record from
+                before the squelch opens
+            tap_cache (TapCache): Cache to get the filter taps from, or None
+                for a new one
+            writer_pool (WriterPool): Threads that write the files, or None
+                for new ones
+
+        Returns:
+            list: (name, block) pairs of the branch for the performance report
+        """
+        # pylint: disable=too-many-arguments
+        if tap_cache is None:
+            tap_cache = tapcache.TapCache()
+        if writer_pool is None:
+            writer_pool = writer.WriterPool(audio_rate, audio_bps)
+        audio_filters, resampler = self._make_audio_filters(tap_cache)
+        self.recorder = recorder.PrerollRecorder(writer_pool, audio_rate,
+                                                 preroll_time)
+        self.connect(channel_out, *(demods + audio_filters))
+        audio_out = audio_filters[-1]
+        if resampler is not None:
+            self.connect(audio_out, resampler)
+            audio_out = resampler
+        self.connect(audio_out, (self.recorder, 0))
+        self.connect(squelched_out, (self.recorder, 1))
+        perf_blocks = self._name_blocks("record_audio", audio_filters) + \
+            [("recorder", self.recorder)]
+        if resampler is not None:
+            perf_blocks.insert(-1, ("record_resampler", resampler.pfb))
+        return perf_blocks
+
+    @staticmethod
+    def _name_blocks(prefix, filters):
+        """Names the decimating filters for the performance report
+
+        Args:
+            prefix (string): Name prefix such as "decim"
+            filters (list): Filter blocks
+
+        Returns:
+            list: (name, block) pairs such as ("decim0", block)
+        """
+        return [(prefix + str(idx), block)
+                for idx, block in enumerate(filters)]
+
+    def set_center_freq(self, center_freq, rf_center_freq, xlating_freq=None):
         """Sets baseband center frequency and file name
 
         Sets baseband center frequency of frequency translating FIR filter
-        Also sets file name of wave file sink
-        If tuner is tuned to zero Hz then set to file name to /dev/null
+        Also sets file name of the recorder, which only makes the file once
+        the squelch opens
+        If tuner is tuned to zero Hz then nothing is recorded
         Otherwise set file name to tuned RF frequency in MHz
 
         Args:
             center_freq (float): Baseband center frequency in Hz
             rf_center_freq (float): RF center in Hz (for file name)
+            xlating_freq (float): Frequency to translate the input by in Hz,
+                if not center_freq, e.g. the residual within a channelizer
+                slice
         """
         # Since the frequency (hence file name) changed, then close it
-        self.blocks_wavfile_sink.close()
-
-        # If we never wrote any data to the wavfile sink, delete the file
-        self._delete_wavfile_if_empty()
+        if self.recorder is not None:
+            self.recorder.close()
 
         # Set the frequency
-        self.freq_xlating_fir_filter_ccc.set_center_freq(center_freq)
+        if xlating_freq is None:
+            xlating_freq = center_freq
+        self.freq_xlating_fir_filter_ccc.set_center_freq(xlating_freq)
         self.center_freq = center_freq
 
         # Set the file name
-        if self.center_freq == 0 or not self.record:
-            # If tuner at zero Hz, or record false, then file name to /dev/null
-            file_name = "/dev/null"
-        else:
-            # Otherwise use frequency and time stamp for file name
-            tstamp = "_" + str(int(time.time()))
-            file_freq = (rf_center_freq + self.center_freq)/1E6
-            file_freq = np.round(file_freq, 3)
-            file_name = 'wav/' + '{:.3f}'.format(file_freq) + tstamp + ".wav"
-
-            # Make sure the 'wav' directory exists
-            try:
-                os.mkdir('wav')
-            except OSError:  # will need to add something here for Win support
-                pass  # directory already exists
-
-        self.file_name = file_name
-        self.blocks_wavfile_sink.open(self.file_name)
-
-    def _delete_wavfile_if_empty(self):
-        """Delete the current wavfile if it's empty."""
-        if (not self.record or not self.file_name or
-                self.file_name == '/dev/null'):
+        if self.center_freq == 0 or self.recorder is None:
+            # If tuner at zero Hz, or record false, then do not record
+            self.file_name = None
             return
 
-        # If we never wrote any data to the wavfile sink, delete
-        # the (empty) wavfile
-        if os.stat(self.file_name).st_size in (44, 0):   # ugly hack
-            os.unlink(self.file_name)  # delete the file
+        # Otherwise use frequency and time stamp for file name
+        # The recorder makes the 'wav' directory with the first file
+        # When spooling, the name only labels the recording
+        tstamp = "_" + str(int(time.time()))
+        file_freq = (rf_center_freq + self.center_freq)/1E6
+        file_freq = np.round(file_freq, 3)
+        self.file_name = 'wav/' + '{:.3f}'.format(file_freq) + tstamp + \
+            self.recorder.extension
+        self.recorder.open(self.file_name, rf_center_freq + self.center_freq)
 
     def set_squelch(self, squelch_db):
         """Sets the threshold for both squelches
@@ -86,13 +327,11 @@ class BaseTuner(gr.hier_block2):
         """
         self.analog_pwr_squelch_cc.set_threshold(squelch_db)
 
-    def __del__(self):
-        """Called when the object is destroyed."""
-        # Make a best effort attempt to clean up our wavfile if it's empty
-        try:
-            self._delete_wavfile_if_empty()
-        except Exception:
-            pass  # oh well, we're dying anyway
+    def close(self):
+        """Closes the file being recorded, so its header is complete
+        """
+        if self.recorder is not None:
+            self.recorder.close()
 
 class TunerDemodNBFM(BaseTuner):
     """Tuner, demodulator, and recorder chain for narrow band FM demodulation
@@ -100,22 +339,23 @@ class TunerDemodNBFM(BaseTuner):
     Kept as it's own class so multiple can be instantiated in parallel
     Accepts complex baseband samples at 1 Msps minimum
     Frequency translating FIR filter tunes from -samp_rate/2 to +samp_rate/2
-    The following sample rates assume 1 Msps input
-    First two stages of decimation are 5 each for a total of 25
-    Thus first two stages brings 1 Msps down to 40 ksps
-    The third stage decimates by int(samp_rate/1E6)
-    Thus output rate will vary from 40 ksps to 79.99 ksps
+    The decimation stages are chosen by planner.plan_decimation() for the
+    fewest multiply-accumulates at the sample rate
+    The channel stages take the rate down to 26-52 ksps, with all but the
+    last only stopping what would alias onto the channel, and the last
+    rate is at least twice its 13 kHz stop band edge, so nothing aliases
     The channel is filtered to 12.5 KHz bandwidth followed by squelch
     The squelch is non-blocking since samples will be added with other demods
-    The quadrature demod is followed by a fourth stage of decimation by 5
-    This brings the sample rate down to 8 ksps to 15.98 ksps
+    The quadrature demod is followed by the audio stages of decimation
     The audio is low-pass filtered to 3.5 kHz bandwidth
-    The polyphase resampler resamples by samp_rate/(decims[1] * decims[0]**3)
+    The polyphase resampler takes the audio the rest of the way to 8 ksps,
+    and is left out if the stages reach it exactly
     This results in a constant 8 ksps, irrespective of RF sample rate
     This 8 ksps audio stream may be added to other demod streams
-    The audio is run through an additional blocking squelch at -200 dB
-    This stops the sample flow so squelched audio is not recorded to file
-    The wav file sink stores 8-bit samples (default/grainy quality but compact)
+    If recording, a second demod and audio filters before the squelch feed
+    the recorder, which keeps a pre-roll and makes the file when the
+    squelch opens
+    The wav file stores 8-bit samples (default/grainy quality but compact)
     Default demodulator center frequency is 0 Hz
     This is desired since hardware DC removal reduces sensitivity at 0 Hz
     NBFM demod of LO leakage will just be 0 amplitude
@@ -125,15 +365,27 @@ class TunerDemodNBFM(BaseTuner):
         audio_rate (float): Output audio sample rate in sps (8 kHz minimum)
         record (bool): Record audio to file if True
         audio_bps (int): Audio bit depth in bps (bits/samples)
+        tap_cache (TapCache): Cache of filter taps shared with other tuners,
+            or None for a new one
+        preroll_time (float): Time in seconds of audio to record from before
+            the squelch opens
+        writer_pool (WriterPool): Threads that write the files, shared with
+            other tuners, or None for new ones
 
     Attributes:
         center_freq (float): Baseband center frequency in Hz
         record (bool): Record audio to file if True
+        file_name (string): Name of the file to record to, or None
+        recorder (PrerollRecorder): Records the audio, or None
+        perf_blocks (OrderedDict): Blocks of the chain by name
+        plan (DecimPlan): Decimation plan of the chain
     """
     # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
 
     def __init__(self, samp_rate=4E6, audio_rate=8000, record=True,
-                 audio_bps=8):
+                 audio_bps=8, tap_cache=None, preroll_time=0.25,
+                 writer_pool=None):
         gr.hier_block2.__init__(self, "TunerDemodNBFM",
                                 gr.io_signature(1, 1, gr.sizeof_gr_complex),
                                 gr.io_signature(1, 1, gr.sizeof_float))
@@ -142,36 +394,13 @@ class TunerDemodNBFM(BaseTuner):
         self.center_freq = 0
         squelch_db = -60
         self.quad_demod_gain = 0.050
-        self.file_name = "/dev/null"
+        self.file_name = None
         self.record = record
+        self.recorder = None
 
-        # Decimation values for four stages of decimation
-        decims = (5, int(samp_rate/1E6))
-
-        # Low pass filter taps for decimation by 5
-        low_pass_filter_taps_0 = \
-            grfilter.firdes_low_pass(1, 1, 0.090, 0.010,
-                                     grfilter.firdes.WIN_HAMMING)
-
-        # Frequency translating FIR filter decimating by 5
-        self.freq_xlating_fir_filter_ccc = \
-            grfilter.freq_xlating_fir_filter_ccc(decims[0],
-                                                 low_pass_filter_taps_0,
-                                                 self.center_freq, samp_rate)
-
-        # FIR filter decimating by 5
-        fir_filter_ccc_0 = grfilter.fir_filter_ccc(decims[0],
-                                                   low_pass_filter_taps_0)
-
-        # Low pass filter taps for decimation from samp_rate/25 to 40-79.9 ksps
-        # In other words, decimation by int(samp_rate/1E6)
-        # 12.5 kHz cutoff for NBFM channel bandwidth
-        low_pass_filter_taps_1 = grfilter.firdes_low_pass(
-            1, samp_rate/decims[0]**2, 12.5E3, 1E3, grfilter.firdes.WIN_HAMMING)
-
-        # FIR filter decimation by int(samp_rate/1E6)
-        fir_filter_ccc_1 = grfilter.fir_filter_ccc(decims[1],
-                                                   low_pass_filter_taps_1)
+        # Decimating filters with the fewest MACs for the sample rate
+        channel_filters, audio_filters, resampler = \
+            self._make_decimators(samp_rate, audio_rate, tap_cache)
 
         # Non blocking power squelch
         self.analog_pwr_squelch_cc = analog.pwr_squelch_cc(squelch_db,
@@ -179,46 +408,43 @@ class TunerDemodNBFM(BaseTuner):
 
         # Quadrature demod with gain set for decent audio
         # The gain will be later multiplied by the 0 dB normalized volume
+        # Scale it with the channel rate, so the volume is as at 40 ksps
+        self.quad_demod_gain *= self.plan.channel_rate/40E3
         self.analog_quadrature_demod_cf = \
             analog.quadrature_demod_cf(self.quad_demod_gain)
 
-        # 3.5 kHz cutoff for audio bandwidth
-        low_pass_filter_taps_2 = grfilter.firdes_low_pass(1,\
-                        samp_rate/(decims[1] * decims[0]**2),\
-                        3.5E3, 500, grfilter.firdes.WIN_HAMMING)
-
-        # FIR filter decimating by 5 from 40-79.9 ksps to 8-15.98 ksps
-        fir_filter_fff_0 = grfilter.fir_filter_fff(decims[0],
-                                                   low_pass_filter_taps_2)
-
-        # Polyphase resampler allows arbitary RF sample rates
-        # Takes 8-15.98 ksps to a constant 8 ksps for audio
-        pfb_resamp = audio_rate/float(samp_rate/(decims[1] * decims[0]**3))
-        pfb_arb_resampler_fff = pfb.arb_resampler_fff(pfb_resamp, taps=None,
-                                                      flt_size=32)
-
         # Connect the blocks for the demod
-        self.connect(self, self.freq_xlating_fir_filter_ccc)
-        self.connect(self.freq_xlating_fir_filter_ccc, fir_filter_ccc_0)
-        self.connect(fir_filter_ccc_0, fir_filter_ccc_1)
-        self.connect(fir_filter_ccc_1, self.analog_pwr_squelch_cc)
-        self.connect(self.analog_pwr_squelch_cc,
-                     self.analog_quadrature_demod_cf)
-        self.connect(self.analog_quadrature_demod_cf, fir_filter_fff_0)
-        self.connect(fir_filter_fff_0, pfb_arb_resampler_fff)
-        self.connect(pfb_arb_resampler_fff, self)
-
-        # Need to set this to a very low value of -200 since it is after demod
-        # Only want it to gate when the previous squelch has gone to zero
-        analog_pwr_squelch_ff = analog.pwr_squelch_ff(-200, 1e-1, 0, True)
-
-        # File sink with single channel and bits/sample
-        self.blocks_wavfile_sink = blocks.wavfile_sink(self.file_name, 1,
-                                                       audio_rate, audio_bps)
-
-        # Connect the blocks for recording
-        self.connect(pfb_arb_resampler_fff, analog_pwr_squelch_ff)
-        self.connect(analog_pwr_squelch_ff, self.blocks_wavfile_sink)
+        channel_out = ([self.freq_xlating_fir_filter_ccc] +
+                       channel_filters)[-1]
+        self.connect(self, self.freq_xlating_fir_filter_ccc,
+                     *channel_filters)
+        self.connect(channel_out, self.analog_pwr_squelch_cc,
+                     self.analog_quadrature_demod_cf, *audio_filters)
+        audio_out = audio_filters[-1]
+        if resampler is not None:
+            self.connect(audio_out, resampler)
+            audio_out = resampler
+        self.connect(audio_out, self)
+
+        # Blocks to report the performance of
+        # The resampler is a hier block, so take the filterbank inside it
+        self.perf_blocks = collections.OrderedDict(
+            [("xlating", self.freq_xlating_fir_filter_ccc)] +
+            self._name_blocks("decim", channel_filters) +
+            [("squelch", self.analog_pwr_squelch_cc),
+             ("demod", self.analog_quadrature_demod_cf)] +
+            self._name_blocks("audio", audio_filters))
+        if resampler is not None:
+            self.perf_blocks["resampler"] = resampler.pfb
+
+        # Record from a second quadrature demod before the squelch
+        if record:
+            self.record_demod_cf = \
+                analog.quadrature_demod_cf(self.quad_demod_gain)
+            self.perf_blocks["record_demod"] = self.record_demod_cf
+            self.perf_blocks.update(self._make_recorder(
+                channel_out, [self.record_demod_cf], audio_out, audio_rate,
+                audio_bps, preroll_time, tap_cache, writer_pool))
 
     def set_volume(self, volume_db):
         """Sets the volume
@@ -228,6 +454,8 @@ class TunerDemodNBFM(BaseTuner):
         """
         gain = self.quad_demod_gain * 10**(volume_db/20.0)
         self.analog_quadrature_demod_cf.set_gain(gain)
+        if self.recorder is not None:
+            self.record_demod_cf.set_gain(gain)
 
 class TunerDemodAM(BaseTuner):
     """Tuner, demodulator, and recorder chain for AM demodulation
@@ -235,23 +463,24 @@ class TunerDemodAM(BaseTuner):
     Kept as it's own class so multiple can be instantiated in parallel
     Accepts complex baseband samples at 1 Msps minimum
     Frequency translating FIR filter tunes from -samp_rate/2 to +samp_rate/2
-    The following sample rates assume 1 Msps input
-    First two stages of decimation are 5 each for a total of 25
-    Thus first two stages brings 1 Msps down to 40 ksps
-    The third stage decimates by int(samp_rate/1E6)
-    Thus output rate will vary from 40 ksps to 79.99 ksps
+    The decimation stages are chosen by planner.plan_decimation() for the
+    fewest multiply-accumulates at the sample rate
+    The channel stages take the rate down to 26-52 ksps, with all but the
+    last only stopping what would alias onto the channel, and the last
+    rate is at least twice its 13 kHz stop band edge, so nothing aliases
     The channel is filtered to 12.5 KHz bandwidth followed by squelch
     The squelch is non-blocking since samples will be added with other demods
     The AGC sets level (volume) prior to AM demod
-    The AM demod is followed by a fourth stage of decimation by 5
-    This brings the sample rate down to 8 ksps to 15.98 ksps
+    The AM demod is followed by the audio stages of decimation
     The audio is low-pass filtered to 3.5 kHz bandwidth
-    The polyphase resampler resamples by samp_rate/(decims[1] * decims[0]**3)
+    The polyphase resampler takes the audio the rest of the way to 8 ksps,
+    and is left out if the stages reach it exactly
     This results in a constant 8 ksps, irrespective of RF sample rate
     This 8 ksps audio stream may be added to other demod streams
-    The audio is run through an additional blocking squelch at -200 dB
-    This stops the sample flow so squelced audio is not recorded to file
-    The wav file sink stores 8-bit samples (default/grainy quality but compact)
+    If recording, a second AGC, demod and audio filters before the squelch
+    feed the recorder, which keeps a pre-roll and makes the file when the
+    squelch opens
+    The wav file stores 8-bit samples (default/grainy quality but compact)
     Default demodulator center frequency is 0 Hz
     This is desired since hardware DC removal reduces sensitivity at 0 Hz
     AM demod of LO leakage will just be 0 amplitude
@@ -261,16 +490,28 @@ class TunerDemodAM(BaseTuner):
         audio_rate (float): Output audio sample rate in sps (8 kHz minimum)
         record (bool): Record audio to file if True
         audio_bps (int): Audio bit depth in bps (bits/samples)
+        tap_cache (TapCache): Cache of filter taps shared with other tuners,
+            or None for a new one
+        preroll_time (float): Time in seconds of audio to record from before
+            the squelch opens
+        writer_pool (WriterPool): Threads that write the files, shared with
+            other tuners, or None for new ones
 
     Attributes:
         center_freq (float): Baseband center frequency in Hz
         record (bool): Record audio to file if True
+        file_name (string): Name of the file to record to, or None
+        recorder (PrerollRecorder): Records the audio, or None
+        perf_blocks (OrderedDict): Blocks of the chain by name
+        plan (DecimPlan): Decimation plan of the chain
     """
     # pylint: disable=too-many-instance-attributes
     # pylint: disable=too-many-locals
+    # pylint: disable=too-many-arguments
 
     def __init__(self, samp_rate=4E6, audio_rate=8000, record=True,
-                 audio_bps=8):
+                 audio_bps=8, tap_cache=None, preroll_time=0.25,
+                 writer_pool=None):
         gr.hier_block2.__init__(self, "TunerDemodAM",
                                 gr.io_signature(1, 1, gr.sizeof_gr_complex),
                                 gr.io_signature(1, 1, gr.sizeof_float))
@@ -279,36 +520,13 @@ class TunerDemodAM(BaseTuner):
         self.center_freq = 0
         squelch_db = -60
         self.agc_ref = 0.1
-        self.file_name = "/dev/null"
+        self.file_name = None
         self.record = record
+        self.recorder = None
 
-        # Decimation values for four stages of decimation
-        decims = (5, int(samp_rate/1E6))
-
-        # Low pass filter taps for decimation by 5
-        low_pass_filter_taps_0 = \
-            grfilter.firdes_low_pass(1, 1, 0.090, 0.010,
-                                     grfilter.firdes.WIN_HAMMING)
-
-        # Frequency translating FIR filter decimating by 5
-        self.freq_xlating_fir_filter_ccc = \
-            grfilter.freq_xlating_fir_filter_ccc(decims[0],
-                                                 low_pass_filter_taps_0,
-                                                 self.center_freq, samp_rate)
-
-        # FIR filter decimating by 5
-        fir_filter_ccc_0 = grfilter.fir_filter_ccc(decims[0],
-                                                   low_pass_filter_taps_0)
-
-        # Low pass filter taps for decimation from samp_rate/25 to 40-79.9 ksps
-        # In other words, decimation by int(samp_rate/1E6)
-        # 12.5 kHz cutoff for NBFM channel bandwidth
-        low_pass_filter_taps_1 = grfilter.firdes_low_pass(
-            1, samp_rate/decims[0]**2, 12.5E3, 1E3, grfilter.firdes.WIN_HAMMING)
-
-        # FIR filter decimation by int(samp_rate/1E6)
-        fir_filter_ccc_1 = grfilter.fir_filter_ccc(decims[1],
-                                                   low_pass_filter_taps_1)
+        # Decimating filters with the fewest MACs for the sample rate
+        channel_filters, audio_filters, resampler = \
+            self._make_decimators(samp_rate, audio_rate, tap_cache)
 
         # Non blocking power squelch
         # Squelch level needs to be lower than NBFM or else choppy AM demod
@@ -324,43 +542,43 @@ class TunerDemodAM(BaseTuner):
         # Can't use analog.am_demod_cf() since it won't work with N>2 demods
         am_demod_cf = blocks.complex_to_mag(1)
 
-        # 3.5 kHz cutoff for audio bandwidth
-        low_pass_filter_taps_2 = grfilter.firdes_low_pass(1,\
-                        samp_rate/(decims[1] * decims[0]**2),\
-                        3.5E3, 500, grfilter.firdes.WIN_HAMMING)
-
-        # FIR filter decimating by 5 from 40-79.9 ksps to 8-15.98 ksps
-        fir_filter_fff_0 = grfilter.fir_filter_fff(decims[0],
-                                                   low_pass_filter_taps_2)
-
-        # Polyphase resampler allows arbitary RF sample rates
-        # Takes 8-15.98 ksps to a constant 8 ksps for audio
-        pfb_resamp = audio_rate/float(samp_rate/(decims[1] * decims[0]**3))
-        pfb_arb_resampler_fff = pfb.arb_resampler_fff(pfb_resamp, taps=None,
-                                                      flt_size=32)
-
         # Connect the blocks for the demod
-        self.connect(self, self.freq_xlating_fir_filter_ccc)
-        self.connect(self.freq_xlating_fir_filter_ccc, fir_filter_ccc_0)
-        self.connect(fir_filter_ccc_0, fir_filter_ccc_1)
-        self.connect(fir_filter_ccc_1, self.analog_pwr_squelch_cc)
-        self.connect(self.analog_pwr_squelch_cc, self.agc3_cc)
-        self.connect(self.agc3_cc, am_demod_cf)
-        self.connect(am_demod_cf, fir_filter_fff_0)
-        self.connect(fir_filter_fff_0, pfb_arb_resampler_fff)
-        self.connect(pfb_arb_resampler_fff, self)
-
-        # Need to set this to a very low value of -200 since it is after demod
-        # Only want it to gate when the previous squelch has gone to zero
-        analog_pwr_squelch_ff = analog.pwr_squelch_ff(-200, 1e-1, 0, True)
-
-        # File sink with single channel and 8 bits/sample
-        self.blocks_wavfile_sink = blocks.wavfile_sink(self.file_name, 1,
-                                                       audio_rate, audio_bps)
-
-        # Connect the blocks for recording
-        self.connect(pfb_arb_resampler_fff, analog_pwr_squelch_ff)
-        self.connect(analog_pwr_squelch_ff, self.blocks_wavfile_sink)
+        channel_out = ([self.freq_xlating_fir_filter_ccc] +
+                       channel_filters)[-1]
+        self.connect(self, self.freq_xlating_fir_filter_ccc,
+                     *channel_filters)
+        self.connect(channel_out, self.analog_pwr_squelch_cc, self.agc3_cc,
+                     am_demod_cf, *audio_filters)
+        audio_out = audio_filters[-1]
+        if resampler is not None:
+            self.connect(audio_out, resampler)
+            audio_out = resampler
+        self.connect(audio_out, self)
+
+        # Blocks to report the performance of
+        # The resampler is a hier block, so take the filterbank inside it
+        self.perf_blocks = collections.OrderedDict(
+            [("xlating", self.freq_xlating_fir_filter_ccc)] +
+            self._name_blocks("decim", channel_filters) +
+            [("squelch", self.analog_pwr_squelch_cc),
+             ("agc", self.agc3_cc),
+             ("demod", am_demod_cf)] +
+            self._name_blocks("audio", audio_filters))
+        if resampler is not None:
+            self.perf_blocks["resampler"] = resampler.pfb
+
+        # Record from a second AGC and AM demod before the squelch
+        if record:
+            self.record_agc3_cc = analog.agc3_cc(1.0, 1E-4, self.agc_ref,
+                                                 10, 1)
+            self.record_agc3_cc.set_max_gain(65536)
+            record_demod_cf = blocks.complex_to_mag(1)
+            self.perf_blocks["record_agc"] = self.record_agc3_cc
+            self.perf_blocks["record_demod"] = record_demod_cf
+            self.perf_blocks.update(self._make_recorder(
+                channel_out, [self.record_agc3_cc, record_demod_cf],
+                audio_out, audio_rate, audio_bps, preroll_time, tap_cache,
+                writer_pool))
 
     def set_volume(self, volume_db):
         """Sets the volume
@@ -370,6 +588,8 @@ class TunerDemodAM(BaseTuner):
         """
         agc_ref = self.agc_ref * 10**(volume_db/20.0)
         self.agc3_cc.set_reference(agc_ref)
+        if self.recorder is not None:
+            self.record_agc3_cc.set_reference(agc_ref)
 
 class Receiver(gr.top_block):
     """Receiver for NBFM and AM modulation
@@ -385,6 +605,31 @@ class Receiver(gr.top_block):
         freq_correction (int): Frequency correction in ppm
         record (bool): Record audio to file if True
         audio_bps (int): Audio bit depth in bps (bits/samples)
+        ring_frames (int): Number of integrated spectra to keep
+        channelizer (bool): Feed the demodulators from a polyphase
+            channelizer rather than each from the full rate source
+        gate_idle (bool): Disconnect demodulators parked at 0 Hz from the
+            flow graph, so they do not use any CPU
+        gate_hold (float): Time in seconds a demodulator must be parked
+            before it is disconnected
+        perf (bool): Turn on the GNU Radio performance counters
+        tap_cache_name (string): Name of JSON file to keep filter taps in
+            between runs, or "" for none
+        bin_width (float): Widest FFT bin in Hz, or 0 for about 4 kHz
+        spectrum_rate (float): Integrated spectra per second wanted
+        averages (int): FFT vectors to integrate into each spectrum
+        welch (bool): Average 50 % overlapped FFTs of every sample, rather
+            than dropping vectors
+        fast_time (float): Time in seconds of a second, short integration
+            for detecting channel onset, or 0 for none
+        preroll_time (float): Time in seconds of audio to record from before
+            the squelch opens
+        codec (string): Recording format, "wav" (PCM of audio_bps),
+            "ulaw", or "flac"
+        num_writers (int): Number of threads writing the recordings
+        spool (bool): Append the recordings to spool files in 'spool', with
+            an index, rather than make a file each
+        spool_size (int): Size in bytes to start a new spool file at
 
     Attributes:
         center_freq (float): Hardware RF center frequency in Hz
@@ -392,6 +637,23 @@ class Receiver(gr.top_block):
         gain_db (int): Hardware RF gain in dB
         squelch_db (int): Squelch in dB
         volume_dB (int): Volume in dB
+        spectrum_sink (SpectrumSink): Pushes spectra and keeps the last ones
+        fast_sink (SpectrumSink): Pushes the short integrations, or None
+        channelizer (channelizer_ccf): Splits the band into slices, or None
+        num_slices (int): Number of channelizer slices
+        slice_spacing (float): Spacing of channelizer slices in Hz
+        demod_slices [int]: Channelizer slice feeding each demodulator,
+            or None if gated out of the flow graph
+        num_demod (int): Number of demodulators
+        spectrum_rate (float): Integrated spectra per second
+        fast_rate (float): Short integrations per second, 0 for none
+        spectrum_plan (SpectrumPlan): FFT length, averaging and cost of the
+            spectrum path
+        file_opens (int): Number of audio files made by the recorders
+        writer_pool (WriterPool): Threads that write the recordings, or None
+        tap_cache (TapCache): Filter taps shared by all tuners
+        startup_times (OrderedDict): Time in seconds of each step of
+            __init__(), and of designing and loading the taps within them
     """
     # pylint: disable=too-many-instance-attributes
     # pylint: disable=too-many-locals
@@ -399,11 +661,27 @@ class Receiver(gr.top_block):
 
     def __init__(self, ask_samp_rate=4E6, num_demod=4, type_demod=0,
                  hw_args="uhd", freq_correction=0, record=True, play=True,
-                 audio_bps=8):
+                 audio_bps=8, ring_frames=100, channelizer=False,
+                 gate_idle=False, perf=False, tap_cache_name="", bin_width=0,
+                 spectrum_rate=10.0, averages=100, welch=False, fast_time=0,
+                 preroll_time=0.25, codec="wav", num_writers=2, spool=False,
+                 spool_size=spl.MAX_SIZE, gate_hold=10.0):
+
+        # Time each step of start up
+        self.startup_times = collections.OrderedDict()
+        start = time.time()
+
+        # The performance counters are only read when the flow graph starts
+        if perf:
+            gr.prefs().set_bool("PerfCounters", "on", True)
 
         # Call the initialization method from the parent class
         gr.top_block.__init__(self, "Receiver")
 
+        # Filter taps shared by all tuners, and kept between runs
+        self.tap_cache = tapcache.TapCache(tap_cache_name)
+        start = self._lap("top block", start)
+
         # Default values
         self.center_freq = 144E6
         self.gain_db = 0
@@ -411,6 +689,7 @@ class Receiver(gr.top_block):
         self.bb_gain_db = 16
         self.squelch_db = -60
         self.volume_db = 0
+        self.removed_file_opens = 0
         audio_rate = 8000
 
         # Setup the USRP source, or use the USRP sim
@@ -428,78 +707,417 @@ class Receiver(gr.top_block):
 
         # Set the I/Q bandwidth to 80 % of sample rate
         self.src.set_bandwidth(0.8 * self.samp_rate)
+        start = self._lap("source", start)
 
         # NBFM channel is about 10 KHz wide
-        # Want  about 3 FFT bins to span a channel
-        # Use length FFT so 4 Msps / 1024 = 3906.25 Hz/bin
-        # This also means 3906.25 vectors/second
-        # Using below formula keeps FFT size a power of two
-        # Also keeps bin size constant for power of two sampling rates
-        # Use of 256 sets 3906.25 Hz/bin; increase to reduce bin size
-        samp_ratio = self.samp_rate / 1E6
-        fft_length = 256 * int(pow(2, np.ceil(np.log(samp_ratio)/np.log(2))))
+        # By default want about 3 FFT bins to span a channel
+        # 4 Msps / 1024 = 3906.25 Hz/bin and 1000 vectors/second kept
+        # Integrated 100 at a time for a video average at 10 spectra/second
+        # A finer bin_width, other rates and averaging, or 50 % overlapped
+        # (Welch) averaging of every sample may be planned instead
+        # A short integration of the same vectors may be added, about 10 ms
+        # so a carrier is seen within a few ms of keying up
+        self.spectrum_plan = planner.plan_spectrum(self.samp_rate, bin_width,
+                                                   spectrum_rate, averages,
+                                                   welch, fast_time)
+        fft_length = self.spectrum_plan.fft_length
 
         # -----------Flow for FFT--------------
 
-        # Convert USRP steam to vector
-        stream_to_vector = blocks.stream_to_vector(gr.sizeof_gr_complex*1,
-                                                   fft_length)
-
-        # Want about 1000 vector/sec
-        amount = int(round(self.samp_rate/fft_length/1000))
-        keep_one_in_n = blocks.keep_one_in_n(gr.sizeof_gr_complex*
-                                             fft_length, amount)
-
-        # Take FFT
-        fft_vcc = fft.fft_vcc(fft_length, True,
-                              window.blackmanharris(fft_length), True, 1)
-
-        # Compute the power
-        complex_to_mag_squared = blocks.complex_to_mag_squared(fft_length)
-
-        # Video average and decimate from 1000 vector/sec to 10 vector/sec
-        integrate_ff = blocks.integrate_ff(100, fft_length)
-
-        # Probe vector
-        self.probe_signal_vf = blocks.probe_signal_vf(fft_length)
+        # Each set of vectors is converted, windowed, and FFT'd to power
+        # Welch averaging adds a second set, delayed by half a vector
+        self.fft_blocks = collections.OrderedDict()
+        num_sets = 2 if self.spectrum_plan.welch else 1
+        add_ff = blocks.add_ff(fft_length) if num_sets > 1 else None
+        for idx in range(num_sets):
+            suffix = "" if idx == 0 else str(idx)
+
+            # Convert USRP steam to vector
+            stream_to_vector = blocks.stream_to_vector(
+                gr.sizeof_gr_complex*1, fft_length)
+            if idx == 0:
+                self.connect(self.src, stream_to_vector)
+            else:
+                delay = blocks.delay(gr.sizeof_gr_complex, fft_length/2)
+                self.connect(self.src, delay, stream_to_vector)
+            self.fft_blocks["stream_to_vector" + suffix] = stream_to_vector
+
+            # Keep 1 in N vectors, about 1000 vector/sec by default
+            if self.spectrum_plan.keep > 1:
+                keep_one_in_n = blocks.keep_one_in_n(
+                    gr.sizeof_gr_complex*fft_length, self.spectrum_plan.keep)
+                self.connect(stream_to_vector, keep_one_in_n)
+                self.fft_blocks["keep_one_in_n" + suffix] = keep_one_in_n
+            else:
+                keep_one_in_n = stream_to_vector
+
+            # Take FFT
+            fft_vcc = fft.fft_vcc(fft_length, True,
+                                  window.blackmanharris(fft_length), True, 1)
+
+            # Compute the power
+            complex_to_mag_squared = \
+                blocks.complex_to_mag_squared(fft_length)
+            self.connect(keep_one_in_n, fft_vcc, complex_to_mag_squared)
+            self.fft_blocks["fft" + suffix] = fft_vcc
+            self.fft_blocks["mag_squared" + suffix] = complex_to_mag_squared
+            if add_ff is not None:
+                self.connect(complex_to_mag_squared, (add_ff, idx))
+
+        # Video average and decimate, from 1000 vector/sec to 10 vector/sec
+        # by default
+        integrate_ff = blocks.integrate_ff(self.spectrum_plan.averages,
+                                           fft_length)
+        self.spectrum_rate = self.spectrum_plan.spectrum_rate
+
+        # Push each integrated spectrum to the scanner, scaled to the power
+        # of the default averaging
+        self.spectrum_sink = SpectrumSink(fft_length, ring_frames,
+                                          self.spectrum_plan.scale)
 
         # Connect the blocks
-        self.connect(self.src, stream_to_vector, keep_one_in_n,
-                     fft_vcc, complex_to_mag_squared,
-                     integrate_ff, self.probe_signal_vf)
+        if add_ff is not None:
+            self.connect(add_ff, integrate_ff)
+            self.fft_blocks["add"] = add_ff
+            power = add_ff
+        else:
+            self.connect(complex_to_mag_squared, integrate_ff)
+            power = complex_to_mag_squared
+        self.connect(integrate_ff, self.spectrum_sink)
+        self.fft_blocks["integrate"] = integrate_ff
+        self.fft_blocks["spectrum_sink"] = self.spectrum_sink
+
+        # Short integration of the same power vectors, pushed to a second
+        # sink that shares the condition, so the scanner waits on both
+        self.fast_rate = self.spectrum_plan.fast_rate
+        if self.spectrum_plan.fast_averages:
+            fast_integrate = blocks.integrate_ff(
+                self.spectrum_plan.fast_averages, fft_length)
+            self.fast_sink = SpectrumSink(fft_length, ring_frames,
+                                          self.spectrum_plan.fast_scale, True,
+                                          self.spectrum_sink.condition)
+            self.connect(power, fast_integrate, self.fast_sink)
+            self.fft_blocks["fast_integrate"] = fast_integrate
+            self.fft_blocks["fast_sink"] = self.fast_sink
+        else:
+            self.fast_sink = None
+        start = self._lap("fft", start)
 
         # -----------Flow for Demod--------------
 
+        if channelizer:
+            # Split the band into slices once, rather than each demodulator
+            # filtering the full rate source
+            # Each demodulator takes the slice nearest its channel and only
+            # translates by the residual, at 1 to 2 Msps
+            self.num_slices, self.slice_spacing = \
+                channelizer_slices(self.samp_rate)
+            self.channelizer = pfb.channelizer_ccf(
+                self.num_slices,
+                channelizer_taps(self.num_slices, self.tap_cache), 2)
+            self.connect(self.src, self.channelizer)
+
+            # All slices must be connected, so terminate them in null sinks
+            for idx in range(self.num_slices):
+                self.connect((self.channelizer, idx),
+                             blocks.null_sink(gr.sizeof_gr_complex))
+            demod_rate = 2 * self.slice_spacing
+            start = self._lap("channelizer", start)
+        else:
+            self.channelizer = None
+            self.num_slices = 1
+            self.slice_spacing = self.samp_rate
+            demod_rate = self.samp_rate
+
         # Create N parallel demodulators as a list of objects
-        # Default to NBFM demod
+        # Keep their settings so more can be made at run time
+        self.type_demod = type_demod
+        self.demod_rate = demod_rate
+        self.audio_rate = audio_rate
+        self.record = record
+        self.audio_bps = audio_bps
+        self.preroll_time = preroll_time
+        if record:
+            # Files are written by threads, off the flow graph
+            if spool:
+                spool_store = spl.SpoolStore("spool", spool_size)
+            else:
+                spool_store = None
+            self.writer_pool = writer.WriterPool(audio_rate, audio_bps, codec,
+                                                 num_writers,
+                                                 spool=spool_store)
+        else:
+            self.writer_pool = None
         self.demodulators = []
+        self.demod_slices = []
+        self.parked_times = []
+        self.gate_idle = gate_idle
+        self.gate_hold = gate_hold
         for idx in range(num_demod):
-            if type_demod == 1:
-                self.demodulators.append(TunerDemodAM(self.samp_rate,
-                                                      audio_rate, record,
-                                                      audio_bps))
-            else:
-                self.demodulators.append(TunerDemodNBFM(self.samp_rate,
-                                                        audio_rate, record,
-                                                        audio_bps))
+            self.demodulators.append(self._make_demod())
+            self.demod_slices.append(None)
+            self.parked_times.append(start)
+        self.num_demod = num_demod
+        start = self._lap("demodulators", start)
 
         if play:
             # Create an adder
-            add_ff = blocks.add_ff(1)
+            self.add_ff = blocks.add_ff(1)
 
-            # Connect the demodulators between the source and adder
-            for idx, demodulator in enumerate(self.demodulators):
-                self.connect(self.src, demodulator, (add_ff, idx))
+            # Silence for the adder inputs of gated demodulators
+            self.null_audio = blocks.null_source(gr.sizeof_float)
 
             # Audio sink
             audio_sink = audio.sink(audio_rate)
 
             # Connect the summed outputs to the audio sink
-            self.connect(add_ff, audio_sink)
+            self.connect(self.add_ff, audio_sink)
+        else:
+            # Demodulators are just connected to the receiver source
+            self.add_ff = None
+            self.null_audio = None
+        start = self._lap("audio", start)
+
+        # Parked demodulators are at 0 Hz, so gate them out, or otherwise
+        # connect them between the first slice and the adder
+        for idx in range(num_demod):
+            self._connect_demod(idx, None if gate_idle else 0)
+        start = self._lap("connect", start)
+
+        # Keep any new taps for the next run
+        self.tap_cache.save()
+        self._lap("tap save", start)
+        self.startup_times["(tap load)"] = self.tap_cache.load_time
+        self.startup_times["(tap design)"] = self.tap_cache.design_time
+
+    def _lap(self, name, start):
+        """Keeps the time of a step of start up
+
+        Args:
+            name (string): Name of the step
+            start (float): Time the step started
+
+        Returns:
+            float: Time now, the start of the next step
+        """
+        stop = time.time()
+        self.startup_times[name] = stop - start
+        return stop
+
+    def _make_demod(self):
+        """Makes a tuner/demodulator of the receiver type
+
+        Default to NBFM demod
+
+        Returns:
+            BaseTuner: New demodulator parked at 0 Hz
+        """
+        if self.type_demod == 1:
+            return TunerDemodAM(self.demod_rate, self.audio_rate, self.record,
+                                self.audio_bps, self.tap_cache,
+                                self.preroll_time, self.writer_pool)
+        else:
+            return TunerDemodNBFM(self.demod_rate, self.audio_rate,
+                                  self.record, self.audio_bps, self.tap_cache,
+                                  self.preroll_time, self.writer_pool)
+
+    def set_num_demod(self, num_demod, rf_center_freq):
+        """Grows or shrinks the demodulator pool while running
+
+        New demodulators are parked at 0 Hz, with the current squelch and
+        volume
+        Demodulators are removed from the end of the list, and their files
+        closed, so the adder inputs stay contiguous
+        All reconnections are under a single lock() and unlock() of the flow
+        graph
+        The demodulators list is changed in place, so references to it stay
+        valid
+
+        Args:
+            num_demod (int): Number of demodulators, clamped to 1 minimum
+            rf_center_freq (float): RF center in Hz (for file name)
+        """
+        num_demod = max(1, int(num_demod))
+        if num_demod == self.num_demod:
+            return
+
+        self.lock()
+        while len(self.demodulators) > num_demod:
+            idx = len(self.demodulators) - 1
+            self._disconnect_demod(idx)
+            demodulator = self.demodulators.pop()
+            demodulator.set_center_freq(0, rf_center_freq)
+            if demodulator.recorder is not None:
+                self.removed_file_opens += demodulator.recorder.file_opens
+            self.demod_slices.pop()
+            self.parked_times.pop()
+        while len(self.demodulators) < num_demod:
+            demodulator = self._make_demod()
+            demodulator.set_squelch(self.squelch_db)
+            demodulator.set_volume(self.volume_db)
+            self.demodulators.append(demodulator)
+            self.demod_slices.append(None)
+            self.parked_times.append(time.time())
+            self._connect_demod(len(self.demodulators) - 1,
+                                None if self.gate_idle else 0)
+        self.unlock()
+        self.num_demod = num_demod
+
+    def demod_source(self, slice_idx):
+        """Gets the block port that feeds demodulators on a slice
+
+        Args:
+            slice_idx (int): Channelizer slice
+
+        Returns:
+            Port of the channelizer slice, or the source without channelizer
+        """
+        if self.channelizer is None:
+            return self.src
+        return (self.channelizer, slice_idx)
+
+    def slice_index(self, center_freq):
+        """Gets the channelizer slice nearest a baseband frequency
+
+        Slices are in FFT order, so negative frequencies are the upper half
+
+        Args:
+            center_freq (float): Baseband center frequency in Hz
+
+        Returns:
+            int: Channelizer slice, always 0 without channelizer
+        """
+        if self.channelizer is None:
+            return 0
+        return int(round(center_freq/self.slice_spacing)) % self.num_slices
+
+    def residual_freq(self, center_freq):
+        """Gets a baseband frequency relative to its channelizer slice
+
+        Args:
+            center_freq (float): Baseband center frequency in Hz
+
+        Returns:
+            float: Frequency to translate the slice by in Hz
+        """
+        if self.channelizer is None:
+            return center_freq
+        return center_freq - \
+            round(center_freq/self.slice_spacing)*self.slice_spacing
+
+    def _connect_demod(self, idx, slice_idx):
+        """Connects a demodulator to a slice, or gates it out
+
+        A gated demodulator has no connections, so none of its blocks run,
+        and its adder input is fed silence instead
+
+        Args:
+            idx (int): Index of demodulator
+            slice_idx (int): Channelizer slice, or None to gate out
+        """
+        demodulator = self.demodulators[idx]
+        if slice_idx is None:
+            if self.add_ff is not None:
+                self.connect(self.null_audio, (self.add_ff, idx))
+        else:
+            self.connect(self.demod_source(slice_idx), demodulator)
+            if self.add_ff is not None:
+                self.connect(demodulator, (self.add_ff, idx))
+        self.demod_slices[idx] = slice_idx
+
+    def _disconnect_demod(self, idx):
+        """Undoes _connect_demod()
+
+        Args:
+            idx (int): Index of demodulator
+        """
+        demodulator = self.demodulators[idx]
+        if self.demod_slices[idx] is None:
+            if self.add_ff is not None:
+                self.disconnect(self.null_audio, (self.add_ff, idx))
         else:
-            # Just connect each demodulator to the receiver source
-            for demodulator in self.demodulators:
-                self.connect(self.src, demodulator)
+            self.disconnect(self.demod_source(self.demod_slices[idx]),
+                            demodulator)
+            if self.add_ff is not None:
+                self.disconnect(demodulator, (self.add_ff, idx))
+
+    def get_num_active(self):
+        """Gets the number of demodulators running in the flow graph
+
+        Returns:
+            int: Number of demodulators not gated out
+        """
+        return len(self.demod_slices) - self.demod_slices.count(None)
+
+    def retune(self, tunes, rf_center_freq):
+        """Tunes a batch of demodulators
+
+        With gating, demodulators parked at 0 Hz for gate_hold seconds are
+        gated out of the flow graph, and those tuned to a channel are
+        connected back in
+        Parked demodulators stay connected until then, on their last slice,
+        so a channel coming and going between cycles does not stop and
+        restart the scheduler threads, which risks overflowing the source
+        With the channelizer, demodulators that move to another slice are
+        reconnected
+        All reconnections are under a single lock() and unlock() of the flow
+        graph
+
+        Args:
+            tunes (list): (index, baseband center frequency in Hz) of each
+                demodulator to tune
+            rf_center_freq (float): RF center in Hz (for file name)
+        """
+        now = time.time()
+        moves = []
+        for idx, center_freq in tunes:
+            if center_freq != 0:
+                self.parked_times[idx] = None
+            elif self.parked_times[idx] is None:
+                self.parked_times[idx] = now
+            if self.gate_idle and center_freq == 0:
+                continue
+            slice_idx = self.slice_index(center_freq)
+            if slice_idx != self.demod_slices[idx]:
+                moves.append((idx, slice_idx))
+
+        # Gate out those parked for the hold time, with the other moves
+        if self.gate_idle:
+            for idx, parked_time in enumerate(self.parked_times):
+                if parked_time is not None and \
+                        now - parked_time >= self.gate_hold and \
+                        self.demod_slices[idx] is not None:
+                    moves.append((idx, None))
+
+        if moves:
+            self.lock()
+            for idx, slice_idx in moves:
+                self._disconnect_demod(idx)
+                self._connect_demod(idx, slice_idx)
+            self.unlock()
+
+        for idx, center_freq in tunes:
+            self.demodulators[idx].set_center_freq(
+                center_freq, rf_center_freq, self.residual_freq(center_freq))
+
+    @property
+    def file_opens(self):
+        """int: Number of audio files made by the recorders, which is less
+        than the number of retunes when channels do not open the squelch
+        """
+        return self.removed_file_opens + sum(
+            demodulator.recorder.file_opens
+            for demodulator in self.demodulators
+            if demodulator.recorder is not None)
+
+    def close_files(self):
+        """Closes the files being recorded and waits for the writer threads
+        to finish them, when stopping
+        """
+        for demodulator in self.demodulators:
+            demodulator.close()
+        if self.writer_pool is not None:
+            self.writer_pool.close()
 
     def set_center_freq(self, center_freq):
         """Sets RF center frequency of hardware
@@ -561,6 +1179,52 @@ class Receiver(gr.top_block):
         for demodulator in self.demodulators:
             demodulator.set_volume(self.volume_db)
 
+    def get_perf_blocks(self):
+        """Gets the blocks that do most of the work
+
+        Returns:
+            OrderedDict: Block of each name, in flow graph order
+        """
+        perf_blocks = collections.OrderedDict(
+            ("spectrum." + name, block)
+            for name, block in self.fft_blocks.items())
+        if self.channelizer is not None:
+            # The filterbank inside the channelizer hier block
+            perf_blocks["channelizer"] = self.channelizer.pfb
+        for idx, demodulator in enumerate(self.demodulators):
+            for name, block in demodulator.perf_blocks.items():
+                perf_blocks["demod" + str(idx) + "." + name] = block
+        if self.add_ff is not None:
+            perf_blocks["adder"] = self.add_ff
+        return perf_blocks
+
+    @staticmethod
+    def get_ticks_per_sec():
+        """Gets the rate of the timer the performance counters use
+
+        Returns:
+            float: Timer ticks per second
+        """
+        return gr.high_res_timer_tps()
+
+    def get_work_times(self):
+        """Gets the total time the main blocks have spent in work()
+
+        Needs the GNU Radio performance counters, which are turned on with
+        "on = True" in the [PerfCounters] section of the GNU Radio config
+
+        Returns:
+            dict: Time in seconds of each block name, or None if the
+                performance counters are off
+        """
+        if not gr.prefs().get_bool("PerfCounters", "on", False):
+            return None
+        ticks_per_sec = float(self.get_ticks_per_sec())
+        work_times = {}
+        for name, block in self.get_perf_blocks().items():
+            work_times[name] = block.pc_work_time_total()/ticks_per_sec
+        return work_times
+
     def get_demod_freqs(self):
         """Gets baseband frequencies of all demodulators
 
@@ -572,6 +1236,41 @@ class Receiver(gr.top_block):
             center_freqs.append(demodulator.center_freq)
         return center_freqs
 
+    def wait_spectrum(self, seq=0, fast_seq=0, timeout=None):
+        """Waits for a spectrum newer than seq, or a short integration newer
+        than fast_seq
+
+        Both sinks share a condition, so either wakes the waiting thread
+        The long integration is returned first if both are new, as it sets
+        the threshold the short one is compared to
+
+        Args:
+            seq (int): Sequence number of the last spectrum seen
+            fast_seq (int): Sequence number of the last short integration
+                seen
+            timeout (float): Maximum time to wait in seconds, None forever
+
+        Returns:
+            SpectrumFrame: Latest new frame, or None if timed out
+        """
+        if self.fast_sink is None:
+            return self.spectrum_sink.wait_spectrum(seq, timeout)
+
+        def newest():
+            """Gets the new frame with the long integration first"""
+            for sink, last in ((self.spectrum_sink, seq),
+                               (self.fast_sink, fast_seq)):
+                if sink.frame is not None and sink.frame.seq > last:
+                    return sink.frame
+            return None
+
+        with self.spectrum_sink.condition:
+            frame = newest()
+            if frame is None:
+                self.spectrum_sink.condition.wait(timeout)
+                frame = newest()
+            return frame
+
 
 def main():
     """Test the receiver
@@ -609,6 +1308,8 @@ def main():
     receiver.set_volume(0)
     print "%d demods of type %d at %d dB squelch and %d dB volume" % \
         (num_demod, type_demod, receiver.squelch_db, receiver.volume_db)
+    for name, seconds in receiver.startup_times.items():
+        print "Start up %-14s %8.1f ms" % (name, 1E3*seconds)
 
     # Create some baseband channels to tune based on 144 MHz center
     channels = np.zeros(num_demod)
@@ -616,9 +1317,8 @@ def main():
     channels[1] = 144.6E6 - receiver.center_freq
 
     # Tune demodulators to baseband channels
-    # If recording on, this creates empty wav file since manually tuning.
-    for idx, demodulator in enumerate(receiver.demodulators):
-        demodulator.set_center_freq(channels[idx], center_freq)
+    # If recording on, files are only made once the squelch opens
+    receiver.retune(list(enumerate(channels)), center_freq)
 
     # Print demodulator info
     for idx, channel in enumerate(channels):
@@ -626,18 +1326,21 @@ def main():
                                               (channel+receiver.center_freq)
                                               /1E6)
 
+    seq = 0
     while 1:
-        # No need to go faster than 10 Hz rate of GNU Radio probe
+        # No need to go faster than 10 Hz rate of the spectrum
         # Just do 1 Hz here
         time.sleep(1)
 
-        # Grab the FFT data and print max value
-        spectrum = receiver.probe_signal_vf.level()
-        print "Max spectrum of %.3f" % (np.max(spectrum))
+        # Wait for the next FFT data and print max value
+        frame = receiver.spectrum_sink.wait_spectrum(seq)
+        seq = frame.seq
+        print "Max spectrum of %.3f" % (np.max(frame.spectrum))
 
     # Stop the receiver
     receiver.stop()
     receiver.wait()
+    receiver.close_files()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:41:26 2026
+
+@author: madengr
+"""
+
+from gnuradio import gr
+import os
+import wave
+import threading
+import numpy as np
+import writer
+
+
+class AudioRing(object):
+    """Fixed size ring buffer of the last audio samples
+
+    Args:
+        num_samples (int): Number of samples to keep
+
+    Attributes:
+        count (int): Number of samples held, up to num_samples
+    """
+
+    def __init__(self, num_samples):
+        self.samples = np.zeros(max(num_samples, 0), dtype=np.float32)
+        self.idx = 0
+        self.count = 0
+
+    def write(self, samples):
+        """Copies samples in, over the oldest ones
+
+        Args:
+            samples (numpy.ndarray): Audio samples
+        """
+        size = len(self.samples)
+        if size == 0:
+            return
+        samples = samples[-size:]
+        end = self.idx + len(samples)
+        if end <= size:
+            self.samples[self.idx:end] = samples
+        else:
+            split = size - self.idx
+            self.samples[self.idx:] = samples[:split]
+            self.samples[:end - size] = samples[split:]
+        self.idx = end % size
+        self.count = min(self.count + len(samples), size)
+
+    def read(self):
+        """Gets the samples held, oldest first, and empties the ring
+
+        Returns:
+            numpy.ndarray: Copy of the samples held
+        """
+        samples = np.roll(self.samples, -self.idx)[len(self.samples) -
+                                                  self.count:]
+        self.count = 0
+        return samples
+
+
+class PrerollRecorder(gr.sync_block):
+    """Records the audio of a demodulator while its squelch is open
+
+    Replaces the blocking squelch and wavfile_sink, which made a file on
+    every retune and left empty ones to be stat'ed and deleted
+    Input 0 is the audio of an unsquelched demodulator, and input 1 the
+    squelched audio, which is zero while the squelch is closed
+    Both have the same filters, so they are sample aligned
+    The last preroll_time of the unsquelched audio is kept in memory, and
+    only when the squelch opens is the file made, starting with the
+    pre-roll so the onset of a weak carrier is not clipped
+    As before, a file holds all the transmissions while tuned to a channel,
+    with the squelched gaps left out
+    The samples are only copied to the queue of a writer thread, which makes,
+    encodes and writes the file, or appends it to the spool, so the disk
+    never holds up the flow graph
+
+    Args:
+        writer_pool (WriterPool): Threads that write the files, shared with
+            other recorders
+        audio_rate (float): Audio sample rate in sps
+        preroll_time (float): Time in seconds of audio to keep before the
+            squelch opens
+
+    Attributes:
+        file_name (string): Name of the file to record to, or None
+        rf_freq (float): RF frequency in Hz of the file
+        extension (string): File name extension of the codec
+        file_opens (int): Number of files made
+    """
+
+    def __init__(self, writer_pool, audio_rate=8000, preroll_time=0.25):
+        gr.sync_block.__init__(self, name="PrerollRecorder",
+                               in_sig=[np.float32, np.float32],
+                               out_sig=None)
+        self.writer_pool = writer_pool
+        self.extension = writer_pool.extension
+        self.preroll = AudioRing(int(round(preroll_time*audio_rate)))
+        self.file_name = None
+        self.rf_freq = 0
+        self.recording = None
+        self.squelch_open = False
+        self.file_opens = 0
+        self.lock = threading.Lock()
+
+    def open(self, file_name, rf_freq=0):
+        """Sets the file to record to, which is made when the squelch opens
+
+        Args:
+            file_name (string): Name of the file, or None to not record
+            rf_freq (float): RF frequency in Hz, for the spool index
+        """
+        with self.lock:
+            self._close()
+            self.file_name = file_name
+            self.rf_freq = rf_freq
+
+    def close(self):
+        """Closes the file, if one was made, and stops recording
+        """
+        with self.lock:
+            self._close()
+            self.file_name = None
+
+    def _close(self):
+        """Closes the file and forgets the audio of the last channel
+        """
+        if self.recording is not None:
+            self.recording.close()
+            self.recording = None
+        self.preroll.count = 0
+        self.squelch_open = False
+
+    def _write(self, samples):
+        """Queues samples to write, making the file first if need be
+
+        Args:
+            samples (numpy.ndarray): Audio samples
+        """
+        if self.recording is None:
+            self.recording = self.writer_pool.open(self.file_name,
+                                                   self.rf_freq)
+            self.file_opens += 1
+        # Copy, as the scheduler reuses the input buffer
+        self.recording.write(np.array(samples))
+
+    def record(self, audio, squelched):
+        """Records the samples where the squelch is open, each opening
+        preceded by the pre-roll
+
+        Args:
+            audio (numpy.ndarray): Unsquelched audio samples
+            squelched (numpy.ndarray): Squelched audio samples, zero where
+                the squelch is closed
+        """
+        with self.lock:
+            if self.file_name is None:
+                return
+            is_open = squelched != 0
+            if not self.squelch_open and not is_open.any():
+                self.preroll.write(audio)
+                return
+
+            # Split into runs where the squelch is open or closed
+            edges = np.flatnonzero(is_open[1:] != is_open[:-1]) + 1
+            starts = np.concatenate(([0], edges))
+            stops = np.concatenate((edges, [len(audio)]))
+            for start, stop in zip(starts, stops):
+                if is_open[start]:
+                    if not self.squelch_open:
+                        self._write(self.preroll.read())
+                    self._write(audio[start:stop])
+                else:
+                    self.preroll.write(audio[start:stop])
+                self.squelch_open = bool(is_open[start])
+
+    def work(self, input_items, output_items):
+        """Records the audio"""
+        # pylint: disable=unused-argument
+        self.record(input_items[0], input_items[1])
+        return len(input_items[0])
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test PrerollRecorder only makes a file once the squelch opens
+    print "Testing PrerollRecorder"
+    file_name = "/tmp/recorder_test/test.wav"
+    writer_pool = writer.WriterPool(8000, 16)
+    recorder = PrerollRecorder(writer_pool, 8000, 0.01)
+    audio = np.linspace(-0.5, 0.5, 400).astype(np.float32)
+    closed = np.zeros(400, dtype=np.float32)
+    recorder.open(file_name)
+    recorder.record(audio, closed)
+    made_early = os.path.exists(file_name)
+    squelched = audio.copy()
+    squelched[:300] = 0
+    recorder.record(audio, squelched)
+    recorder.close()
+    writer_pool.close()
+    wave_file = wave.open(file_name, 'rb')
+    frames = wave_file.getnframes()
+    wave_file.close()
+    os.remove(file_name)
+    os.rmdir(os.path.dirname(file_name))
+    print "Made before squelch opened %s, %d frames, %d file" % (
+        made_early, frames, recorder.file_opens)
+    if not made_early and frames == 80 + 100 and recorder.file_opens == 1:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
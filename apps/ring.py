@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:02:51 2026
+
+@author: madengr
+"""
+
+import numpy as np
+
+
+class SpectrumRing(object):
+    """Fixed size ring buffer of the last integrated spectra
+
+    The buffer is allocated once, so memory use is constant however long the
+    receiver runs, and writing a spectrum only copies it into place
+    Every row is stored twice, at idx and idx + num_frames, so the last n
+    spectra are always one contiguous block and readers get them as
+    zero-copy views, oldest first
+    A view is valid until num_frames - n more spectra are written, so
+    copy it to keep it longer
+
+    Args:
+        num_frames (int): Number of spectra to keep
+        num_bins (int): Number of bins in each spectrum
+
+    Attributes:
+        count (int): Number of spectra written since created
+    """
+
+    def __init__(self, num_frames, num_bins):
+        self.num_frames = num_frames
+        self.num_bins = num_bins
+        self.spectra = np.zeros((2*num_frames, num_bins), dtype=np.float32)
+        self.seqs = np.zeros(2*num_frames, dtype=np.int64)
+        self.timestamps = np.zeros(2*num_frames, dtype=np.float64)
+        self.count = 0
+
+    def write(self, spectrum, seq, timestamp):
+        """Copies a spectrum in, over the oldest one
+
+        Args:
+            spectrum (numpy.ndarray): Spectrum of num_bins values
+            seq (int): Sequence number of the spectrum
+            timestamp (float): Time the spectrum arrived
+
+        Returns:
+            numpy.ndarray: View of the spectrum in the buffer
+        """
+        idx = self.count % self.num_frames
+        for row in (idx, idx + self.num_frames):
+            self.spectra[row] = spectrum
+            self.seqs[row] = seq
+            self.timestamps[row] = timestamp
+        self.count += 1
+        return self.spectra[idx + self.num_frames]
+
+    def _rows(self, num_frames):
+        """Gets the slice of rows holding the last spectra
+
+        Args:
+            num_frames (int): Number of spectra, None for all that are held
+
+        Returns:
+            slice: Rows of the last spectra, oldest first
+        """
+        held = min(self.count, self.num_frames)
+        if num_frames is None or num_frames > held:
+            num_frames = held
+        stop = (self.count - 1) % self.num_frames + self.num_frames + 1
+        return slice(stop - num_frames, stop)
+
+    def latest(self, num_frames=None):
+        """Gets the last spectra
+
+        Args:
+            num_frames (int): Number of spectra, None for all that are held
+
+        Returns:
+            numpy.ndarray: Zero-copy view of frames x bins, oldest first
+        """
+        return self.spectra[self._rows(num_frames)]
+
+    def latest_seqs(self, num_frames=None):
+        """Gets the sequence numbers of the last spectra
+
+        Args:
+            num_frames (int): Number of spectra, None for all that are held
+
+        Returns:
+            numpy.ndarray: Zero-copy view of sequence numbers, oldest first
+        """
+        return self.seqs[self._rows(num_frames)]
+
+    def latest_timestamps(self, num_frames=None):
+        """Gets the arrival times of the last spectra
+
+        Args:
+            num_frames (int): Number of spectra, None for all that are held
+
+        Returns:
+            numpy.ndarray: Zero-copy view of times, oldest first
+        """
+        return self.timestamps[self._rows(num_frames)]
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test SpectrumRing
+    print "Testing SpectrumRing"
+    ring = SpectrumRing(4, 3)
+    for seq in range(1, 7):
+        ring.write(np.ones(3)*seq, seq, seq)
+    latest = ring.latest()
+    print "Wrote spectra 1 to 6 in a ring of 4"
+    print "Latest " + str(latest[:, 0].tolist())
+    print "Last 2 " + str(ring.latest(2)[:, 0].tolist())
+    if latest[:, 0].tolist() == [3, 4, 5, 6] and \
+            ring.latest_seqs(2).tolist() == [5, 6] and \
+            np.may_share_memory(latest, ring.spectra):
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
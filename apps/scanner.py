@@ -5,13 +5,28 @@ Created on Fri Jul  3 13:38:36 2015
 
 @author: madengr
 """
-import __builtin__
-import receiver as recvr
 import estimate
+import tracker as trkr
+import assigner as asgnr
+import governor as gvnr
+import perf as prf
+import metrics as mtrc
+import profiler as prfl
+import freqfile
+import planner
 import parser as prsr
+import spool as spl
 import time
 import numpy as np
 import sys
+import collections
+import threading
+
+# Immutable state of the scanner published at the end of each scan cycle
+ScanSnapshot = collections.namedtuple('ScanSnapshot', [
+    'seq', 'timestamp', 'center_freq', 'spectrum', 'threshold_spectrum',
+    'gui_tuned_channels', 'gui_lockout_channels', 'perf_stats'])
+
 
 class Scanner(object):
     """Scanner that controls receiver
@@ -30,22 +45,78 @@ class Scanner(object):
         freq_correction (int): Frequency correction in ppm
         record (bool): Record audio to file if True
         audio_bps (int): Audio bit depth in bps (bits/samples)
+        type_detect (int): Type of detector (0=absolute, 1=CA-CFAR, 2=OS-CFAR)
+        on_hits (int): Number of detections needed to open a channel
+        on_cycles (int): Number of scan cycles on_hits are counted over
+        hang_time (float): Time in seconds to hold a channel after detection
+        lockout_store_name (string): Name of file to save lockouts in
+        ring_frames (int): Number of integrated spectra to keep
+        channelizer (bool): Feed demodulators from a polyphase channelizer
+        gate_idle (bool): Disconnect parked demodulators from the flow graph
+        gate_hold (float): Time in seconds a demodulator must be parked
+            before it is disconnected
+        max_load (float): Fraction of CPU above which demodulators are shed,
+            0 to never shed
+        perf (bool): Sample the GNU Radio performance counters
+        perf_file_name (string): Name of JSON-lines file for the samples
+        metrics_file_name (string): Name of file to write metrics to in
+            Prometheus text format every metrics_interval, or ""
+        metrics_port (int): Localhost TCP port to serve metrics on, or 0
+        tap_cache_name (string): Name of JSON file to keep filter taps in
+            between runs, or "" for none
+        bin_width (float): Widest FFT bin in Hz, or 0 for about 4 kHz
+        spectrum_rate (float): Integrated spectra per second wanted
+        averages (int): FFT vectors to integrate into each spectrum
+        welch (bool): Average 50 % overlapped FFTs of every sample
+        fast_time (float): Time in seconds of a short integration that
+            assigns demodulators on carrier onset, or 0 for none
+        preroll_time (float): Time in seconds of audio to record from before
+            the squelch opens
+        codec (string): Recording format, "wav", "ulaw", or "flac"
+        num_writers (int): Number of threads writing the recordings
+        spool (bool): Append the recordings to spool files with an index
+        spool_size (int): Size in bytes to start a new spool file at
 
     Attributes:
         center_freq (float): Hardware RF center frequency in Hz
         samp_rate (float): Hardware sample rate in sps (1E6 min)
+        num_demod (int): Number of parallel demodulators
         gain_db (int): Hardware RF gain in dB
         squelch_db (int): Squelch in dB
         volume_dB (int): Volume in dB
         threshold_dB (int): Threshold for channel detection in dB
+            Absolute for type_detect=0, else margin above local noise floor
         spectrum (numpy.ndarray): FFT power spectrum data in linear, not dB
-        lockout_channels [float]: List of baseband lockout channels in Hz
-        priority_channels [float]: List of baseband priority channels in Hz
+        spectrum_seq (int): Sequence number of spectrum, 0 before the first
+        spectrum_timestamp (float): Time spectrum arrived from the receiver
+        fast_seq (int): Sequence number of the last short integration
+        threshold_spectrum (numpy.ndarray): CFAR threshold of each bin in
+            linear, not dB, or None for the absolute detector
+        cfar_ref (int): Number of CFAR reference bins each side of a bin
+        cfar_guard (int): Number of CFAR guard bins each side of a bin
+        tracker (ChannelTracker): Holds channels between scan cycles
+        assigner (DemodAssigner): Assigns channels to demodulators
+        governor (LoadGovernor): Caps active demodulators, or None
+        perf_sampler (PerfSampler): Samples block performance, or None
+        metrics (Metrics): Stage timing histograms and event counters
+        metrics_interval (float): Time in seconds between metrics writes
+        startup_times (OrderedDict): Time in seconds of each step of start up
+        time_to_first_scan (float): Time in seconds from creation to the end
+            of the first scan cycle, or None before it
+        lockout_channels {int}: Set of baseband lockout channel numbers
+        priority_channels {int}: Set of baseband priority channel numbers
+        priority_order [int]: Priority channel numbers in file order
+            Channel numbers are baseband frequency / channel_spacing
         gui_tuned_channels [str] List of tuned RF channels in MHz for GUI
         gui_tuned_lockout_channels [str]: List of lockout channels in MHz GUI
         channel_spacing (float):  Spacing that channels will be rounded
         lockout_file_name (string): Name of file with channels to lockout
         priority_file_name (string): Name of file with channels for priority
+        lockout_file (FrequencyFile): Lockout frequencies, ranges, wildcards
+        priority_file (FrequencyFile): Priority frequencies
+        lockout_store (LockoutStore): Interactive lockouts by RF frequency
+        snapshot (ScanSnapshot): State published by the last scan cycle
+        lock (RLock): Held by scan cycles, take it to call from other threads
     """
     # pylint: disable=too-many-instance-attributes
     # pylint: disable=too-many-arguments
@@ -53,7 +124,18 @@ class Scanner(object):
     def __init__(self, ask_samp_rate=4E6, num_demod=4, type_demod=0,
                  hw_args="uhd", freq_correction=0, record=True,
                  lockout_file_name="", priority_file_name="", play=True,
-                 audio_bps=8):
+                 audio_bps=8, type_detect=0, on_hits=1, on_cycles=1,
+                 hang_time=0, lockout_store_name="", ring_frames=100,
+                 channelizer=False, gate_idle=False, max_load=0, perf=False,
+                 perf_file_name="", metrics_file_name="", metrics_port=0,
+                 tap_cache_name="", bin_width=0, spectrum_rate=10.0,
+                 averages=100, welch=False, fast_time=0, preroll_time=0.25,
+                 codec="wav", num_writers=2, spool=False,
+                 spool_size=spl.MAX_SIZE, gate_hold=10.0):
+
+        # Time start up, to the end of the first scan cycle
+        self.start_time = time.time()
+        self.time_to_first_scan = None
 
         # Default values
         self.gain_db = 0
@@ -65,110 +147,429 @@ class Scanner(object):
         self.record = record
         self.play = play
         self.spectrum = []
-        self.lockout_channels = []
-        self.priority_channels = []
+        self.spectrum_seq = 0
+        self.spectrum_timestamp = None
+        self.fast_seq = 0
+        self.threshold_spectrum = None
+        self.type_detect = type_detect
+        self.cfar_ref = 16
+        self.cfar_guard = 2
+        self.tracker = trkr.ChannelTracker(on_hits, on_cycles, hang_time)
+        self.lockout_channels = set()
+        self.priority_channels = set()
+        self.priority_order = []
         self.gui_tuned_channels = []
+        self.gui_tuned_center_freq = None
         self.gui_lockout_channels = []
         self.channel_spacing = 5000
         self.lockout_file_name = lockout_file_name
         self.priority_file_name = priority_file_name
+        self.lockout_file = freqfile.FrequencyFile(lockout_file_name)
+        self.priority_file = freqfile.FrequencyFile(priority_file_name)
+        self.lockout_store = freqfile.LockoutStore(lockout_store_name)
+        self.snapshot = None
+        self.lock = threading.RLock()
+        self.metrics = mtrc.Metrics()
+        self.metrics.describe("scan_stage_seconds",
+                              "Time of each stage of the scan cycle, the "
+                              "spectrum stage including the wait for it",
+                              "stage")
+        self.metrics.describe("spectrum_age_seconds",
+                              "Time from spectrum arrival to scan")
+        self.metrics.describe("gui_stage_seconds",
+                              "Time of each stage of the GUI frame", "stage")
+        self.metrics.describe("scan_cycles_total", "Scan cycles run")
+        self.metrics.describe("detections_total", "Channels detected")
+        self.metrics.describe("onsets_total",
+                              "Channels opened by the short integration")
+        self.metrics.describe("retunes_total", "Demodulators retuned")
+        self.metrics.describe("file_opens_total",
+                              "Audio files made when a squelch opened")
+        self.metrics.describe("dropped_samples_total",
+                              "Audio samples dropped as a writer fell behind")
+        self.metrics_file_name = metrics_file_name
+        self.metrics_interval = 10.0
+        self.last_metrics_write = 0
+        self.file_opens = 0
+        self.dropped_samples = 0
 
         # Create receiver object
+        # Imported here, so parsing arguments does not wait for GNU Radio
+        import receiver as recvr
         self.receiver = recvr.Receiver(ask_samp_rate, num_demod, type_demod,
                                        hw_args, freq_correction, record, play,
-                                       audio_bps)
+                                       audio_bps, ring_frames, channelizer,
+                                       gate_idle, perf, tap_cache_name,
+                                       bin_width, spectrum_rate, averages,
+                                       welch, fast_time, preroll_time, codec,
+                                       num_writers, spool, spool_size,
+                                       gate_hold)
+        self.startup_times = collections.OrderedDict(
+            self.receiver.startup_times)
 
         # Get the hardware sample rate and center frequency
         self.samp_rate = self.receiver.samp_rate
         self.center_freq = self.receiver.center_freq
+        self.num_demod = self.receiver.num_demod
+
+        # Create assigner for the receiver demodulators
+        self.assigner = asgnr.DemodAssigner(self.receiver.demodulators,
+                                            self.receiver.retune)
+
+        # Create governor to shed demodulators if the host is overloaded
+        if max_load > 0:
+            self.governor = gvnr.LoadGovernor(self.num_demod, max_load,
+                                              self.receiver.spectrum_rate)
+        else:
+            self.governor = None
+
+        # Create sampler of the block performance counters
+        if perf:
+            self.perf_sampler = prf.PerfSampler(self.receiver, perf_file_name)
+        else:
+            self.perf_sampler = None
 
-        # Start the receiver and wait for samples to accumulate
+        # Serve the metrics on localhost
+        if metrics_port:
+            self.metrics_server = self.metrics.serve(metrics_port)
+        else:
+            self.metrics_server = None
+
+        # Start the receiver and wait for the first spectrum, rather than
+        # sleeping for a fixed time
+        start = time.time()
         self.receiver.start()
-        time.sleep(1)
+        self.startup_times["receiver start"] = time.time() - start
+        start = time.time()
+        self.wait_ready()
+        self.startup_times["first spectrum"] = time.time() - start
+
+    def wait_ready(self, timeout=5.0):
+        """Waits for the first valid integrated spectrum from the receiver
+
+        A spectrum is valid once it is finite and not all zeros, as some
+        hardware sends zeros while it settles
+        Earlier spectra are not skipped, the first scan cycle takes the
+        latest one
+
+        Args:
+            timeout (float): Maximum time to wait in seconds
+
+        Returns:
+            bool: True if a valid spectrum arrived, False if timed out
+        """
+        stop_time = time.time() + timeout
+        seq = 0
+        while True:
+            remaining = stop_time - time.time()
+            if remaining <= 0:
+                return False
+            frame = self.receiver.spectrum_sink.wait_spectrum(seq, remaining)
+            if frame is None:
+                return False
+            seq = frame.seq
+            if np.all(np.isfinite(frame.spectrum)) and \
+                    np.any(frame.spectrum > 0):
+                return True
+
+    def wait_spectrum(self, timeout=None):
+        """Waits for a spectrum, or short integration, newer than the last
+        one scanned
+
+        Does not need the scanner lock, so scan threads wait without it
 
-    def scan_cycle(self):
+        Args:
+            timeout (float): Maximum time to wait in seconds, None forever
+
+        Returns:
+            SpectrumFrame: Latest spectrum, or None if timed out
+        """
+        return self.receiver.wait_spectrum(self.spectrum_seq, self.fast_seq,
+                                           timeout)
+
+    def spectrum_history(self, num_frames=None):
+        """Gets the last integrated spectra from the receiver ring
+
+        Args:
+            num_frames (int): Number of spectra, None for all that are held
+
+        Returns:
+            numpy.ndarray: Zero-copy view of frames x bins, oldest first
+        """
+        return self.receiver.spectrum_sink.ring.latest(num_frames)
+
+    def scan_cycle(self, frame=None, wait_start=None):
         """Execute one scan cycle
 
-        Should be called no more than 10 Hz rate
+        Runs once per new spectrum, waiting for it if not given
         Estimates channels from FFT power spectrum that are above threshold
         Rounds channels to nearest 5 kHz
+        Opens and holds channels with hysteresis and hang time
         Removes channels that are already a priority
         Moves priority channels in front
         Removes channels that are locked out
         Tunes demodulators to new channels
         Holds demodulators on channels between scan cycles
         Creates RF channel lists for GUI
+        Short integrations are passed to onset_cycle()
+        The "spectrum" stage is the read of the spectrum, from the start of
+        the wait for it
+
+        Args:
+            frame (SpectrumFrame): New spectrum from wait_spectrum(), or None
+            wait_start (float): Time from metrics.now() that the wait for
+                the given frame started, or None if not timed
         """
         # pylint: disable=too-many-branches
 
-        # Retune demodulators that are locked out
-        for demodulator in self.receiver.demodulators:
-            if demodulator.center_freq in self.lockout_channels:
-                demodulator.set_center_freq(0, self.center_freq)
-            else:
-                pass
-
-        # Grab the FFT data, set threshold, and estimate baseband channels
-        self.spectrum = self.receiver.probe_signal_vf.level()
+        # Take the new FFT data, set threshold, and estimate baseband channels
+        if frame is None:
+            wait_start = mtrc.now()
+            frame = self.wait_spectrum()
+        if frame.fast:
+            self.onset_cycle(frame)
+            return
+        start = mtrc.now() if wait_start is None else wait_start
+        self.metrics.observe("spectrum_age_seconds",
+                             time.time() - frame.timestamp)
+        self.spectrum = frame.spectrum
+        self.spectrum_seq = frame.seq
+        self.spectrum_timestamp = frame.timestamp
+        start = self.metrics.lap("scan_stage_seconds", "spectrum", start)
         threshold = 10**(self.threshold_db/10.0)
-        channels = np.array(estimate.channel_estimate(self.spectrum,
-                                                      threshold))
+        if self.type_detect != 0:
+            # CFAR detection so threshold is a margin above the noise floor
+            threshold = estimate.cfar(self.spectrum, threshold, self.cfar_ref,
+                                      self.cfar_guard, self.type_detect - 1)
+            self.threshold_spectrum = threshold
+        else:
+            self.threshold_spectrum = None
+        channels = estimate.channel_estimate(self.spectrum, threshold)
+        self.metrics.count("detections_total", len(channels))
+        start = self.metrics.lap("scan_stage_seconds", "estimate", start)
+
+        # Round channels to integer channel numbers on the channel spacing
+        channels = self.raster_channels(channels, len(self.spectrum))
+        start = self.metrics.lap("scan_stage_seconds", "raster", start)
+
+        # Only keep channels that have been open long enough and hold them
+        # through fades, so demodulators are not retuned on detector noise
+        channels = self.tracker.update(channels)
+        start = self.metrics.lap("scan_stage_seconds", "track", start)
+        channels = self.filter_channels(channels)
+        start = self.metrics.lap("scan_stage_seconds", "filter", start)
+
+        # Save lockouts added since the last save, at most every few seconds
+        self.lockout_store.flush()
+        start = self.metrics.lap("scan_stage_seconds", "lockout", start)
+
+        # Only keep as many channels as the host can demodulate
+        # Priority channels are in front, so they are shed last
+        if self.governor is not None:
+            limit = self.governor.update(self.spectrum_seq,
+                                         len(self.assigner.demod_map),
+                                         self.receiver.get_work_times())
+            channels = [channel for channel in channels if channel != 0]
+            channels = channels[:limit]
+        start = self.metrics.lap("scan_stage_seconds", "governor", start)
+
+        # Hold demodulators still on a channel, park those that are not,
+        # and tune idle demodulators to the new channels
+        retunes = self.assign_channels(channels)
+        start = self.metrics.lap("scan_stage_seconds", "assign", start)
+
+        # Sample the block performance counters, once a second
+        if self.perf_sampler is not None:
+            self.perf_sampler.sample()
+        start = self.metrics.lap("scan_stage_seconds", "perf", start)
+
+        # Create a tuned channel list of strings for the GUI, and publish
+        # the state of this scan cycle for it
+        if retunes or self.gui_tuned_center_freq != self.center_freq:
+            self.update_gui_tuned_channels()
+        self.publish_snapshot()
+        self.metrics.lap("scan_stage_seconds", "gui", start)
+        self.metrics.count("scan_cycles_total")
+        if self.time_to_first_scan is None:
+            self.time_to_first_scan = time.time() - self.start_time
+            self.startup_times["(to first scan)"] = self.time_to_first_scan
+
+        # Write the metrics every metrics_interval
+        if self.metrics_file_name != "" and \
+                time.time() - self.last_metrics_write >= self.metrics_interval:
+            self.write_metrics()
+
+    def onset_cycle(self, frame):
+        """Execute one scan cycle on a short integration
+
+        Only opens channels, so a carrier gets a demodulator within about
+        the short integration time rather than the long one
+        Compares to the threshold of the last long integration, so the
+        noise floor is estimated over the long one
+        A channel is only opened once detected in consecutive short
+        integrations, as for the tracker's on_hits of on_cycles but at least
+        2, so a single noisy one does not take a demodulator
+        Channels are held for one long integration, and only released by
+        scan_cycle() with the usual hang time
 
+        Args:
+            frame (SpectrumFrame): New short integration from wait_spectrum()
+        """
+        start = mtrc.now()
+        self.fast_seq = frame.seq
+        if self.threshold_spectrum is not None:
+            threshold = self.threshold_spectrum
+        elif self.type_detect == 0:
+            threshold = 10**(self.threshold_db/10.0)
+        else:
+            # No noise floor until the first long integration
+            return
+        channels = estimate.channel_estimate(frame.spectrum, threshold)
+        channels = self.raster_channels(channels, len(frame.spectrum))
+        channels = [channel for channel in set(channels.tolist())
+                    if not self.tracker.is_open(channel)]
+        channels = self.filter_channels(channels, False)
+
+        # Count the detections of every short integration, even if none,
+        # and open those detected in enough of them
+        opened = self.tracker.onset(channels, time.time(),
+                                    1.0/self.receiver.spectrum_rate)
+        start = self.metrics.lap("scan_stage_seconds", "onset", start)
+        if not opened:
+            return
+
+        # Tune the new channels, keeping the demodulators already tuned
+        self.metrics.count("onsets_total", len(opened))
+        channels = self.filter_channels(self.tracker.open_channels())
+        if self.governor is not None:
+            channels = [channel for channel in channels if channel != 0]
+            channels = channels[:self.governor.limit]
+        retunes = self.assign_channels(channels)
+        start = self.metrics.lap("scan_stage_seconds", "onset assign", start)
+        if retunes:
+            self.update_gui_tuned_channels()
+            self.publish_snapshot()
+        self.metrics.lap("scan_stage_seconds", "onset gui", start)
+
+    def raster_channels(self, channels, fft_length):
+        """Converts channels from bin indices to integer channel numbers
+
+        Note this affects tuning the demodulators
+        5000 Hz is adequate for NBFM
+
+        Args:
+            channels (list): Channels in (fractional) FFT bins
+            fft_length (int): Length of the spectrum
+
+        Returns:
+            numpy.ndarray: Channel numbers on the channel_spacing raster
+        """
         # Convert channels from bin indices to baseband frequency in Hz
-        channels = (channels-len(self.spectrum)/2)*\
-            self.samp_rate/len(self.spectrum)
+        channels = (np.array(channels)-fft_length/2)*self.samp_rate/fft_length
+
+        # Round channels to integer channel numbers on the channel spacing
+        return np.round(channels / self.channel_spacing).astype(int)
+
+    def filter_channels(self, channels, priority=True):
+        """Puts priority channels in front and removes locked out channels
 
-        # Round channels to channel spacing
-        # Note this affects tuning the demodulators
-        # 5000 Hz is adequate for NBFM
-        channels = np.round(channels / self.channel_spacing) * self.channel_spacing
+        Args:
+            channels (list): Open channel numbers
+            priority (bool): Put the priority channels in front, else leave
+                them out
 
+        Returns:
+            list: Channel numbers to tune, priority channels first
+        """
         # Remove channels that are already in the priority list
-        temp = []
-        for channel in channels:
-            if channel not in self.priority_channels:
-                temp = np.append(temp, channel)
-            else:
-                pass
-        channels = temp
+        channels = [channel for channel in channels
+                    if channel not in self.priority_channels]
 
         # Put the priority channels in front
-        channels = np.append(self.priority_channels, channels)
+        if priority:
+            channels = self.priority_order + channels
 
         # Remove channels that are locked out
-        temp = []
-        for channel in channels:
-            if channel not in self.lockout_channels:
-                temp = np.append(temp, channel)
-            else:
-                pass
-        channels = temp
+        channels = [channel for channel in channels
+                    if channel not in self.lockout_channels]
 
-        # Set demodulators that are no longer in channel list to 0 Hz
-        for demodulator in self.receiver.demodulators:
-            if demodulator.center_freq not in channels:
-                demodulator.set_center_freq(0, self.center_freq)
-            else:
-                pass
+        # Remove channels within locked out ranges, all at once
+        if len(channels) and len(self.lockout_file.starts):
+            rf_channels = np.array(channels)*self.channel_spacing + \
+                self.center_freq
+            locked = self.lockout_file.contains(rf_channels)
+            channels = [channel for channel, lock in zip(channels, locked)
+                        if not lock]
+        return channels
 
-        # Add new channels to demodulators
-        for channel in channels:
-            # If channel not in demodulators
-            if channel not in self.receiver.get_demod_freqs():
-                # Sequence through each demodulator
-                for demodulator in self.receiver.demodulators:
-                    # If demodulator is empty and channel not already there
-                    if (demodulator.center_freq == 0) and \
-                            (channel not in self.receiver.get_demod_freqs()):
-                        # Assing channel to empty demodulator
-                        demodulator.set_center_freq(channel, self.center_freq)
-                    else:
-                        pass
-            else:
-                pass
+    def assign_channels(self, channels):
+        """Assigns channels to demodulators
+
+        The caller updates the GUI list if any were retuned, so that is
+        timed as its own stage
+
+        Args:
+            channels (list): Channel numbers to tune, priority channels first
+
+        Returns:
+            int: Number of demodulators retuned
+        """
+        retunes = self.assigner.assign(
+            [float(channel * self.channel_spacing) for channel in channels],
+            self.center_freq)
+        self.metrics.count("retunes_total", retunes)
+        self.metrics.count("file_opens_total",
+                           self.receiver.file_opens - self.file_opens)
+        self.file_opens = self.receiver.file_opens
+        if self.receiver.writer_pool is not None:
+            dropped = self.receiver.writer_pool.dropped
+            self.metrics.count("dropped_samples_total",
+                               dropped - self.dropped_samples)
+            self.dropped_samples = dropped
+        return retunes
+
+    def publish_snapshot(self):
+        """Publishes an immutable snapshot of the scanner state
+
+        Readers take self.snapshot once and use only that object, so they
+        always see a consistent set of values from one scan cycle
+        The spectrum stays valid until ring_frames more spectra arrive
+        """
+        # The spectrum is a view into the receiver ring, so only take a
+        # read-only view of it rather than copy it
+        spectrum = np.asarray(self.spectrum).view()
+        spectrum.flags.writeable = False
+        threshold_spectrum = self.threshold_spectrum
+        if threshold_spectrum is not None:
+            threshold_spectrum = np.array(threshold_spectrum)
+            threshold_spectrum.flags.writeable = False
+        if self.perf_sampler is not None:
+            perf_stats = self.perf_sampler.stats
+        else:
+            perf_stats = None
+        seq = 0 if self.snapshot is None else self.snapshot.seq + 1
+        self.snapshot = ScanSnapshot(seq, time.time(), self.center_freq,
+                                     spectrum, threshold_spectrum,
+                                     tuple(self.gui_tuned_channels),
+                                     tuple(self.gui_lockout_channels),
+                                     perf_stats)
+
+    def channel_number(self, bb_freq):
+        """Converts a baseband frequency to an integer channel number
+
+        Args:
+            bb_freq (float): Baseband frequency in Hz
+
+        Returns:
+            int: Nearest channel number on the channel_spacing raster
+        """
+        return int(round(bb_freq / self.channel_spacing))
 
-        # Create an tuned channel list of strings for the GUI
-        # If channel is a zero then use an empty string
+    def update_gui_tuned_channels(self):
+        """Creates a tuned channel list of strings for the GUI
+
+        If channel is a zero then use an empty string
+        """
         self.gui_tuned_channels = []
         for demod_freq in self.receiver.get_demod_freqs():
             if demod_freq == 0:
@@ -179,9 +580,20 @@ class Scanner(object):
                                     self.center_freq)/1E6
                 text = '{:.3f}'.format(gui_tuned_channel)
             self.gui_tuned_channels.append(text)
+        self.gui_tuned_center_freq = self.center_freq
+
+    def update_gui_lockout_channels(self):
+        """Creates a lockout channel list of strings for the GUI
+        """
+        self.gui_lockout_channels = []
+        for lockout_channel in sorted(self.lockout_channels):
+            gui_lockout_channel = (lockout_channel*self.channel_spacing + \
+                                    self.receiver.center_freq)/1E6
+            text = '{:.3f}'.format(gui_lockout_channel)
+            self.gui_lockout_channels.append(text)
 
     def add_lockout(self, idx):
-        """Adds baseband frequency to lockout channels and updates GUI list
+        """Adds RF frequency to lockout store and channels and updates GUI list
 
         Args:
             idx (int): Index of tuned channel
@@ -190,75 +602,78 @@ class Scanner(object):
         if idx < len(self.receiver.demodulators):
             # Lockout if not zero and not already locked out
             demod_freq = self.receiver.demodulators[idx].center_freq
-            if (demod_freq != 0) and (demod_freq not in self.lockout_channels):
-                self.lockout_channels = np.append(self.lockout_channels,
-                                                  demod_freq)
+            channel = self.channel_number(demod_freq)
+            if (demod_freq != 0) and (channel not in self.lockout_channels):
+                self.lockout_store.add(self.center_freq +
+                                       channel*self.channel_spacing)
+                self.lockout_channels.add(channel)
 
-        # Create a lockout channel list of strings for the GUI
-        self.gui_lockout_channels = []
-        for lockout_channel in self.lockout_channels:
-            gui_lockout_channel = (lockout_channel + \
-                                    self.receiver.center_freq)/1E6
-            text = '{:.3f}'.format(gui_lockout_channel)
-            self.gui_lockout_channels.append(text)
+                # Only the new lockout changes the GUI list
+                self.update_gui_lockout_channels()
 
-    def clear_lockout(self):
-        """Clears lockout channels and updates GUI list
+    def project_channels(self, freqs):
+        """Converts RF frequencies to baseband channel numbers within the span
+
+        Args:
+            freqs (numpy.ndarray): RF frequencies in Hz
+
+        Returns:
+            List[int]: Channel numbers of the frequencies within the span,
+                in the order given
         """
-        # Clear the lockout channels
-        self.lockout_channels = []
-
-        # Process lockout file if it was provided
-        if self.lockout_file_name != "":
-            # Open file, split to list, remove empty strings
-            with open(self.lockout_file_name) as lockout_file:
-                lines = lockout_file.read().splitlines()
-                lockout_file.close()
-                lines = __builtin__.filter(None, lines)
-            # Convert to baseband frequencies, round, and append
-            for freq in lines:
-                bb_freq = float(freq) - self.center_freq
-                bb_freq = round(bb_freq/self.channel_spacing)*\
-                                        self.channel_spacing
-                self.lockout_channels.append(bb_freq)
-        else:
-            pass
+        bb_freqs = np.asarray(freqs) - self.center_freq
+        bb_freqs = bb_freqs[np.abs(bb_freqs) <= self.samp_rate/2.0]
+        channels = np.round(bb_freqs / self.channel_spacing).astype(int)
+        return channels.tolist()
+
+    def update_lockout(self):
+        """Updates lockout channels for the span and updates GUI list
+
+        The lockout file is only parsed again if it has changed
+        Single frequencies from the file and the lockout store are locked
+        out as channel numbers within the span
+        Ranges and wildcards are tested against detected channels each cycle
+        """
+        # Reload the lockout file if it has changed
+        self.lockout_file.reload()
+
+        # Lockout the single frequencies and stored lockouts within the span
+        self.lockout_channels = set(
+            self.project_channels(self.lockout_file.singles))
+        self.lockout_channels.update(
+            self.project_channels(self.lockout_store.array()))
 
         # Create a lockout channel list of strings for the GUI
-        self.gui_lockout_channels = []
-        for lockout_channel in self.lockout_channels:
-            gui_lockout_channel = (lockout_channel + \
-                                    self.receiver.center_freq)/1E6
-            text = '{:.3f}'.format(gui_lockout_channel)
-            self.gui_lockout_channels.append(text)
+        self.update_gui_lockout_channels()
+
+    def clear_lockout(self):
+        """Clears stored lockout channels and updates GUI list
+
+        Lockouts from the lockout file remain
+        """
+        self.lockout_store.clear()
+        self.update_lockout()
 
     def update_priority(self):
         """Updates priority channels
+
+        The priority file is only parsed again if it has changed
+        Only single frequencies are used, as ranges would hold every
+        demodulator on the range
         """
-        # Clear the priority channels
-        self.priority_channels = []
-
-        # Process priority file if it was provided
-        if self.priority_file_name != "":
-            # Open file, split to list, remove empty strings
-            with open(self.priority_file_name) as priority_file:
-                lines = priority_file.read().splitlines()
-                priority_file.close()
-                lines = __builtin__.filter(None, lines)
-            # Convert to baseband frequencies, round, and append if within BW
-            for freq in lines:
-                bb_freq = float(freq) - self.center_freq
-                bb_freq = round(bb_freq/self.channel_spacing)*\
-                                        self.channel_spacing
-                if abs(bb_freq) <= self.samp_rate/2.0:
-                    self.priority_channels.append(bb_freq)
-                else:
-                    pass
-        else:
-            pass
+        # Reload the priority file if it has changed
+        self.priority_file.reload()
+
+        # Priority channels within the span in file order, without repeats
+        self.priority_channels = set()
+        self.priority_order = []
+        for channel in self.project_channels(self.priority_file.singles):
+            if channel not in self.priority_channels:
+                self.priority_channels.add(channel)
+                self.priority_order.append(channel)
 
     def set_center_freq(self, center_freq):
-        """Sets RF center frequency of hardware and clears lockout channels
+        """Sets RF center frequency of hardware and updates lockout channels
 
         Args:
             center_freq (float): Hardware RF center frequency in Hz
@@ -267,11 +682,14 @@ class Scanner(object):
         self.receiver.set_center_freq(center_freq)
         self.center_freq = self.receiver.center_freq
 
+        # Baseband channels being tracked have moved
+        self.tracker.clear()
+
         # Update the priority since frequency is changing
         self.update_priority()
 
-        # Clear the lockout since frequency is changing
-        self.clear_lockout()
+        # Project the lockouts into the new span
+        self.update_lockout()
 
     def set_gain(self, gain_db):
         """Sets gain of RF hardware
@@ -318,19 +736,111 @@ class Scanner(object):
         self.receiver.set_volume(volume_db)
         self.volume_db = self.receiver.volume_db
 
+    def set_num_demod(self, num_demod):
+        """Grows or shrinks the demodulator pool without restarting
+
+        Channels on removed demodulators are picked up again by the next
+        scan cycle if there are idle demodulators
+
+        Args:
+            num_demod (int): Number of demodulators
+        """
+        self.receiver.set_num_demod(num_demod, self.center_freq)
+        self.num_demod = self.receiver.num_demod
+        if self.governor is not None:
+            self.governor.set_num_demod(self.num_demod)
+
+        # The assigner shares the demodulator list, so rebuild its map
+        self.assigner.reset()
+        self.update_gui_tuned_channels()
+        self.publish_snapshot()
+
     def set_threshold(self, threshold_db):
         """Sets threshold in dB for channel detection
 
+        For the CFAR detectors this is the margin above the local noise floor
+
         Args:
             threshold_db (float): Threshold in dB
         """
         self.threshold_db = threshold_db
 
+    def write_metrics(self):
+        """Writes the metrics to the metrics file, if there is one
+        """
+        if self.metrics_file_name != "":
+            self.metrics.write(self.metrics_file_name)
+            self.last_metrics_write = time.time()
+
     def stop(self):
-        """Stop the receiver
+        """Stop the receiver and save the lockout store and metrics
         """
+        self.lockout_store.flush(True)
+        self.write_metrics()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        if self.perf_sampler is not None:
+            self.perf_sampler.close()
         self.receiver.stop()
         self.receiver.wait()
+        self.receiver.close_files()
+
+
+class ScanThread(threading.Thread):
+    """Thread that runs a scan cycle for each new spectrum
+
+    Decouples channel detection from the GUI, so a slow terminal does not
+    slow the scanner
+    Waits for each spectrum without the scanner lock, so latency is bounded
+    by the integration time, then runs the scan cycle with the lock held
+    If a scan cycle raises an exception the thread stops and keeps it
+
+    Args:
+        scanner (Scanner): Scanner to run
+        scan_rate (float): Maximum scan cycles per second, 0 for no limit
+
+    Attributes:
+        error (tuple): sys.exc_info() of the exception that stopped the
+            thread, or None
+    """
+
+    def __init__(self, scanner, scan_rate=0):
+        threading.Thread.__init__(self, name="ScanThread")
+        self.daemon = True
+        self.scanner = scanner
+        self.period = 1.0/scan_rate if scan_rate > 0 else 0
+        self.error = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Runs scan cycles until stopped
+        """
+        try:
+            while not self.stopped.is_set():
+                # Wait for a new spectrum, checking for stop twice a second
+                wait_start = mtrc.now()
+                frame = self.scanner.wait_spectrum(0.5)
+                if frame is None:
+                    continue
+                start = time.time()
+                with self.scanner.lock:
+                    self.scanner.scan_cycle(frame, wait_start)
+
+                # Keep to the maximum scan rate, short integrations are not
+                # held back so onsets are seen straight away
+                if frame.fast:
+                    continue
+                delay = start + self.period - time.time()
+                if delay > 0:
+                    self.stopped.wait(delay)
+        except Exception: # pylint: disable=broad-except
+            self.error = sys.exc_info()
+
+    def stop(self):
+        """Stops the thread and waits for the scan cycle to finish
+        """
+        self.stopped.set()
+        self.join()
 
 
 def main():
@@ -350,6 +860,13 @@ def main():
         parser.print_help() #pylint: disable=maybe-no-member
         raise SystemExit, 1
 
+    # Profile from the start, so set up time is included
+    profiler = None
+    if parser.profile_time > 0:
+        profiler = prfl.SamplingProfiler(parser.profile_file_name,
+                                         parser.profile_time)
+        profiler.start()
+
     # Create scanner object
     ask_samp_rate = parser.ask_samp_rate
     num_demod = parser.num_demod
@@ -360,15 +877,27 @@ def main():
     lockout_file_name = parser.lockout_file_name
     priority_file_name = parser.priority_file_name
     audio_bps = parser.audio_bps
+    type_detect = parser.type_detect
     scanner = Scanner(ask_samp_rate, num_demod, type_demod, hw_args,
                       freq_correction, record, lockout_file_name,
-                      priority_file_name, audio_bps)
+                      priority_file_name, parser.play, audio_bps, type_detect,
+                      parser.on_hits, parser.on_cycles, parser.hang_time,
+                      parser.lockout_store_name, parser.ring_frames,
+                      parser.channelizer, parser.gate_idle, parser.max_load,
+                      parser.perf, parser.perf_file_name,
+                      parser.metrics_file_name, parser.metrics_port,
+                      parser.tap_cache_name, parser.bin_width,
+                      parser.spectrum_rate, parser.averages, parser.welch,
+                      parser.fast_time, parser.preroll_time, parser.codec,
+                      parser.num_writers, parser.spool, parser.spool_size,
+                      parser.gate_hold)
 
     # Set frequency, gain, squelch, and volume
     scanner.set_center_freq(parser.center_freq)
     scanner.set_gain(parser.gain_db)
     scanner.set_if_gain(parser.if_gain_db)
     scanner.set_bb_gain(parser.bb_gain_db)
+    scanner.set_threshold(parser.threshold_db)
     print "\n"
     print "Started %s at %.3f Msps" % (hw_args, scanner.samp_rate/1E6)
     print "RX at %.3f MHz with %d dB gain" % (scanner.center_freq/1E6,
@@ -377,26 +906,38 @@ def main():
     scanner.set_volume(parser.volume_db)
     print "%d demods of type %d at %d dB squelch and %d dB volume" % \
         (num_demod, type_demod, scanner.squelch_db, scanner.volume_db)
+    print "Spectrum: " + \
+        planner.describe_spectrum(scanner.receiver.spectrum_plan)
+    print "Start up times (ms): " + ", ".join(
+        "%s %.1f" % (name, 1E3*seconds)
+        for name, seconds in scanner.startup_times.items())
 
     # Create this epmty list to allow printing to screen
     old_gui_tuned_channels = []
 
-    while 1:
-        # No need to go faster than 10 Hz rate of GNU Radio probe
-        time.sleep(0.1)
-
-        # Execute a scan cycle
-        scanner.scan_cycle()
-
-        # Print the GUI tuned channels if they have changed
-        if scanner.gui_tuned_channels != old_gui_tuned_channels:
-            sys.stdout.write("Tuners at: ")
-            for text in scanner.gui_tuned_channels:
-                sys.stdout.write(text + " ")
-            sys.stdout.write("\n")
-        else:
-            pass
-        old_gui_tuned_channels = scanner.gui_tuned_channels
+    try:
+        while 1:
+            # Execute a scan cycle on the next spectrum
+            first_scan = scanner.time_to_first_scan is None
+            scanner.scan_cycle()
+            if first_scan:
+                print "First scan %.3f s after start up" % \
+                    scanner.time_to_first_scan
+
+            # Print the GUI tuned channels if they have changed
+            if scanner.gui_tuned_channels != old_gui_tuned_channels:
+                sys.stdout.write("Tuners at: ")
+                for text in scanner.gui_tuned_channels:
+                    sys.stdout.write(text + " ")
+                sys.stdout.write("\n")
+            else:
+                pass
+            old_gui_tuned_channels = scanner.gui_tuned_channels
+    finally:
+        # Stop the receiver and save the lockouts, even on CTRL-C
+        scanner.stop()
+        if profiler is not None:
+            profiler.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 10:18:37 2026
+
+@author: madengr
+"""
+
+import os
+import re
+import glob
+import time
+import wave
+import struct
+import audioop
+import threading
+import collections
+
+# Sample formats of the segments, the PCM bit depth or the wav format tag
+FORMAT_PCM8 = 8
+FORMAT_PCM16 = 16
+FORMAT_ULAW = 7
+
+# Index record: RF frequency in Hz, start time, duration in s, spool file
+# number, byte offset and length in the spool file, audio rate, format, and
+# 1 if the segment continues the previous one of a long recording
+INDEX_RECORD = struct.Struct('<ddfIQIHBB')
+
+# Entry of the index, see INDEX_RECORD
+IndexEntry = collections.namedtuple('IndexEntry', [
+    'rf_freq', 'start', 'duration', 'spool_num', 'offset', 'length',
+    'audio_rate', 'sample_format', 'continued'])
+
+INDEX_NAME = "index.dat"
+
+# Default size in bytes to start a new spool file at
+MAX_SIZE = 1 << 30
+
+
+def spool_name(directory, spool_num):
+    """Gets the name of a spool file
+
+    Args:
+        directory (string): Directory of the spool
+        spool_num (int): Number of the spool file
+
+    Returns:
+        string: Name such as "spool/spool_000001.dat"
+    """
+    return os.path.join(directory, "spool_%06d.dat" % spool_num)
+
+
+class SpoolStore(object):
+    """Append-only store of audio segments, in place of a file each
+
+    Segments are appended to large spool files, which rotate once they
+    reach max_size, and a fixed size record of each is appended to a
+    single index, so a few files hold millions of transmissions
+    Nothing is rewritten, and a partly written index record from a crash is
+    cut off when reopened, so the records after it stay aligned
+    The writer holds each recording in memory until it is appended, so a
+    crash loses up to the last minute of every recording being made
+    Segments may be appended from any thread
+
+    Args:
+        directory (string): Directory of the spool and index files
+        max_size (int): Size in bytes to rotate the spool file at
+
+    Attributes:
+        spool_num (int): Number of the spool file being appended to
+        segments (int): Number of segments appended
+    """
+
+    def __init__(self, directory="spool", max_size=MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.segments = 0
+        self.lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Carry on appending to the last spool file
+        numbers = [int(match.group(1)) for match in
+                   (re.search(r"spool_(\d+)\.dat$", name) for name in
+                    glob.glob(os.path.join(directory, "spool_*.dat")))
+                   if match]
+        self.spool_num = max(numbers) if numbers else 1
+        self.spool_file = open(spool_name(directory, self.spool_num), 'ab')
+
+        # Cut off a partly written last record, from a crash
+        index_name = os.path.join(directory, INDEX_NAME)
+        if os.path.exists(index_name):
+            size = os.path.getsize(index_name)
+            if size % INDEX_RECORD.size:
+                with open(index_name, 'r+b') as index_file:
+                    index_file.truncate(size - size % INDEX_RECORD.size)
+        self.index_file = open(index_name, 'ab')
+
+    def append(self, rf_freq, start, audio_rate, sample_format, data,
+               continued=False):
+        """Appends a segment and its index record
+
+        Args:
+            rf_freq (float): RF frequency in Hz
+            start (float): Start time in seconds since the epoch
+            audio_rate (int): Audio sample rate in sps
+            sample_format (int): FORMAT_PCM8, FORMAT_PCM16 or FORMAT_ULAW
+            data (string): Audio samples in the sample format
+            continued (bool): Segment continues the previous one of the
+                recording
+
+        Returns:
+            IndexEntry: Index record of the segment
+        """
+        # pylint: disable=too-many-arguments
+        bytes_per_sample = 2 if sample_format == FORMAT_PCM16 else 1
+        duration = len(data)/float(bytes_per_sample*audio_rate)
+        with self.lock:
+            self.spool_file.seek(0, os.SEEK_END)
+            offset = self.spool_file.tell()
+            if offset > 0 and offset + len(data) > self.max_size:
+                self.spool_file.close()
+                self.spool_num += 1
+                self.spool_file = open(spool_name(self.directory,
+                                                  self.spool_num), 'ab')
+                offset = 0
+            self.spool_file.write(data)
+            self.spool_file.flush()
+            entry = IndexEntry(rf_freq, start, duration, self.spool_num,
+                               offset, len(data), audio_rate, sample_format,
+                               int(continued))
+            self.index_file.write(INDEX_RECORD.pack(*entry))
+            self.index_file.flush()
+            self.segments += 1
+        return entry
+
+    def close(self):
+        """Closes the spool and index files
+        """
+        with self.lock:
+            self.spool_file.close()
+            self.index_file.close()
+
+
+def read_index(directory="spool"):
+    """Reads the index of a spool
+
+    A partly written last record, from a crash, is left out
+
+    Args:
+        directory (string): Directory of the spool and index files
+
+    Returns:
+        List[IndexEntry]: Segments in the order they were appended
+    """
+    with open(os.path.join(directory, INDEX_NAME), 'rb') as index_file:
+        data = index_file.read()
+    size = INDEX_RECORD.size
+    return [IndexEntry(*INDEX_RECORD.unpack_from(data, offset))
+            for offset in range(0, len(data) - size + 1, size)]
+
+
+def read_segment(directory, entry):
+    """Reads the audio of a segment
+
+    Args:
+        directory (string): Directory of the spool files
+        entry (IndexEntry): Index record of the segment
+
+    Returns:
+        string: Audio samples in the sample format of the segment
+    """
+    with open(spool_name(directory, entry.spool_num), 'rb') as spool_file:
+        spool_file.seek(entry.offset)
+        return spool_file.read(entry.length)
+
+
+def write_wav(file_name, entry, data):
+    """Writes a segment to a wav file, mu-law as 16-bit PCM
+
+    Args:
+        file_name (string): Name of the wav file
+        entry (IndexEntry): Index record of the segment
+        data (string): Audio samples from read_segment()
+    """
+    if entry.sample_format == FORMAT_ULAW:
+        data = audioop.ulaw2lin(data, 2)
+        sample_width = 2
+    else:
+        sample_width = entry.sample_format/8
+    wave_file = wave.open(file_name, 'wb')
+    wave_file.setnchannels(1)
+    wave_file.setsampwidth(sample_width)
+    wave_file.setframerate(entry.audio_rate)
+    wave_file.writeframes(data)
+    wave_file.close()
+
+
+def join_segments(entries):
+    """Groups the segments of each recording, as a long recording is
+    appended in pieces that may have other recordings between them
+
+    Args:
+        entries (List[IndexEntry]): Segments, in the order appended
+
+    Returns:
+        List[List[IndexEntry]]: Segments of each recording, in order
+    """
+    recordings = []
+    # Recordings that may be continued, by the end of their last segment
+    # A segment is appended within about a minute of its end, so those that
+    # ended long before cannot be continued and are dropped
+    open_recordings = {}
+    for entry in entries:
+        key = (entry.rf_freq, entry.audio_rate, entry.sample_format)
+        ends = [(end, candidate) for end, candidate in
+                open_recordings.get(key, []) if end > entry.start - 600]
+        recording = None
+        if entry.continued:
+            for idx, (end, candidate) in enumerate(ends):
+                if abs(end - entry.start) < 1E-3:
+                    recording = candidate
+                    del ends[idx]
+                    break
+        if recording is None:
+            recording = []
+            recordings.append(recording)
+        recording.append(entry)
+        ends.append((entry.start + entry.duration, recording))
+        open_recordings[key] = ends
+    return recordings
+
+
+def segment_name(entry):
+    """Gets a unique wav file name for a segment, from its frequency,
+    start time, and place in the spool
+
+    Args:
+        entry (IndexEntry): Index record of the segment
+
+    Returns:
+        string: Name such as "146.520_1445000000_1_16000.wav"
+    """
+    return '{:.3f}'.format(entry.rf_freq/1E6) + "_" + \
+        str(int(entry.start)) + "_%d_%d.wav" % (entry.spool_num, entry.offset)
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test SpoolStore appends, rotates and reads back segments
+    print "Testing SpoolStore"
+    directory = "/tmp/spool_test"
+    store = SpoolStore(directory, 3000)
+    now = time.time()
+    for idx in range(4):
+        store.append(146.52E6 + idx*5E3, now + idx, 8000, FORMAT_PCM8,
+                     chr(128 + idx) * 1000)
+    store.close()
+
+    # A torn record is cut off on reopening, and a long recording joined
+    with open(os.path.join(directory, INDEX_NAME), 'ab') as index_file:
+        index_file.write("torn")
+    store = SpoolStore(directory, 3000)
+    store.append(147E6, now, 8000, FORMAT_PCM8, chr(128) * 800)
+    store.append(146.52E6, now, 8000, FORMAT_PCM8, chr(128) * 800)
+    store.append(147E6, now + 0.1, 8000, FORMAT_PCM8, chr(128) * 800, True)
+    store.close()
+    joined = join_segments(read_index(directory)[4:])
+    entries = read_index(directory)[:4]
+    data = read_segment(directory, entries[3])
+    write_wav(os.path.join(directory, segment_name(entries[3])), entries[3],
+              data)
+    wave_file = wave.open(os.path.join(directory, segment_name(entries[3])))
+    frames = wave_file.getnframes()
+    wave_file.close()
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+    print "%d entries, last in spool %d at %d, %s" % (
+        len(entries), entries[3].spool_num, entries[3].offset,
+        segment_name(entries[3]))
+    print "Joined %s segments" % [len(recording) for recording in joined]
+    if len(entries) == 4 and entries[3].spool_num == 2 and \
+            [len(recording) for recording in joined] == [2, 1] and \
+            joined[0][1].rf_freq == 147E6 and \
+            entries[3].offset == 0 and data == chr(131) * 1000 and \
+            frames == 1000 and abs(entries[3].duration - 0.125) < 1E-6:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:27:14 2026
+
+@author: madengr
+"""
+
+import os
+import json
+import time
+from gnuradio import filter as grfilter # Don't redefine Python's filter()
+
+
+class TapCache(object):
+    """Filter taps shared by all the tuners of a receiver
+
+    Each design is made once and kept by its parameters, so a pool of
+    identical demodulators designs its filters once and shares the taps
+    The cache may be saved to a JSON file and loaded on the next run, so
+    nothing is designed at start up unless the sample rate changes
+
+    Args:
+        file_name (string): Name of JSON file to load and save, or "" for
+            none
+
+    Attributes:
+        hits (int): Number of taps found in the cache
+        misses (int): Number of taps designed
+        design_time (float): Time in seconds spent designing taps
+        load_time (float): Time in seconds spent loading the file
+    """
+
+    def __init__(self, file_name=""):
+        self.file_name = file_name
+        self.taps = {}
+        self.hits = 0
+        self.misses = 0
+        self.design_time = 0.0
+        self.load_time = 0.0
+        self.changed = False
+        if self.file_name != "":
+            self.load()
+
+    def _get(self, key, design):
+        """Gets taps from the cache, or designs and keeps them
+
+        Args:
+            key (string): Design function and parameters
+            design (callable): Designs the taps, taking no arguments
+
+        Returns:
+            tuple: Filter taps
+        """
+        if key in self.taps:
+            self.hits += 1
+            return self.taps[key]
+        start = time.time()
+        taps = tuple(design())
+        self.design_time += time.time() - start
+        self.misses += 1
+        self.taps[key] = taps
+        self.changed = True
+        return taps
+
+    def low_pass(self, gain, samp_rate, cutoff, transition,
+                 window=grfilter.firdes.WIN_HAMMING):
+        """Gets windowed low pass filter taps, see firdes.low_pass()
+
+        Args:
+            gain (float): Pass band gain
+            samp_rate (float): Sample rate in sps
+            cutoff (float): Cutoff frequency in Hz
+            transition (float): Transition band width in Hz
+            window (int): firdes window type
+
+        Returns:
+            tuple: Filter taps
+        """
+        # pylint: disable=too-many-arguments
+        key = "low_pass%r" % ((gain, samp_rate, cutoff, transition, window),)
+        return self._get(key, lambda: grfilter.firdes.low_pass(
+            gain, samp_rate, cutoff, transition, window))
+
+    def low_pass_2(self, gain, samp_rate, cutoff, transition, atten,
+                   window=grfilter.firdes.WIN_BLACKMAN_hARRIS):
+        """Gets windowed low pass filter taps of a given attenuation, see
+        firdes.low_pass_2()
+
+        Args:
+            gain (float): Pass band gain
+            samp_rate (float): Sample rate in sps
+            cutoff (float): Cutoff frequency in Hz
+            transition (float): Transition band width in Hz
+            atten (float): Stop band attenuation in dB
+            window (int): firdes window type
+
+        Returns:
+            tuple: Filter taps
+        """
+        # pylint: disable=too-many-arguments
+        key = "low_pass_2%r" % ((gain, samp_rate, cutoff, transition, atten,
+                                 window),)
+        return self._get(key, lambda: grfilter.firdes.low_pass_2(
+            gain, samp_rate, cutoff, transition, atten, window))
+
+    def resampler(self, resamp_rate, flt_size=32):
+        """Gets prototype filter taps of a pfb.arb_resampler_fff
+
+        The same design the resampler makes when given no taps, for rates
+        below one, so it can be shared rather than made by every resampler
+
+        Args:
+            resamp_rate (float): Output rate over input rate, 1.0 or less
+            flt_size (int): Number of filters in the filterbank
+
+        Returns:
+            tuple: Filter taps
+        """
+        return self.low_pass_2(flt_size, flt_size, 0.4*resamp_rate,
+                               0.2*resamp_rate, 100)
+
+    def load(self):
+        """Loads taps from the file, if it exists and can be read
+        """
+        start = time.time()
+        try:
+            with open(self.file_name) as tap_file:
+                taps = json.load(tap_file)
+            for key, value in taps.items():
+                self.taps[str(key)] = tuple(value)
+        except (IOError, ValueError):
+            # No file yet, or a corrupt one that save() will replace
+            pass
+        self.load_time = time.time() - start
+
+    def save(self):
+        """Saves the taps to the file atomically, if any were designed
+        """
+        if self.file_name == "" or not self.changed:
+            return
+        temp_name = self.file_name + ".tmp"
+        with open(temp_name, 'w') as tap_file:
+            json.dump(self.taps, tap_file)
+        os.rename(temp_name, self.file_name)
+        self.changed = False
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test TapCache shares taps and saves them
+    print "Testing TapCache"
+    file_name = "/tmp/tapcache_test.json"
+    if os.path.exists(file_name):
+        os.remove(file_name)
+    cache = TapCache(file_name)
+    first = cache.low_pass(1, 4E6, 200E3, 100E3)
+    second = cache.low_pass(1, 4E6, 200E3, 100E3)
+    cache.resampler(0.96)
+    cache.save()
+    loaded = TapCache(file_name)
+    third = loaded.low_pass(1, 4E6, 200E3, 100E3)
+    os.remove(file_name)
+    print "%d taps, %d hits, %d misses, reloaded %d hits" % (
+        len(first), cache.hits, cache.misses, loaded.hits)
+    if first is second and third == first and loaded.misses == 0:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
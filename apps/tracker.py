@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:15 2026
+
+@author: madengr
+"""
+
+import collections
+import time
+
+
+class ChannelTracker(object):
+    """Tracks detected channels between scan cycles
+
+    A channel is opened once it is detected in on_hits of the last on_cycles
+    scan cycles, which ignores single cycle detections of noise
+    An open channel is held until it has not been detected for hang_time
+    seconds, which bridges fades without releasing the demodulator
+    Thus demodulator retunes, and wav files, follow transmissions rather
+    than the detector noise
+    The defaults of 1 of 1 cycles and 0 seconds follow each spectrum exactly
+    Short integrations are counted apart by onset(), and need at least 2 of
+    2, so a single noisy short integration does not open a channel
+
+    Args:
+        on_hits (int): Number of detections needed to open a channel (N)
+        on_cycles (int): Number of scan cycles detections are counted over (M)
+        hang_time (float): Time in seconds to hold a channel after detection
+
+    Attributes:
+        history (dict): Bit mask of detections over last on_cycles per channel
+        onset_history (dict): Bit mask of detections over the last
+            onset_cycles short integrations per channel
+        onset_hits (int): Detections in short integrations needed to open a
+            channel, on_hits but at least 2
+        onset_cycles (int): Number of short integrations detections are
+            counted over
+        last_seen (OrderedDict): Time of last detection of each open channel
+            in the order the channels were opened
+    """
+
+    def __init__(self, on_hits=1, on_cycles=1, hang_time=0):
+        self.on_hits = max(1, on_hits)
+        self.on_cycles = max(self.on_hits, on_cycles)
+        self.onset_hits = max(2, self.on_hits)
+        self.onset_cycles = max(self.onset_hits, self.on_cycles)
+        self.hang_time = hang_time
+        self.history = {}
+        self.onset_history = {}
+        self.last_seen = collections.OrderedDict()
+
+    @staticmethod
+    def _count(history, detected, num_cycles):
+        """Shifts a detection history and adds the detections of this cycle
+
+        Args:
+            history (dict): Bit mask of detections per channel, updated
+            detected (set): Channels detected this cycle
+            num_cycles (int): Number of cycles to keep in the bit masks
+
+        Returns:
+            dict: Number of detections in the history of each channel
+                detected this cycle
+        """
+        mask = (1 << num_cycles) - 1
+
+        # Shift the detection history and forget channels with no detections
+        for channel, bits in history.items():
+            bits = (bits << 1) & mask
+            if bits or channel in detected:
+                history[channel] = bits
+            else:
+                del history[channel]
+
+        hits = {}
+        for channel in detected:
+            bits = history.get(channel, 0) | 1
+            history[channel] = bits
+            hits[channel] = bin(bits).count('1')
+        return hits
+
+    def update(self, channels, now=None):
+        """Updates the tracker with the channels detected this scan cycle
+
+        Args:
+            channels (iterable): Channels detected this scan cycle
+            now (float): Time of the scan cycle in seconds, None for time()
+
+        Returns:
+            List: Open channels, in the order they were opened
+        """
+        if now is None:
+            now = time.time()
+        hits = self._count(self.history, set(channels), self.on_cycles)
+
+        # Refresh open channels, and open those with N of M detections
+        for channel, count in hits.items():
+            if channel in self.last_seen or count >= self.on_hits:
+                self.last_seen[channel] = now
+
+        # Release channels not detected within the hang time
+        for channel, last_seen in self.last_seen.items():
+            if now - last_seen > self.hang_time:
+                del self.last_seen[channel]
+
+        return self.last_seen.keys()
+
+    def open(self, channels, now=None, hold=0):
+        """Opens channels straight away, such as on a carrier onset seen in
+        a short integration
+
+        The channels are held for hold seconds more than the hang time, so
+        a long integration that only partly covers the carrier does not
+        release them in the next update()
+
+        Args:
+            channels (iterable): Channels to open
+            now (float): Time in seconds, None for time()
+            hold (float): Extra time in seconds to hold the channels
+
+        Returns:
+            List: Channels opened that were not already open
+        """
+        if now is None:
+            now = time.time()
+        opened = []
+        for channel in channels:
+            if channel not in self.last_seen:
+                opened.append(channel)
+            self.last_seen[channel] = max(self.last_seen.get(channel, now),
+                                          now + hold)
+        return opened
+
+    def onset(self, channels, now=None, hold=0):
+        """Updates the tracker with the channels detected in a short
+        integration, opening those with onset_hits of onset_cycles
+        detections straight away
+
+        Should be given every short integration, even with no detections,
+        so the detections counted are of consecutive ones
+
+        Args:
+            channels (iterable): Channels detected in the short integration
+            now (float): Time in seconds, None for time()
+            hold (float): Extra time in seconds to hold opened channels, as
+                for open()
+
+        Returns:
+            List: Channels opened that were not already open
+        """
+        hits = self._count(self.onset_history, set(channels),
+                           self.onset_cycles)
+        return self.open([channel for channel, count in hits.items()
+                          if count >= self.onset_hits], now, hold)
+
+    def is_open(self, channel):
+        """Checks if a channel is open
+
+        Args:
+            channel: Channel to check
+
+        Returns:
+            bool: True if the channel is open
+        """
+        return channel in self.last_seen
+
+    def open_channels(self):
+        """Gets the open channels
+
+        Returns:
+            List: Open channels, in the order they were opened
+        """
+        return self.last_seen.keys()
+
+    def clear(self):
+        """Clears all channels, such as when the RF center frequency changes
+        """
+        self.history = {}
+        self.onset_history = {}
+        self.last_seen = collections.OrderedDict()
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test default tracker follows the detections
+    print "Testing ChannelTracker() defaults"
+    tracker = ChannelTracker()
+    result = [tracker.update([1, 2], 0.0), tracker.update([2], 0.1)]
+    print "Open channels " + str(result)
+    if result == [[1, 2], [2]]:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+    # Test 2 of 3 cycles to open, and 0.25 second hang time
+    print "Testing ChannelTracker() with 2 of 3 cycles and 0.25 s hang"
+    tracker = ChannelTracker(2, 3, 0.25)
+    detections = [[1], [], [1], [], [], [], [2]]
+    result = []
+    for cycle, channels in enumerate(detections):
+        result.append(tracker.update(channels, cycle*0.1))
+    print "Detections " + str(detections)
+    print "Open channels " + str(result)
+    if result == [[], [], [1], [1], [1], [], []]:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+    # Test open() holds an onset channel through the next update
+    print "Testing ChannelTracker.open() with 0.1 s hold"
+    tracker = ChannelTracker()
+    opened = tracker.open([3], 0.0, 0.1)
+    result = [tracker.update([], 0.05), tracker.update([], 0.2)]
+    print "Opened " + str(opened) + ", open channels " + str(result)
+    if opened == [3] and result == [[3], []]:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+    # Test onset() needs 2 consecutive short integrations to open
+    print "Testing ChannelTracker.onset() needs 2 of 2"
+    tracker = ChannelTracker()
+    detections = [[4], [], [4], [4, 5], [4, 5]]
+    result = [tracker.onset(channels, cycle*0.01, 0.1)
+              for cycle, channels in enumerate(detections)]
+    print "Detections " + str(detections)
+    print "Opened " + str(result)
+    if result == [[], [], [], [4], [5]] and tracker.is_open(4) and \
+            tracker.open_channels() == [4, 5]:
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,488 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:06:52 2026
+
+@author: madengr
+"""
+
+import os
+import time
+import wave
+import audioop
+import sunau
+import Queue
+import threading
+import itertools
+import subprocess
+from distutils.spawn import find_executable
+import numpy as np
+import spool
+
+# File name extension of each codec
+EXTENSIONS = {"wav": ".wav", "ulaw": ".au", "flac": ".flac"}
+
+
+def pcm_bytes(samples, audio_bps):
+    """Converts audio samples to wav PCM bytes
+
+    Scaled as by blocks.wavfile_sink, 8-bit is unsigned and 16-bit signed
+
+    Args:
+        samples (numpy.ndarray): Audio samples from -1.0 to 1.0
+        audio_bps (int): Audio bit depth in bps (bits/samples), 8 or 16
+
+    Returns:
+        string: Little endian PCM samples
+    """
+    if audio_bps == 8:
+        pcm = np.clip(np.round(samples*127) + 128, 0, 255).astype(np.uint8)
+    else:
+        pcm = np.clip(np.round(samples*32767), -32768,
+                      32767).astype('<i2')
+    return pcm.tobytes()
+
+
+class WavEncoder(object):
+    """Writes PCM wav files, 8 or 16 bits/sample
+
+    Args:
+        file_name (string): Name of the file
+        audio_rate (int): Audio sample rate in sps
+        audio_bps (int): Audio bit depth in bps (bits/samples), 8 or 16
+    """
+
+    def __init__(self, file_name, audio_rate, audio_bps):
+        self.audio_bps = audio_bps
+        self.wave_file = wave.open(file_name, 'wb')
+        self.wave_file.setnchannels(1)
+        self.wave_file.setsampwidth(audio_bps/8)
+        self.wave_file.setframerate(audio_rate)
+
+    def write(self, samples):
+        """Writes audio samples
+
+        Args:
+            samples (numpy.ndarray): Audio samples from -1.0 to 1.0
+        """
+        # The header is only patched on close, rather than every write
+        self.wave_file.writeframesraw(pcm_bytes(samples, self.audio_bps))
+
+    def close(self):
+        """Closes the file and completes the header"""
+        self.wave_file.close()
+
+
+class UlawEncoder(object):
+    """Writes 8-bit mu-law Sun .au files, about the dynamic range of 14-bit
+    PCM at the size of 8-bit PCM
+
+    Args:
+        file_name (string): Name of the file
+        audio_rate (int): Audio sample rate in sps
+        audio_bps (int): Not used, always 8 bits/sample
+    """
+    # pylint: disable=unused-argument
+
+    def __init__(self, file_name, audio_rate, audio_bps=8):
+        self.au_file = sunau.open(file_name, 'wb')
+        self.au_file.setnchannels(1)
+        self.au_file.setsampwidth(2)
+        self.au_file.setframerate(audio_rate)
+        self.au_file.setcomptype('ULAW', 'CCITT G.711 u-law')
+
+    def write(self, samples):
+        """Writes audio samples
+
+        Args:
+            samples (numpy.ndarray): Audio samples from -1.0 to 1.0
+        """
+        # Converted from 16-bit native PCM
+        pcm = np.clip(np.round(samples*32767), -32768, 32767)
+        self.au_file.writeframes(pcm.astype(np.int16).tobytes())
+
+    def close(self):
+        """Closes the file and completes the header"""
+        self.au_file.close()
+
+
+class FlacEncoder(object):
+    """Writes lossless FLAC files, 16 bits/sample, through the flac encoder
+
+    The flac command line encoder must be installed
+
+    Args:
+        file_name (string): Name of the file
+        audio_rate (int): Audio sample rate in sps
+        audio_bps (int): Not used, always 16 bits/sample
+    """
+    # pylint: disable=unused-argument
+
+    def __init__(self, file_name, audio_rate, audio_bps=16):
+        self.process = subprocess.Popen(
+            ["flac", "--silent", "--force", "--force-raw-format",
+             "--endian=little", "--sign=signed", "--channels=1", "--bps=16",
+             "--sample-rate=%d" % audio_rate, "-o", file_name, "-"],
+            stdin=subprocess.PIPE)
+
+    def write(self, samples):
+        """Writes audio samples
+
+        Args:
+            samples (numpy.ndarray): Audio samples from -1.0 to 1.0
+        """
+        self.process.stdin.write(pcm_bytes(samples, 16))
+
+    def close(self):
+        """Closes the file, waiting for the encoder to finish"""
+        self.process.stdin.close()
+        self.process.wait()
+
+
+# Encoder of each codec
+ENCODERS = {"wav": WavEncoder, "ulaw": UlawEncoder, "flac": FlacEncoder}
+
+
+class SpoolEncoder(object):
+    """Appends a recording to a spool as segments, rather than a file
+
+    The samples are held in memory and appended in one piece on close, so
+    the segments of recordings written at once do not interleave
+    A long recording is appended every max_time seconds, as consecutive
+    segments of the same frequency, to bound the memory held, and so what
+    a crash loses of it
+
+    Args:
+        store (SpoolStore): Spool to append to
+        recording (Recording): Recording being written
+        audio_rate (int): Audio sample rate in sps
+        audio_bps (int): Audio bit depth in bps (bits/samples) for wav
+        codec (string): "wav" for PCM of audio_bps, or "ulaw"
+        max_time (float): Time in seconds of audio to hold at most
+    """
+    # pylint: disable=too-many-arguments
+
+    def __init__(self, store, recording, audio_rate, audio_bps, codec="wav",
+                 max_time=60.0):
+        self.store = store
+        self.rf_freq = recording.rf_freq
+        self.start = recording.start
+        self.audio_rate = audio_rate
+        self.audio_bps = audio_bps
+        if codec == "ulaw":
+            self.sample_format = spool.FORMAT_ULAW
+        else:
+            self.sample_format = audio_bps
+        self.max_samples = int(max_time*audio_rate)
+        self.chunks = []
+        self.num_samples = 0
+        self.continued = False
+
+    def write(self, samples):
+        """Holds audio samples, appending a segment if max_time are held
+
+        Args:
+            samples (numpy.ndarray): Audio samples from -1.0 to 1.0
+        """
+        if self.sample_format == spool.FORMAT_ULAW:
+            data = audioop.lin2ulaw(pcm_bytes(samples, 16), 2)
+        else:
+            data = pcm_bytes(samples, self.audio_bps)
+        self.chunks.append(data)
+        self.num_samples += len(samples)
+        if self.num_samples >= self.max_samples:
+            self._append()
+
+    def _append(self):
+        """Appends the samples held as a segment"""
+        if self.num_samples == 0:
+            return
+        self.store.append(self.rf_freq, self.start, self.audio_rate,
+                          self.sample_format, "".join(self.chunks),
+                          self.continued)
+        self.start += self.num_samples/float(self.audio_rate)
+        self.chunks = []
+        self.num_samples = 0
+        self.continued = True
+
+    def close(self):
+        """Appends the rest of the samples"""
+        self._append()
+
+
+class Recording(object):
+    """Handle of a file being written by a WriterPool
+
+    Args:
+        worker (WriterThread): Thread that writes the file
+        file_name (string): Name of the file
+        rf_freq (float): RF frequency in Hz, for the spool index
+
+    Attributes:
+        start (float): Time the recording was opened, since the epoch
+    """
+
+    def __init__(self, worker, file_name, rf_freq=0):
+        self.worker = worker
+        self.file_name = file_name
+        self.rf_freq = rf_freq
+        self.start = time.time()
+
+    def write(self, samples):
+        """Queues audio samples to write, dropping them if the queue is full
+
+        Args:
+            samples (numpy.ndarray): Audio samples, which must not be changed
+                after
+        """
+        self.worker.put_samples(self, samples)
+
+    def close(self):
+        """Queues closing the file"""
+        self.worker.put(("close", self, None))
+
+
+class WriterThread(threading.Thread):
+    """Thread that encodes and writes the files given to it in turn
+
+    Args:
+        pool (WriterPool): Pool the thread belongs to
+        name (string): Name of the thread
+
+    Attributes:
+        pending (int): Number of samples queued
+    """
+
+    def __init__(self, pool, name):
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.pool = pool
+        self.queue = Queue.Queue()
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def put(self, message):
+        """Queues a message, which is never dropped
+
+        Args:
+            message (tuple): Action, Recording, and samples or codec
+        """
+        self.queue.put(message)
+
+    def put_samples(self, recording, samples):
+        """Queues samples, unless max_pending are already queued
+
+        Args:
+            recording (Recording): File to write to
+            samples (numpy.ndarray): Audio samples
+        """
+        with self.lock:
+            if self.pending + len(samples) > self.pool.max_pending:
+                with self.pool.lock:
+                    self.pool.dropped += len(samples)
+                return
+            self.pending += len(samples)
+        self.queue.put(("write", recording, samples))
+
+    def run(self):
+        """Writes the queued samples until a stop message
+        """
+        encoders = {}
+        while True:
+            action, recording, value = self.queue.get()
+            if action == "stop":
+                break
+            try:
+                if action == "open" and self.pool.spool is not None:
+                    encoders[recording] = SpoolEncoder(
+                        self.pool.spool, recording, self.pool.audio_rate,
+                        self.pool.audio_bps, value)
+                elif action == "open":
+                    directory = os.path.dirname(recording.file_name)
+                    if directory and not os.path.isdir(directory):
+                        os.makedirs(directory)
+                    encoders[recording] = ENCODERS[value](
+                        recording.file_name, self.pool.audio_rate,
+                        self.pool.audio_bps)
+                elif action == "write":
+                    with self.lock:
+                        self.pending -= len(value)
+                    if recording in encoders:
+                        encoders[recording].write(value)
+                elif recording in encoders:
+                    encoders.pop(recording).close()
+            except Exception: # pylint: disable=broad-except
+                # Drop the file, closing it so neither its handle nor a flac
+                # process is left, and keep writing the other files
+                encoder = encoders.pop(recording, None)
+                if encoder is not None:
+                    try:
+                        encoder.close()
+                    except Exception: # pylint: disable=broad-except
+                        pass
+                with self.pool.lock:
+                    self.pool.errors += 1
+        for encoder in encoders.values():
+            try:
+                encoder.close()
+            except Exception: # pylint: disable=broad-except
+                with self.pool.lock:
+                    self.pool.errors += 1
+
+
+class WriterPool(object):
+    """Threads that encode and write the recordings off the flow graph
+
+    The recorders only queue the samples, so a stall of the disk does not
+    hold up the GNU Radio scheduler threads and overflow the source
+    Each file is written by one thread, in turn, so its samples stay in
+    order, and files are given to the threads round robin
+    Each thread queues at most max_time seconds of audio, after which
+    samples are dropped and counted rather than block the recorder; opening
+    and closing files is never dropped
+    Given a spool, the recordings are appended to it rather than made files
+
+    Args:
+        audio_rate (int): Audio sample rate in sps
+        audio_bps (int): Audio bit depth in bps (bits/samples) for wav
+        codec (string): "wav", "ulaw", or "flac", which a spool cannot hold
+        num_threads (int): Number of writer threads
+        max_time (float): Time in seconds of audio each thread may queue
+        spool (SpoolStore): Spool to append the recordings to, or None for
+            a file each
+
+    Attributes:
+        extension (string): File name extension of the codec
+        dropped (int): Number of samples dropped as a queue was full
+        errors (int): Number of files that could not be written
+    """
+    # pylint: disable=too-many-arguments
+
+    def __init__(self, audio_rate=8000, audio_bps=8, codec="wav",
+                 num_threads=2, max_time=60.0, spool=None):
+        if spool is not None and codec == "flac":
+            raise ValueError, "A spool holds wav or ulaw, not flac"
+        self.audio_rate = int(audio_rate)
+        self.audio_bps = audio_bps
+        self.codec = codec
+        self.spool = spool
+        self.extension = EXTENSIONS[codec]
+        self.max_pending = int(max_time*audio_rate)
+        self.dropped = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.workers = [WriterThread(self, "Writer%d" % idx)
+                        for idx in range(max(1, num_threads))]
+        self.next_worker = itertools.cycle(self.workers)
+        for worker in self.workers:
+            worker.start()
+
+    def open(self, file_name, rf_freq=0):
+        """Queues making a file, and its directory if need be
+
+        Args:
+            file_name (string): Name of the file, with the codec extension
+            rf_freq (float): RF frequency in Hz, for the spool index
+
+        Returns:
+            Recording: Handle to write the samples to and close
+        """
+        recording = Recording(next(self.next_worker), file_name, rf_freq)
+        recording.worker.put(("open", recording, self.codec))
+        return recording
+
+    def pending(self):
+        """Gets the number of samples queued
+
+        Returns:
+            int: Samples queued in all threads
+        """
+        return sum(worker.pending for worker in self.workers)
+
+    def close(self):
+        """Writes all the queued samples, closes the files, and stops
+        """
+        for worker in self.workers:
+            worker.put(("stop", None, None))
+        for worker in self.workers:
+            worker.join()
+        if self.spool is not None:
+            self.spool.close()
+
+
+def main():
+    """ Tests the functions in this module"""
+
+    # Test WriterPool writes each codec
+    print "Testing WriterPool"
+    codecs = ["wav", "ulaw"]
+    if find_executable("flac"):
+        codecs.append("flac")
+    samples = np.sin(np.arange(8000)/10.0).astype(np.float32)
+    sizes = []
+    for codec in codecs:
+        pool = WriterPool(8000, 16, codec)
+        file_name = "/tmp/writer_test/test" + pool.extension
+        recording = pool.open(file_name)
+        for start in range(0, 8000, 1000):
+            recording.write(samples[start:start+1000])
+        recording.close()
+        pool.close()
+        sizes.append(os.path.getsize(file_name))
+        os.remove(file_name)
+    os.rmdir("/tmp/writer_test")
+    print ", ".join("%s %d bytes" % pair for pair in zip(codecs, sizes))
+
+    # Test a file that fails is closed and counted, and the thread goes on
+    pool = WriterPool(8000, 16, "wav", 1)
+    broken = pool.open("/tmp/writer_test/broken.wav")
+    broken.write(np.array(["not audio"] * 10))
+    recording = pool.open("/tmp/writer_test/after.wav")
+    recording.write(samples[:1000])
+    recording.close()
+    pool.close()
+    after_size = os.path.getsize("/tmp/writer_test/after.wav")
+    os.remove("/tmp/writer_test/after.wav")
+    os.remove("/tmp/writer_test/broken.wav")
+    os.rmdir("/tmp/writer_test")
+    print "%d error, next file %d bytes" % (pool.errors, after_size)
+    errors = pool.errors
+
+    # Test a full queue drops samples rather than blocking
+    pool = WriterPool(8000, 16, "wav", 1, 0)
+    Recording(pool.workers[0], "/tmp/none.wav").write(samples[:100])
+    pool.close()
+    print "Dropped %d samples" % pool.dropped
+    dropped = pool.dropped
+
+    # Test a spool holds each recording as one segment
+    store = spool.SpoolStore("/tmp/writer_test")
+    pool = WriterPool(8000, 16, "ulaw", 2, spool=store)
+    recordings = [pool.open("", 146.52E6 + idx*5E3) for idx in range(3)]
+    for start in range(0, 8000, 1000):
+        for recording in recordings:
+            recording.write(samples[start:start+1000])
+    for recording in recordings:
+        recording.close()
+    pool.close()
+    entries = spool.read_index("/tmp/writer_test")
+    for name in os.listdir("/tmp/writer_test"):
+        os.remove(os.path.join("/tmp/writer_test", name))
+    os.rmdir("/tmp/writer_test")
+    print "%d segments of %s bytes" % (
+        len(entries), ", ".join(str(entry.length) for entry in entries))
+    if sizes[0] == 44 + 16000 and sizes[1] < 9000 and dropped == 100 and \
+            len(entries) == 3 and errors == 1 and \
+            after_size == 44 + 2000 and \
+            all(entry.length == 8000 for entry in entries):
+        print "Test Pass"
+    else:
+        print "Test Fail"
+    print ""
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass